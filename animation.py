@@ -0,0 +1,237 @@
+"""
+  animation.py  Copyright (c) 2024 Michael Margolis
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED
+"""
+
+"""
+Plays frame sequences packed by fonts/sequence_convert.py (.seq files) on the LCDs,
+such as the boot splash and the hourly chime started by main.py.
+Frames are streamed from flash a strip at a time into the display's strips, each
+strip sent by DMA to every LCD playing the sequence while the next is read, so
+no frame buffer is needed and each frame is read once however many LCDs show it.
+A frame is stored whole, as runs of one colour (RLE) or as the rectangles that
+changed since the frame before (delta), whichever is smallest. RLE runs are read
+through one small buffer kept by the player.
+Frames are due at a fixed rate and the player sleeps until each is due, so the
+clock's other tasks run between frames. A late frame is still shown, as the delta
+frames after it build on it, and the rest of the sequence follows on from it.
+"""
+
+import os
+import time
+from array import array
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import stats
+
+try:
+    from micropython import const
+except ImportError:
+    const = lambda x : x
+
+SEQ_MAGIC = b'SEQ1'
+HEADER_LEN = const(12)  # magic, width, height and frame count as 16 bit little endian, fps and a spare byte
+FRAME_HEAD_LEN = const(5) # frame type and its length in bytes as 32 bit little endian
+RAW = const(0)          # width * height RGB565 pixels
+RLE = const(1)          # runs of a count of 1 to 255 pixels and the pixel's two bytes
+DELTA = const(2)        # count of rectangles as 16 bit, x, y, w, h bytes of each, then the rows of each
+READ_BUF_LEN = const(1024) # RLE runs and delta rectangles are read through a buffer of this size
+
+# Expands the RLE runs in src[:m] into dst[i:n] and returns the position in dst it got to, less
+# than n if the runs ran out. state holds the position in src, the pixels left of the run being
+# expanded and its pixel, so a run can carry on into the next strip or the next read of src
+try:
+    import micropython
+
+    @micropython.viper
+    def rle_expand(dst, i: int, n: int, src, m: int, state) -> int:
+        d = ptr8(dst)
+        s = ptr8(src)
+        st = ptr32(state)
+        pos = st[0]
+        left = st[1]
+        hi = st[2] >> 8
+        lo = st[2] & 0xFF
+        while i < n:
+            if left == 0:
+                if pos + 3 > m:
+                    break
+                left = s[pos]
+                hi = s[pos + 1]
+                lo = s[pos + 2]
+                pos += 3
+            d[i] = hi
+            d[i + 1] = lo
+            i += 2
+            left -= 1
+        st[0] = pos
+        st[1] = left
+        st[2] = (hi << 8) | lo
+        return i
+
+    rle_expand(bytearray(2), 0, 2, b'\x01\x00\x00', 3, array('i', [0, 0, 0])) # ptr8 is only defined where viper is compiled
+except (ImportError, NameError):
+    def rle_expand(dst, i, n, src, m, state):
+        pos, left, pixel = state
+        hi = pixel >> 8
+        lo = pixel & 0xFF
+        while i < n:
+            if left == 0:
+                if pos + 3 > m:
+                    break
+                left, hi, lo = src[pos], src[pos + 1], src[pos + 2]
+                pos += 3
+            k = min(left, (n - i) // 2)
+            dst[i:i + k * 2] = bytes((hi, lo)) * k
+            i += k * 2
+            left -= k
+        state[0] = pos
+        state[1] = left
+        state[2] = (hi << 8) | lo
+        return i
+
+
+def exists(filename):
+    try:
+        os.stat(filename)
+        return True
+    except OSError:
+        return False
+
+
+class Player(object):
+    def __init__(self, lcd):
+        self.lcd = lcd
+        self.buf = bytearray(READ_BUF_LEN)
+        self.head = bytearray(HEADER_LEN)
+        self.state = array('i', [0, 0, 0]) # see rle_expand
+        self.playing = False
+        # the latest play, for /api/status and benchmarks
+        self.frames = 0  # frames shown
+        self.late = 0    # frames shown after they were due
+        self.fps = 0     # frames per second achieved
+
+    async def play(self, filename, digits=(0, 1, 2, 3, 4, 5), fps=None, loops=1):
+        # plays a .seq file on the LCDs of the given digits from the left, all showing the same frames,
+        # at fps or the rate in the file. Returns the frames per second achieved, 0 if it can not play
+        lcd = self.lcd
+        if lcd.strips is None:
+            print("animations need strip mode")
+            return 0
+        self.playing = True
+        shown = late = 0
+        start = time.ticks_ms()
+        try:
+            with open(filename, "rb") as file:
+                head = self.head
+                file.readinto(head)
+                count = head[8] | (head[9] << 8)
+                if head[:4] != SEQ_MAGIC or (head[4] | (head[5] << 8), head[6] | (head[7] << 8)) != (lcd.width, lcd.height):
+                    print(filename, "is not a {}x{} sequence".format(lcd.width, lcd.height))
+                    return 0
+                period = 1000 // (fps or head[10])
+                due = start
+                for loop in range(loops):
+                    file.seek(HEADER_LEN)
+                    for i in range(count):
+                        wait = time.ticks_diff(due, time.ticks_ms())
+                        if wait < 0:
+                            late += 1
+                            due = time.ticks_ms() # the frames after follow on from this one
+                        await asyncio.sleep(max(0, wait) / 1000) # the clock's tasks run meanwhile
+                        frame_start = time.ticks_ms()
+                        self.frame(file, digits)
+                        shown += 1
+                        if stats.enabled:
+                            stats.animation_frame.add(time.ticks_diff(time.ticks_ms(), frame_start))
+                        due = time.ticks_add(due, period)
+        finally:
+            lcd.cs_h()
+            for d in digits:
+                lcd.select_digit(d)
+                lcd.shadow[lcd.selected_digit] = None # not a frame the display can draw again
+            self.playing = False
+        self.frames = shown
+        self.late = late
+        self.fps = shown * 1000 // max(1, time.ticks_diff(time.ticks_ms(), start))
+        return self.fps
+
+    # Reads the next frame from file and sends it to the LCDs of digits
+    def frame(self, file, digits):
+        lcd = self.lcd
+        head = self.head
+        file.readinto(memoryview(head)[:FRAME_HEAD_LEN])
+        kind = head[0]
+        length = head[1] | (head[2] << 8) | (head[3] << 16) | (head[4] << 24)
+        if stats.enabled:
+            stats.counters[stats.FLASH_BYTES] += FRAME_HEAD_LEN + length
+        row = lcd.width * 2
+        strip_rows = len(lcd.strips.next()) // row
+        if kind == RAW or kind == RLE:
+            state = self.state
+            state[0] = state[1] = state[2] = 0
+            m = 0 # bytes of runs in buf
+            for y in range(0, lcd.height, strip_rows):
+                rows = min(strip_rows, lcd.height - y)
+                strip = memoryview(lcd.strips.next())
+                if kind == RAW:
+                    n = file.readinto(strip[:rows * row])
+                else:
+                    n = rle_expand(strip, 0, rows * row, self.buf, m, state)
+                    while n < rows * row:
+                        # the runs in buf are used up, keep any part of a run and read more
+                        keep = m - state[0]
+                        self.buf[:keep] = self.buf[state[0]:m]
+                        k = file.readinto(memoryview(self.buf)[keep:min(READ_BUF_LEN, keep + length)])
+                        if not k:
+                            raise ValueError("RLE frame ends early")
+                        length -= k
+                        m = keep + k
+                        state[0] = 0
+                        n = rle_expand(strip, n, rows * row, self.buf, m, state)
+                self.send(digits, 0, y, lcd.width, rows, n)
+        elif kind == DELTA:
+            file.readinto(memoryview(head)[:2])
+            count = head[0] | (head[1] << 8)
+            rects = memoryview(self.buf)[:count * 4]
+            file.readinto(rects)
+            for i in range(0, count * 4, 4):
+                x, y, w, h = rects[i], rects[i + 1], rects[i + 2], rects[i + 3]
+                chunk_rows = len(lcd.strips.next()) // (w * 2)
+                for r in range(0, h, chunk_rows):
+                    rows = min(chunk_rows, h - r)
+                    n = file.readinto(memoryview(lcd.strips.next())[:rows * w * 2])
+                    self.send(digits, x, y + r, w, rows, n)
+        else:
+            raise ValueError("unknown frame type {}".format(kind))
+        lcd.strips.wait()
+
+    # Sends n bytes of the strip from next() to each LCD in digits, to a w by h window at x, y.
+    # Each window is set once the strip before has gone, while the next strip is being read
+    def send(self, digits, x, y, w, h, n):
+        lcd = self.lcd
+        strips = lcd.strips
+        last = len(digits) - 1
+        for i in range(len(digits)):
+            lcd.select_digit(digits[i])
+            strips.wait()
+            lcd.begin_window(x, y, w, h)
+            strips.send(n, i == last)
+        if stats.enabled:
+            stats.counters[stats.SPI_BYTES] += n * len(digits)
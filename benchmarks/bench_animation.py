@@ -0,0 +1,138 @@
+"""
+  bench_animation.py  frames per second animation.py plays .seq files at
+
+  On the host the display runs on the simulator (see sim/), from the repository root:
+      python benchmarks/bench_animation.py
+  Times are the simulator's model of the Pico: SPI at 25 MHz and flash reads at
+  sim.FLASH_READ_RATE. The Python time of the player, RLE expansion included, is
+  not counted. The host packs two sequences with fonts/sequence_convert.py: the
+  ten nixie images, which are stored whole, and the 7seg digits counting with a
+  bar moving across them, stored as RLE and delta frames. After each play the
+  LCDs are checked against the last frame.
+
+  On the Pico copy this file and bench_firmware.py to the board, stop main.py
+  with Ctrl-C so its lcd object is left in the REPL, then:
+      import bench_animation
+      bench_animation.run(lcd, "splash.seq")
+  for a .seq file on the board.
+
+  For each sequence it reports the frames stored as raw, RLE and delta, the
+  bytes read per frame, and the ms per frame and frames per second when played
+  flat out on one LCD and on all six.
+"""
+
+import sys
+
+from bench_firmware import on_device, ticks_diff, ticks_us
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+def frame_kinds(filename):
+    # counts of raw, RLE and delta frames in a .seq file and its mean frame length
+    counts = [0, 0, 0]
+    total = 0
+    with open(filename, "rb") as file:
+        head = file.read(12)
+        frames = head[8] | (head[9] << 8)
+        for i in range(frames):
+            kind_len = file.read(5)
+            length = kind_len[1] | (kind_len[2] << 8) | (kind_len[3] << 16) | (kind_len[4] << 24)
+            counts[kind_len[0]] += 1
+            total += length
+            file.seek(length, 1)
+    return counts, total // max(1, frames)
+
+
+def measure(player, filename, digits, now_us=ticks_us):
+    # returns (frames, us per frame) playing flat out on the LCDs of digits
+    start = now_us()
+    asyncio.run(player.play(filename, digits, fps=1000))
+    return player.frames, ticks_diff(now_us(), start) / max(1, player.frames)
+
+
+def report(name, filename, one, six):
+    counts, mean = frame_kinds(filename)
+    print("{:<14} {:>4} {:>4} {:>5} {:>7} {:>7.1f} {:>5.1f} {:>7.1f} {:>5.1f}".format(
+        name, counts[0], counts[1], counts[2], mean, one[1] / 1000, 1e6 / one[1], six[1] / 1000, 1e6 / six[1]))
+
+
+def header():
+    print("{:<14} {:>4} {:>4} {:>5} {:>7} {:>7} {:>5} {:>7} {:>5}".format(
+        "sequence", "raw", "RLE", "delta", "bytes", "1 LCD", "fps", "6 LCDs", "fps"))
+
+
+def run(lcd, filename, now_us=ticks_us):
+    # lcd is the display.Display made by main.py
+    import animation
+    player = animation.Player(lcd)
+    header()
+    report(filename, filename, measure(player, filename, (0,), now_us),
+           measure(player, filename, (0, 1, 2, 3, 4, 5), now_us))
+
+
+def host_main():
+    import contextlib
+    import io
+    import os
+    import shutil
+    import tempfile
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    sys.path.insert(0, root)
+    sys.path.insert(0, os.path.join(root, 'fonts'))
+    import sim
+    from sim.run import prepare_workdir
+
+    board = sim.install(epoch=1718000000)
+    workdir = tempfile.mkdtemp(prefix='nixie_animation_')
+    prepare_workdir(workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import animation
+        import display
+        import framebuf
+        import sequence_convert
+        now_us = lambda: int(board.clock.now * 1000000)
+        with contextlib.redirect_stdout(io.StringIO()):
+            lcd = display.Display("7seg", "#00ffff")
+        player = animation.Player(lcd)
+
+        # the nixie images as frames, and the 7seg digits with a bar moving down them
+        frame = bytearray(240 * 135 * 2)
+        fb = framebuf.FrameBuffer(frame, 240, 135, framebuf.RGB565)
+        for i in range(10):
+            shutil.copy(str(i) + ".raw", "nixie" + str(i) + ".raw")
+            for step in range(3):
+                lcd.draw_7seg(i, fb, 0)
+                fb.fill_rect((i * 3 + step) * 8, 0, 8, 135, lcd.fg_colour)
+                with open("count" + str(i * 3 + step) + ".raw", "wb") as f:
+                    f.write(frame)
+
+        header()
+        for name in ("nixie", "count"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                sequence_convert.convert_sequence(name, 12)
+            one = measure(player, name + ".seq", (0,), now_us)
+            six = measure(player, name + ".seq", (0, 1, 2, 3, 4, 5), now_us)
+            report(name, name + ".seq", one, six)
+            last = "{}{}.raw".format(name, player.frames - 1)
+            with open(last, "rb") as f:
+                expected = f.read()
+            for panel in board.panels:
+                if b''.join(panel.rgb565()) != expected:
+                    raise AssertionError("an LCD does not show the last frame of " + name)
+
+        asyncio.run(player.play("count.seq", (0,)))
+        print("count.seq at its own 12 fps: {} fps, {} frames late".format(player.fps, player.late))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__" and not on_device:
+    host_main()
@@ -0,0 +1,152 @@
+"""
+  bench_deltas.py  bytes and time to change a nixie digit, as a whole frame and as delta rectangles
+
+  On the host the display runs on the simulator (see sim/), from the repository root:
+      python benchmarks/bench_deltas.py
+  Times are the simulator's model of the Pico: SPI at 25 MHz and flash reads at
+  sim.FLASH_READ_RATE. The host runs fonts/delta_convert.py on two fonts: the
+  nixie images in the repository, with every pair kept however little it saves,
+  and the 7seg digits saved as images, whose flat background leaves most of
+  each frame unchanged. Each delta is checked against the whole image on the
+  simulated LCD.
+
+  On the Pico copy this file and bench_firmware.py to the board, stop main.py
+  with Ctrl-C so its lcd object is left in the REPL, then:
+      import bench_deltas
+      bench_deltas.run(lcd)
+  This measures the pairs in the deltas.bin on the board.
+
+  For each pair it reports the rectangles and bytes sent and the ms taken,
+  by delta and as a whole frame. The seconds digit goes through the pairs
+  n -> n+1 once each ten ticks, their mean is the cost per tick.
+"""
+
+import sys
+
+from bench_firmware import on_device, ticks_diff, ticks_us
+
+
+def forget(lcd):
+    for i in range(len(lcd.shadow)):
+        lcd.shadow[i] = None
+
+
+def change(lcd, old, new, delta, now_us):
+    # shows old as a whole frame then changes to new, returns (bytes sent, us) for the change
+    import stats
+    lcd.select_digit(0)
+    forget(lcd)
+    lcd.display_nixie(old)
+    if not delta:
+        forget(lcd)
+    sent = stats.counters[stats.SPI_BYTES]
+    start = now_us()
+    lcd.display_nixie(new)
+    return stats.counters[stats.SPI_BYTES] - sent, ticks_diff(now_us(), start)
+
+
+def measure(lcd, now_us=ticks_us, check=None):
+    # returns a list of (old, new, rectangles, delta bytes, delta us, frame bytes, frame us)
+    # for each pair in lcd.deltas, check(new) is called after each delta if given
+    import stats
+    stats.enable()
+    font = (lcd.font_style, lcd.colour)
+    lcd.set_font("nixie", lcd.colour)
+    results = []
+    for old, new in sorted(lcd.deltas):
+        delta = change(lcd, old, new, True, now_us)
+        if check:
+            check(new)
+        frame = change(lcd, old, new, False, now_us)
+        results.append((old, new, len(lcd.deltas[(old, new)]) // 4) + delta + frame)
+    lcd.set_font(*font)
+    return results
+
+
+def report(results):
+    print("{:<7} {:>5} {:>7} {:>7} {:>7} {:>7}".format("pair", "rects", "bytes", "ms", "frame", "ms"))
+    for old, new, rects, d_bytes, d_us, f_bytes, f_us in results:
+        print("{:<7} {:>5} {:>7} {:>7.1f} {:>7} {:>7.1f}".format(
+            "{} -> {}".format(old, new), rects, d_bytes, d_us / 1000, f_bytes, f_us / 1000))
+    ticks = [r for r in results if r[1] == (r[0] + 1) % 10]
+    if ticks:
+        per_tick = [sum(r[i] for r in ticks) / len(ticks) for i in (3, 4, 5, 6)]
+        print("per tick {:.0f} bytes {:.1f} ms by delta, {:.0f} bytes {:.1f} ms by frame ({} of 10 pairs)".format(
+            per_tick[0], per_tick[1] / 1000, per_tick[2], per_tick[3] / 1000, len(ticks)))
+    else:
+        print("no deltas for the seconds digit")
+
+
+def run(lcd, now_us=ticks_us):
+    # lcd is the display.Display made by main.py, deltas need strip mode
+    if not lcd.use_strips():
+        print("deltas need strip mode")
+        return None
+    results = measure(lcd, now_us)
+    report(results)
+    return results
+
+
+def host_main():
+    import contextlib
+    import io
+    import os
+    import shutil
+    import tempfile
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    sys.path.insert(0, root)
+    sys.path.insert(0, os.path.join(root, 'fonts'))
+    import sim
+    from sim.run import prepare_workdir
+
+    board = sim.install(epoch=1718000000)
+    workdir = tempfile.mkdtemp(prefix='nixie_deltas_')
+    prepare_workdir(workdir)
+    for digit in range(10): # the .raw images are measured and checked against, and replaced below
+        if os.path.exists(os.path.join(workdir, str(digit) + ".idx")):
+            os.remove(os.path.join(workdir, str(digit) + ".idx"))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import delta_convert
+        import display
+        import framebuf
+        now_us = lambda: int(board.clock.now * 1000000)
+        with contextlib.redirect_stdout(io.StringIO()):
+            lcd = display.Display("nixie", "#ff8000")
+        panel = board.panels[5] # digit 0
+
+        def check(digit):
+            with open(str(digit) + ".raw", "rb") as f:
+                if b''.join(panel.rgb565()) != f.read():
+                    raise AssertionError("LCD does not show {} after its delta".format(digit))
+
+        def convert(min_saving):
+            delta_convert.MIN_SAVING = min_saving
+            with contextlib.redirect_stdout(io.StringIO()):
+                delta_convert.convert_all_files()
+            lcd.deltas = lcd.load_deltas()
+
+        print("nixie images, every pair")
+        convert(-1)
+        report(measure(lcd, now_us, check))
+
+        # the 7seg digits as images
+        frame = bytearray(240 * 135 * 2)
+        fb = framebuf.FrameBuffer(frame, 240, 135, framebuf.RGB565)
+        lcd.set_font("7seg", "#ff8000")
+        for digit in range(10):
+            lcd.draw_7seg(digit, fb, 0)
+            with open(str(digit) + ".raw", "wb") as f:
+                f.write(frame)
+        print("\n7seg digits as images")
+        convert(delta_convert.MIN_SAVING)
+        report(measure(lcd, now_us, check))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__" and not on_device:
+    host_main()
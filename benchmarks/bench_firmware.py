@@ -0,0 +1,394 @@
+"""
+  bench_firmware.py  timing budgets for the display, RTC, clock, web page and settings code
+
+  On the host the firmware runs on the simulator (see sim/), from the repository root:
+      python benchmarks/bench_firmware.py [--save] [--check] [-n N] [case ...]
+    --save   stores the results as the baseline in benchmarks/baselines/host.json
+    --check  compares with the baseline and exits with status 1 if a case has regressed
+
+  On the Pico copy this file to the board, stop main.py with Ctrl-C so its
+  clock, lcd and webserver objects are left in the REPL, then:
+      import bench_firmware
+      bench_firmware.run(globals())               # print the results
+      bench_firmware.run(globals(), save=True)    # also store bench_device.json
+      bench_firmware.run(globals(), check=True)   # compare with bench_device.json
+
+  Each case reports call latency percentiles, bytes allocated per call and bytes
+  moved per call over the SPI and I2C buses (or written for page, http and settings).
+  On the host latency is the CPython time of the firmware and the stand-in
+  modules, bus_us is the SPI and I2C time the simulator models for the Pico.
+  Allocations are the heap growth per call with gc disabled on the device and
+  the peak traced allocation per call on the host.
+
+  Host allocations include those made by the stand-in modules.
+
+  A case regresses when its p50 latency is more than TIME_TOLERANCE above the
+  baseline (SHORT_TIME_TOLERANCE for cases under SHORT_CASE_US), scaled by a
+  calibration loop so baselines move between machines, or when allocations or
+  bytes grow by more than ALLOC_TOLERANCE / BYTES_TOLERANCE.
+  With --check each case keeps the quickest of three runs, and a case still over
+  its time budget is run up to TIME_RECHECKS more times before it is reported.
+"""
+
+import gc
+import json
+import sys
+import time
+
+TIME_TOLERANCE = 0.25
+SHORT_TIME_TOLERANCE = 1.0 # for cases under SHORT_CASE_US, whose p50 moves with the machine's load far more
+SHORT_CASE_US = 1000
+TIME_SLACK_US = 50 # added to time budgets so very short cases are not failed by timer jitter
+TIME_RECHECKS = 5 # further runs of a case over its time budget before it is taken as a regression
+ALLOC_TOLERANCE = 0.10
+BYTES_TOLERANCE = 0.0
+DEVICE_BASELINE = "bench_device.json"
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+    on_device = sys.implementation.name == "micropython"
+except AttributeError:
+    on_device = False
+if not on_device:
+    ticks_us = lambda: int(time.perf_counter() * 1000000)
+    ticks_diff = lambda a, b: a - b
+
+
+class CountingBus(object):
+    # wraps an I2C object to count the bytes it moves
+    def __init__(self, bus):
+        self.bus = bus
+        self.count = 0
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        self.count += nbytes
+        return self.bus.readfrom_mem(addr, memaddr, nbytes)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self.count += len(buf)
+        self.bus.writeto_mem(addr, memaddr, buf)
+
+
+class RequestStream(object):
+    # stands in for a client connection, reads give the request and writes are counted
+    def __init__(self, request):
+        self.request = request
+        self.pos = 0
+        self.count = 0
+
+    async def readinto(self, buf):
+        n = min(len(buf), len(self.request) - self.pos)
+        buf[:n] = self.request[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def write(self, data):
+        self.count += len(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+# as a browser sends it, for www/index.html
+BROWSER_GET = (b'GET / HTTP/1.1\r\nHost: 192.168.1.50\r\nConnection: keep-alive\r\n'
+               b'Upgrade-Insecure-Requests: 1\r\nUser-Agent: Mozilla/5.0 (X11; Linux x86_64) '
+               b'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36\r\n'
+               b'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8\r\n'
+               b'Accept-Encoding: gzip, deflate\r\nAccept-Language: en-GB,en;q=0.9\r\n\r\n')
+# the settings form generated from the settings, as a browser without javascript gets it
+FORM_GET = BROWSER_GET.replace(b'GET / ', b'GET /form ', 1)
+# as the settings page script sends it
+API_GET = (b'GET /api/settings HTTP/1.1\r\nHost: 192.168.1.50\r\nConnection: keep-alive\r\n'
+           b'Accept: */*\r\nReferer: http://192.168.1.50/\r\nAccept-Encoding: gzip, deflate\r\n\r\n')
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, len(values) * pct // 100)]
+
+
+def calibrate():
+    # p50 microseconds of a fixed pure python workload, scales time baselines between machines
+    times = []
+    for _ in range(7):
+        start = ticks_us()
+        total = 0
+        for i in range(20000):
+            total += (i * 7) & 0xff
+        times.append(ticks_diff(ticks_us(), start))
+    times.sort()
+    return percentile(times, 50)
+
+
+def measure_alloc(func):
+    # bytes allocated by one call
+    if not on_device:
+        import tracemalloc
+        tracing = tracemalloc.is_tracing() # left on if the simulator traces memory for gc.mem_free()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        if not tracing:
+            tracemalloc.stop()
+        return peak - before
+    gc.collect()
+    gc.disable()
+    before = gc.mem_alloc()
+    func()
+    used = gc.mem_alloc() - before
+    gc.enable()
+    return used
+
+
+def measure(name, func, n, moved, bus_time=None):
+    # moved() and bus_time() return running totals of bytes and modelled bus seconds
+    func() # warm up, first calls can open files or fill caches
+    gc.collect()
+    times = []
+    bytes_start = moved()
+    bus_start = bus_time() if bus_time else 0
+    for _ in range(n):
+        start = ticks_us()
+        func()
+        times.append(ticks_diff(ticks_us(), start))
+    result = {"n": n}
+    result["bytes"] = (moved() - bytes_start) // n
+    if bus_time:
+        result["bus_us"] = int((bus_time() - bus_start) * 1000000 / n)
+    times.sort()
+    for pct in (50, 90, 99, 100):
+        result["p{}_us".format(pct) if pct < 100 else "max_us"] = percentile(times, pct)
+    result["alloc"] = measure_alloc(func)
+    return result
+
+
+def get_cases(ns):
+    # (name, function, iterations, bytes moved counter) for each case
+    import settings
+    import stats
+    import webserver
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        import asyncio
+    lcd = ns["lcd"]
+    clock = ns["clock"]
+    server = ns.get("webserver") or webserver.my_HTTPserver(settings, lambda data: None)
+    stats.enable() # its SPI byte count includes strips sent by DMA
+    rtc = clock.rtc_ds3231
+    i2c = rtc.i2c if isinstance(rtc.i2c, CountingBus) else CountingBus(rtc.i2c)
+    rtc.i2c = i2c
+    bus_bytes = lambda: stats.counters[stats.SPI_BYTES] + i2c.count
+    state = {"digit": 0, "page": 0, "saved": 0, "served": 0}
+
+    def next_digit():
+        state["digit"] = (state["digit"] + 1) % 10
+        return state["digit"]
+
+    def select(func):
+        def call():
+            lcd.select_digit(0)
+            func()
+        return call
+
+    def render_page():
+        # the page as send_page generates it for each request
+        for fragment in server.page_fragments():
+            state["page"] += len(fragment)
+
+    def serve(request):
+        # one request through the server's request parsing, the reply is counted
+        def call():
+            stream = RequestStream(request)
+            asyncio.run(server.handle_client(stream, stream))
+            state["served"] += stream.count
+        return call
+
+    def save():
+        settings.write_settings()
+        state["saved"] += len(json.dumps(settings.settings))
+
+    def redraw(forget=True):
+        # as after a layout change, with the display's record of what each LCD shows forgotten
+        # the whole clock is sent again, with it only what has changed is sent
+        def call():
+            if forget:
+                lcd.shadow[:] = [None] * 6
+            clock.digits_cache = [None] * 6
+            clock.info_text = None
+            clock.colon_cache = None
+            clock.service()
+        return call
+
+    def next_text():
+        # a text that differs from the one showing, so it is drawn and sent
+        return "Alarm 6:3" + str(next_digit())
+
+    cases = [
+        ("display_nixie", select(lambda: lcd.display_nixie(next_digit())), 30, bus_bytes),
+        ("display_text", select(lambda: lcd.display_text(next_text())), 20, bus_bytes),
+        ("display_dots", select(lambda: lcd.display_dots(next_digit())), 20, bus_bytes),
+        ("display_7seg", select(lambda: lcd.display_7seg(next_digit())), 30, bus_bytes),
+        ("rtc_localtime", rtc.localtime, 200, bus_bytes),
+        ("clock_service", clock.service, 50, bus_bytes),
+        ("clock_redraw", redraw(), 10, bus_bytes),
+        ("clock_unchanged", redraw(False), 10, bus_bytes),
+        ("page_render", render_page, 50, lambda: state["page"]),
+        ("http_get", serve(BROWSER_GET), 30, lambda: state["served"]),
+        ("http_form", serve(FORM_GET), 30, lambda: state["served"]),
+        ("http_api", serve(API_GET), 30, lambda: state["served"]),
+        ("settings_load", settings.load_settings, 20, lambda: 0),
+        ("settings_save", save, 10, lambda: state["saved"]),
+    ]
+    if lcd.buffer is not None: # without a frame buffer there is nothing to show again
+        cases.insert(0, ("show", select(lcd.show), 50, bus_bytes))
+    return cases
+
+
+def run_cases(ns, names=None, n=None, bus_time=None, repeat=1, baseline=None, calibration_us=None):
+    # bus_time returns the simulator's virtual seconds, None on the device
+    # with repeat > 1 each case keeps its quickest run, so a busy moment is not taken as a regression,
+    # and with a baseline a case over its time budget is run again up to TIME_RECHECKS times
+    results = {}
+    for name, func, count, moved in get_cases(ns):
+        if names and name not in names:
+            continue
+        runs = 0
+        while runs < repeat or (baseline and runs < repeat + TIME_RECHECKS and
+                                over_time_budget(name, results[name], calibration_us, baseline)):
+            result = measure(name, func, n or count, moved, bus_time)
+            if name not in results or result["p50_us"] < results[name]["p50_us"]:
+                results[name] = result
+            runs += 1
+    return results
+
+
+def report(results, calibration_us):
+    print("calibration {} us".format(calibration_us))
+    print("{:<14} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        "case", "p50_us", "p90_us", "p99_us", "max_us", "alloc", "bytes"))
+    for name in results:
+        r = results[name]
+        line = "{:<14} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+            name, r["p50_us"], r["p90_us"], r["p99_us"], r["max_us"], r["alloc"], r["bytes"])
+        if "bus_us" in r:
+            line += "  bus {} us".format(r["bus_us"])
+        print(line)
+
+
+def time_budget(base, calibration_us, baseline):
+    # the p50 microseconds a case may take, from its baseline scaled to this machine
+    scale = calibration_us / baseline["calibration_us"]
+    tolerance = SHORT_TIME_TOLERANCE if base["p50_us"] < SHORT_CASE_US else TIME_TOLERANCE
+    return base["p50_us"] * scale * (1 + tolerance) + TIME_SLACK_US
+
+
+def over_time_budget(name, result, calibration_us, baseline):
+    base = baseline["cases"].get(name)
+    return base is not None and result["p50_us"] > time_budget(base, calibration_us, baseline)
+
+
+def load_baseline(baseline_file):
+    with open(baseline_file) as f:
+        return json.load(f)
+
+
+def compare(results, calibration_us, baseline):
+    # returns a list of regression messages
+    failures = []
+    for name in results:
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        r = results[name]
+        limit = time_budget(base, calibration_us, baseline)
+        if r["p50_us"] > limit:
+            failures.append("{}: p50 {} us, budget {:.0f} us".format(name, r["p50_us"], limit))
+        if r["alloc"] > base["alloc"] * (1 + ALLOC_TOLERANCE) + 64:
+            failures.append("{}: allocates {} bytes, baseline {}".format(name, r["alloc"], base["alloc"]))
+        if r["bytes"] > base["bytes"] * (1 + BYTES_TOLERANCE):
+            failures.append("{}: moves {} bytes, baseline {}".format(name, r["bytes"], base["bytes"]))
+    return failures
+
+
+def finish(results, calibration_us, save, check, baseline_file):
+    # reports, then checks against and/or saves the baseline, returns False if there were regressions
+    report(results, calibration_us)
+    failures = []
+    if check:
+        failures = compare(results, calibration_us, load_baseline(baseline_file))
+        for failure in failures:
+            print("REGRESSION", failure)
+        if not failures:
+            print("no regressions against", baseline_file)
+    if save:
+        with open(baseline_file, "w") as f:
+            # one case per line so baseline changes are easy to review
+            f.write('{{"calibration_us": {}, "cases": {{\n'.format(calibration_us))
+            f.write(",\n".join('"{}": {}'.format(name, json.dumps(results[name])) for name in results))
+            f.write("\n}}\n")
+        print("baseline saved to", baseline_file)
+    return not failures
+
+
+def run(ns, save=False, check=False, names=None, n=None, baseline_file=DEVICE_BASELINE):
+    # ns holds the lcd and clock objects made by main.py, and webserver if WiFi connected
+    calibration_us = calibrate()
+    baseline = load_baseline(baseline_file) if check else None
+    results = run_cases(ns, names, n, repeat=3 if check else 1, baseline=baseline, calibration_us=calibration_us)
+    return finish(results, calibration_us, save, check, baseline_file)
+
+
+def host_main(argv):
+    # boots main.py on the simulator, then benchmarks the objects it made
+    import argparse
+    import contextlib
+    import io
+    import os
+    import shutil
+    import tempfile
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    sys.path.insert(0, root)
+    import sim
+    from sim.run import boot_firmware, prepare_workdir
+
+    parser = argparse.ArgumentParser(description="firmware benchmarks on the host simulator")
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 on regressions')
+    parser.add_argument('-n', type=int, help='iterations for every case')
+    parser.add_argument('cases', nargs='*', help='cases to run, default all')
+    args = parser.parse_args(argv)
+    baseline_file = os.path.relpath(os.path.join(root, 'benchmarks', 'baselines', 'host.json'))
+
+    baseline = load_baseline(baseline_file) if args.check else None # before leaving the repository root
+    board = sim.install(epoch=1718000000, http_port=0) # a fixed date so the digits drawn are repeatable
+    workdir = tempfile.mkdtemp(prefix='nixie_bench_')
+    prepare_workdir(workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.modules.pop('secrets', None) # the standard library module of that name
+    try:
+        # the firmware prints as it works, keep that out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            ns = boot_firmware(board, 10) # long enough for main.py to connect and start its loop
+            calibration_us = calibrate()
+            results = run_cases(ns, args.cases, args.n, lambda: board.clock.now, 3 if args.check else 1,
+                                baseline, calibration_us)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return finish(results, calibration_us, args.save, args.check, baseline_file)
+
+
+if __name__ == "__main__" and not on_device:
+    sys.exit(0 if host_main(sys.argv[1:]) else 1)
@@ -0,0 +1,123 @@
+"""
+  bench_http_load.py  host load test for the asyncio web server in webserver.py
+
+  Runs under CPython from the repository root:
+      python benchmarks/bench_http_load.py [clients] [requests_per_client]
+
+  The server listens on a local port and the given number of clients each make
+  their requests concurrently over real loopback connections. A deliberately
+  stalled client is connected throughout to show that one slow browser no
+  longer holds up the others. Reports requests/sec and latency percentiles
+  for two runs:
+    close       : a new connection for every request, as before keep-alive
+    keep-alive  : each client sends all its requests on one connection
+  along with the connections each run opened.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import settings
+import webserver
+from webserver import asyncio
+
+HOST = '127.0.0.1'
+PORT = 8080
+
+GET = b'GET / HTTP/1.1\r\nHost: nixieclock\r\n\r\n'
+GET_CLOSE = b'GET / HTTP/1.1\r\nHost: nixieclock\r\nConnection: close\r\n\r\n'
+
+
+async def read_response(reader):
+    # reads one response framed by its Content-Length, returns the status line and
+    # whether the server keeps the connection open
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.split(b'\r\n')
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return lines[0], b'\r\nConnection: close\r\n' not in head
+
+
+async def client(count, keep_alive, latencies, statuses, connections):
+    # makes count requests, on one connection for as long as the server keeps it open if keep_alive
+    conn = None
+    for _ in range(count):
+        start = time.perf_counter()
+        if conn is None:
+            conn = await asyncio.open_connection(HOST, PORT)
+            connections.append(start)
+        reader, writer = conn
+        writer.write(GET if keep_alive else GET_CLOSE)
+        await writer.drain()
+        status, kept = await read_response(reader)
+        if not kept:
+            writer.close()
+            await writer.wait_closed()
+            conn = None
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    if conn:
+        conn[1].close()
+        await conn[1].wait_closed()
+
+
+async def stalled_client():
+    # connects and sends half a request line, then waits
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write(b'GET / HT')
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(clients, per_client, keep_alive):
+    latencies = []
+    statuses = {}
+    connections = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(per_client, keep_alive, latencies, statuses, connections)
+                           for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print("{}: {} clients x {} requests in {:.2f}s: {:.0f} requests/sec, {} connections".format(
+        "keep-alive" if keep_alive else "close", clients, per_client, elapsed, len(latencies) / elapsed,
+        len(connections)))
+    print("latency ms  p50 {:.2f}  p90 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        *[1000 * percentile(latencies, p) for p in (50, 90, 99, 100)]))
+    print("responses", {k.decode(): v for k, v in statuses.items()})
+    return len(latencies) / elapsed
+
+
+async def main(clients, per_client):
+    # the device caps would turn most of these clients away with 503 or close their connections,
+    # raise them for the load test
+    webserver.MAX_CONNECTIONS = clients + 1
+    webserver.MAX_KEEP_ALIVE = clients
+    webserver.request_bufs[:] = [bytearray(webserver.REQUEST_BUF_LEN) for i in range(clients + 1)]
+    server = webserver.my_HTTPserver(settings, lambda data: None)
+    await server.start(HOST, PORT)
+    stalled = asyncio.create_task(stalled_client())
+    close_rate = await run(clients, per_client, False)
+    keep_rate = await run(clients, per_client, True)
+    print("keep-alive {:.1f}x the requests/sec of a connection per request".format(keep_rate / close_rate))
+    print("stalled client closed by server after {}s timeout: {}".format(
+        webserver.REQUEST_TIMEOUT, (await stalled) == b''))
+    server.server.close()
+
+
+if __name__ == "__main__":
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    n_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(n_clients, n_requests))
@@ -0,0 +1,64 @@
+"""
+  bench_static.py  host benchmark for static files served by webserver.py
+
+  Runs under CPython from the repository root:
+      python benchmarks/bench_static.py [iterations]
+
+  Reports bytes sent and CPU time per request for images/nixieclock.jpg when
+  fetched in full, when revalidated with If-None-Match, and for a gzip
+  capable client when a pre-gzipped copy exists. The gzip case runs on a
+  temporary copy of the images folder so the repository is left unchanged.
+"""
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import webserver
+from webserver import asyncio
+from bench_webserver import FakeReader, FakeWriter
+
+ASSET = 'images/nixieclock.jpg'
+
+
+async def run(server, name, request, iterations):
+    writer = FakeWriter()
+    start = time.process_time()
+    for _ in range(iterations):
+        await server.handle_client(FakeReader(request), writer)
+    cpu = time.process_time() - start
+    print("{:<12} {:>7} bytes/request  {:>7.1f} us CPU/request".format(
+        name, writer.sent // iterations, 1e6 * cpu / iterations))
+
+
+async def main(n):
+    server = webserver.my_HTTPserver(settings, lambda data: None)
+    get = 'GET /{} HTTP/1.1\r\nHost: nixieclock\r\n'.format(ASSET).encode()
+    await run(server, "full", get + b'\r\n', n)
+    etag = server.file_info(ASSET)[1]
+    await run(server, "304", get + b'If-None-Match: ' + etag + b'\r\n\r\n', n)
+
+    work = tempfile.mkdtemp()
+    try:
+        shutil.copytree(os.path.join(ROOT, 'images'), os.path.join(work, 'images'))
+        with open(os.path.join(work, ASSET), 'rb') as f, gzip.open(os.path.join(work, ASSET + '.gz'), 'wb', 9) as gz:
+            gz.write(f.read())
+        cwd = os.getcwd()
+        os.chdir(work)
+        await run(server, "gzip", get + b'Accept-Encoding: gzip, deflate\r\n\r\n', n)
+        os.chdir(cwd)
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    os.chdir(ROOT)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
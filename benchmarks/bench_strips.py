@@ -0,0 +1,159 @@
+"""
+  bench_strips.py  frame times and heap for the display's frame buffer and strip modes
+
+  On the host the display runs on the simulator (see sim/), from the repository root:
+      python benchmarks/bench_strips.py [-n N]
+  Times are the simulator's model of the Pico: SPI at 25 MHz and flash reads
+  at sim.FLASH_READ_RATE, with strips sent over the simulated DMA. The host
+  measures all three modes, with a display made with and without the frame buffer.
+
+  On the Pico copy this file and bench_firmware.py to the board, stop main.py
+  with Ctrl-C so its lcd object is left in the REPL, then:
+      import bench_strips
+      bench_strips.run(lcd)
+  This measures the modes the lcd has, frame and strips with the frame buffer
+  (display.FRAME_BUFFER = True), bands without it.
+
+  Modes are
+    frame   the frame buffer, each frame is drawn into it and sent
+    strips  the frame buffer, nixie images are streamed through DMA fed strips
+    bands   no frame buffer, every frame is drawn and sent a strip at a time
+  For each mode and font it reports frames per second and ms per frame, then
+  the heap held by the mode's buffers and the peak heap while drawing a frame,
+  which is the held buffers plus the most allocated by any one frame.
+"""
+
+import gc
+import sys
+import time
+
+from bench_firmware import measure_alloc, on_device, percentile, ticks_diff, ticks_us
+
+# (name, font, draw) where draw(lcd, i) draws the i'th frame. The display's record of what
+# the LCD shows is cleared first, so a frame it already shows is still drawn and sent
+CASES = (
+    ("nixie", "nixie", lambda lcd, i: forget(lcd) or lcd.display_nixie(i % 10)),
+    ("dot", "dot", lambda lcd, i: forget(lcd) or lcd.display_dots(i % 10)),
+    ("7seg", "7seg", lambda lcd, i: forget(lcd) or lcd.display_7seg(i % 10)),
+    ("text", "7seg", lambda lcd, i: forget(lcd) or lcd.display_text("Jun 10 Alarm 6:30")),
+    ("colon", "7seg", lambda lcd, i: forget(lcd) or lcd.show_colon(0, i % 2)),
+)
+
+
+def forget(lcd):
+    for i in range(len(lcd.shadow)):
+        lcd.shadow[i] = None
+
+
+def buffer_bytes(lcd):
+    # heap held by the frame buffer and strips
+    held = len(lcd.buffer) if lcd.buffer is not None else 0
+    if lcd.strips:
+        held += sum(len(strip) for strip in lcd.strips.strips)
+    return held
+
+
+def measure_mode(lcd, strips, n, now_us):
+    # returns a dict of results for one mode, or None if the mode is not available
+    if lcd.buffer is not None and lcd.use_strips(strips) != strips:
+        return None
+    lcd.select_digit(0)
+    result = {"buffers": buffer_bytes(lcd), "alloc": 0, "fonts": {}}
+    for name, font, draw in CASES:
+        lcd.set_font(font, "#ff8000")
+        draw(lcd, 0) # warm up
+        gc.collect()
+        times = []
+        for i in range(n):
+            start = now_us()
+            draw(lcd, i)
+            times.append(ticks_diff(now_us(), start))
+        times.sort()
+        result["fonts"][name] = {
+            "fps": 1000000 * n / sum(times),
+            "p50_ms": percentile(times, 50) / 1000,
+            "max_ms": times[-1] / 1000,
+        }
+        result["alloc"] = max(result["alloc"], measure_alloc(lambda: draw(lcd, 5)))
+    result["peak"] = result["buffers"] + result["alloc"]
+    return result
+
+
+def report(results):
+    print("{:<7} {:<6} {:>7} {:>8} {:>8}".format("mode", "font", "fps", "p50_ms", "max_ms"))
+    for mode in results:
+        r = results[mode]
+        if r is None:
+            print("{:<7} not available".format(mode))
+            continue
+        for name in r["fonts"]:
+            f = r["fonts"][name]
+            print("{:<7} {:<6} {:>7.1f} {:>8.1f} {:>8.1f}".format(mode, name, f["fps"], f["p50_ms"], f["max_ms"]))
+    print("{:<7} {:>8} {:>7} {:>8}".format("mode", "buffers", "alloc", "peak"))
+    for mode in results:
+        r = results[mode]
+        if r is not None:
+            print("{:<7} {:>8} {:>7} {:>8}".format(mode, r["buffers"], r["alloc"], r["peak"]))
+
+
+def run(lcd, n=20, now_us=ticks_us, results=None):
+    # lcd is the display.Display made by main.py, it is left in strip mode if that is available
+    results = {} if results is None else results
+    if lcd.buffer is not None:
+        results["frame"] = measure_mode(lcd, False, n, now_us)
+        results["strips"] = measure_mode(lcd, True, n, now_us)
+    else:
+        results["bands"] = measure_mode(lcd, True, n, now_us)
+    report(results)
+    return results
+
+
+def host_main(argv):
+    import argparse
+    import contextlib
+    import io
+    import os
+    import shutil
+    import tempfile
+    import tracemalloc
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    sys.path.insert(0, root)
+    import sim
+    from sim.run import prepare_workdir
+
+    parser = argparse.ArgumentParser(description="display frame buffer and strip mode benchmark on the host simulator")
+    parser.add_argument('-n', type=int, default=20, help='frames per mode and font')
+    args = parser.parse_args(argv)
+
+    board = sim.install(epoch=1718000000)
+    workdir = tempfile.mkdtemp(prefix='nixie_strips_')
+    prepare_workdir(workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import display
+        now_us = lambda: int(board.clock.now * 1000000)
+        results = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            # one display as display.py makes it, then one with the other frame buffer setting
+            lcds = [display.Display("nixie", "#ff8000")]
+            if display._display_buffer is None:
+                display._display_buffer = bytearray(240 * 135 * 2)
+            else:
+                display._display_buffer = None
+                display._strip_buffers = [bytearray(240 * display.STRIP_ROWS * 2)
+                                          for i in range(display.STRIP_COUNT)]
+            lcds.append(display.Display("nixie", "#ff8000"))
+            # traced from here so the simulated gc.mem_free() sees strip mode's buffers come and go
+            tracemalloc.start()
+            for lcd in sorted(lcds, key=lambda lcd: lcd.buffer is None):
+                run(lcd, args.n, now_us, results)
+        report(results)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__" and not on_device:
+    host_main(sys.argv[1:])
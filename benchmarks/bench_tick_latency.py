@@ -0,0 +1,136 @@
+"""
+  bench_tick_latency.py  delay from the DS3231 1Hz edge to the LCDs showing the new second
+
+  Runs main.py on the simulator (see sim/), from the repository root:
+      python benchmarks/bench_tick_latency.py [--seconds 30] [--cpu-scale 0] [font ...]
+
+  For each font the clock is run with seconds showing. For every 1Hz edge it
+  takes two times: to the first LCD frame write that follows, when the change
+  starts to show, and to the end of the last pixels sent for that second, when
+  the new second is complete on the LCDs. A whole frame takes 20.7 ms to send
+  at 25 MHz, so a digit sent as a whole frame can not be complete within 20 ms
+  of the edge. Bus times are modelled. The time the Pico spends running
+  Python, decoding digits included, is only counted with --cpu-scale, which
+  charges that many virtual seconds per host second of firmware code.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import sim
+from sim.run import boot_firmware, prepare_workdir
+
+FONTS = ("nixie", "dot", "7seg")
+FRAME_US = 240 * 135 * 2 * 8 / 25 # microseconds to send a full frame at 25 MHz
+RAMWR = 0x2C # the ST7789 command that pixels follow
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, len(values) * pct // 100)]
+
+
+def measure_font(board, ns, font, seconds):
+    # returns the sorted edge to first frame write and edge to frame complete latencies in ms for the given font
+    import asyncio
+    settings = ns['settings']
+    clock = ns['clock']
+    vclock = board.clock
+    settings.set_setting("active_font", font)
+    settings.set_setting("show_secs", "Yes")
+    clock.apply_settings()
+
+    edges = []
+    on_edge = board.rtc.on_edge
+    def record_edge():
+        edges.append(vclock.now)
+        on_edge()
+    board.rtc.on_edge = record_edge
+
+    sent = [] # virtual time each write of pixels to an LCD has been sent by
+    spi_write, spi_dma = board.spi_write, board.spi_dma
+    def pixels():
+        panel = board.selected_panel()
+        return panel is not None and panel.cmd == RAMWR and board.pin(sim.hw.DC_PIN).level
+    def record_write(data, baudrate):
+        spi_write(data, baudrate)
+        if pixels():
+            sent.append(vclock.now)
+    def record_dma(data, bus=1):
+        seconds = spi_dma(data, bus)
+        if pixels():
+            sent.append(vclock.now + seconds)
+        return seconds
+    board.spi_write, board.spi_dma = record_write, record_dma
+    for panel in board.panels:
+        panel.writes.clear()
+    # two seconds to settle after the font change, so its full redraw is not counted
+    vclock.end_at(vclock.now + seconds + 2)
+    try:
+        asyncio.run(ns['main']())
+    except sim.SimulationEnd:
+        pass
+    board.rtc.on_edge = on_edge
+    board.spi_write, board.spi_dma = spi_write, spi_dma
+
+    writes = sorted(t for panel in board.panels for t, _, _ in panel.writes)
+    first, complete = [], []
+    for i, edge in enumerate(edges[2:], 2):
+        end = edges[i + 1] if i + 1 < len(edges) else vclock.now
+        after = [t for t in writes if edge <= t < end]
+        if after:
+            first.append((after[0] - edge) * 1000)
+            complete.append((max(t for t in sent if edge <= t < end) - edge) * 1000)
+    first.sort()
+    complete.sort()
+    return first, complete
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--seconds', type=int, default=30, help='virtual seconds measured per font')
+    parser.add_argument('--cpu-scale', type=float, default=0.0,
+                        help='virtual seconds charged per host second of firmware code')
+    parser.add_argument('fonts', nargs='*', default=FONTS, help='fonts to measure, default all')
+    args = parser.parse_args(argv)
+
+    board = sim.install(epoch=1718000000, cpu_scale=args.cpu_scale, http_port=0)
+    workdir = tempfile.mkdtemp(prefix='nixie_latency_')
+    prepare_workdir(workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.modules.pop('secrets', None) # the standard library module of that name
+    results = {}
+    try:
+        # the firmware prints as it works, keep that out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            ns = boot_firmware(board, 10) # long enough for main.py to connect and start its loop
+            for font in args.fonts:
+                results[font] = measure_font(board, ns, font, args.seconds)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("ms from the 1Hz edge to the first frame write and to the frame complete (a whole frame takes {:.1f} ms to send)".format(
+        FRAME_US / 1000))
+    print("{:<6} {:>6} {:>8} {:>8} {:>8} {:>10} {:>10} {:>10} {:>7}".format(
+        "font", "ticks", "first", "p90", "max", "complete", "p90", "max", "missed"))
+    for font in results:
+        first, complete = results[font]
+        if not first:
+            print("{:<6} no frame writes after the 1Hz edges".format(font))
+            continue
+        print("{:<6} {:>6} {:>8.1f} {:>8.1f} {:>8.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>7}".format(
+            font, len(first), percentile(first, 50), percentile(first, 90), first[-1],
+            percentile(complete, 50), percentile(complete, 90), complete[-1], args.seconds - len(first)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+  bench_transitions.py  time to make and send a frame of each digit transition effect
+
+  On the host the display runs on the simulator (see sim/), from the repository root:
+      python benchmarks/bench_transitions.py
+  Times are the simulator's model of the Pico: SPI at 25 MHz and flash reads at
+  sim.FLASH_READ_RATE. The Python time of blend_pixels and roll_pixels is not
+  counted, on the host they are the plain Python versions rather than viper.
+
+  On the Pico copy this file and bench_firmware.py to the board, stop main.py
+  with Ctrl-C so its lcd object is left in the REPL, then:
+      import bench_transitions
+      bench_transitions.run(lcd)
+  which includes the viper loops.
+
+  For each effect and font it reports the ms per frame for one LCD and the
+  frames main.py's run_transitions sends for a change of one digit, out of
+  those it aims for at TRANSITION_FPS over TRANSITION_MS. Nixie frames read
+  both digit images from flash, so they are the slowest.
+"""
+
+import sys
+
+from bench_firmware import on_device, ticks_diff, ticks_us
+
+EFFECTS = ('crossfade', 'roll', 'flicker')
+FONTS = ('nixie', 'dot', '7seg')
+TRANSITION_MS = 400 # as in main.py
+TRANSITION_FPS = 25
+FRAMES = 8 # frames timed for each effect and font
+
+
+def measure(lcd, now_us=ticks_us):
+    # returns a list of (effect, font, mean us per frame) for the selected LCD
+    font = (lcd.font_style, lcd.colour)
+    results = []
+    for effect in EFFECTS:
+        for style in FONTS:
+            lcd.set_font(style, lcd.colour)
+            start = now_us()
+            for i in range(FRAMES):
+                lcd.transition_frame(effect, 3, 4, (i + 1) * 256 // (FRAMES + 1))
+            results.append((effect, style, ticks_diff(now_us(), start) / FRAMES))
+    lcd.set_font(*font)
+    lcd.shadow[lcd.selected_digit] = None
+    return results
+
+
+def frames_sent(frame_us):
+    # frames run_transitions sends in TRANSITION_MS, each starting at least a frame interval after the one before
+    interval = 1000 // TRANSITION_FPS
+    step = max(interval, frame_us / 1000)
+    return max(0, int((TRANSITION_MS - interval) // step)), TRANSITION_MS // interval - 1
+
+
+def report(results):
+    print("{:<10} {:<6} {:>8} {:>8}".format("effect", "font", "frame ms", "frames"))
+    for effect, style, us in results:
+        print("{:<10} {:<6} {:>8.1f} {:>5}/{}".format(effect, style, us / 1000, *frames_sent(us)))
+
+
+def run(lcd, now_us=ticks_us):
+    # lcd is the display.Display made by main.py, transitions need strips
+    if lcd.strips is None:
+        print("transitions need strip mode")
+        return None
+    lcd.select_digit(0)
+    results = measure(lcd, now_us)
+    report(results)
+    return results
+
+
+def host_main():
+    import contextlib
+    import io
+    import os
+    import shutil
+    import tempfile
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    sys.path.insert(0, root)
+    import sim
+    from sim.run import prepare_workdir
+
+    board = sim.install(epoch=1718000000)
+    workdir = tempfile.mkdtemp(prefix='nixie_transitions_')
+    prepare_workdir(workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import display
+        with contextlib.redirect_stdout(io.StringIO()):
+            lcd = display.Display("nixie", "#ff8000")
+        run(lcd, lambda: int(board.clock.now * 1000000))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__" and not on_device:
+    host_main()
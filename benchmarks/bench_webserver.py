@@ -0,0 +1,99 @@
+"""
+  bench_webserver.py  host benchmark for the settings pages served by webserver.py
+
+  Runs under CPython from the repository root:
+      python benchmarks/bench_webserver.py [iterations]
+
+  Stream stand-ins replace the client connection so only the request handling
+  in my_HTTPserver is timed. The page generated from the settings is served at
+  /form, and / serves www/index.html, which gets the settings from the API.
+  Five cases are reported:
+    uncached   : settings change before every request, so /form is rendered each time
+    cached     : settings unchanged, the rendered /form page is reused
+    304        : the browser revalidates /form with If-None-Match and gets 304 Not Modified
+    index      : www/index.html sent in full
+    index 304  : the browser revalidates www/index.html and gets 304 Not Modified
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import settings
+import webserver
+from webserver import asyncio
+
+
+class FakeReader:
+    # stands in for the asyncio StreamReader of an accepted client
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    async def readline(self):
+        end = self.data.find(b'\n', self.pos) + 1 or len(self.data)
+        line = self.data[self.pos:end]
+        self.pos = end
+        return line
+
+    async def read(self, n):
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += len(chunk)
+        return chunk
+
+
+class FakeWriter:
+    # stands in for the asyncio StreamWriter, counts bytes sent
+    def __init__(self):
+        self.sent = 0
+
+    def write(self, data):
+        self.sent += len(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+async def run(server, name, request, iterations, before_each=None):
+    writer = FakeWriter()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if before_each:
+            before_each()
+        await server.handle_client(FakeReader(request), writer)
+    elapsed = time.perf_counter() - start
+    print("{:<10} {:>9.0f} requests/sec  {:>6} bytes/request".format(
+        name, iterations / elapsed, writer.sent // iterations))
+
+
+def touch_settings():
+    # a settings change, as made by the web form or a clock button
+    settings.version += 1
+
+
+FORM = b'GET /form HTTP/1.1\r\nHost: nixieclock\r\n'
+INDEX = b'GET / HTTP/1.1\r\nHost: nixieclock\r\n'
+
+
+async def main(n):
+    server = webserver.my_HTTPserver(settings, lambda data: None)
+    await run(server, "uncached", FORM + b'\r\n', n, touch_settings)
+    await run(server, "cached", FORM + b'\r\n', n)
+    etag = server.get_etag()
+    await run(server, "304", FORM + b'If-None-Match: ' + etag + b'\r\n\r\n', n)
+    await run(server, "index", INDEX + b'\r\n', n)
+    etag = server.file_info(webserver.INDEX_FILE)[1]
+    await run(server, "index 304", INDEX + b'If-None-Match: ' + etag + b'\r\n\r\n', n)
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')) # for www/index.html
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -1,643 +1,1190 @@
-#===============================================
-# LCD driver for the Waveshare ST7789 1.14"
-# 240x134 pixel LCD
-#
-# Note that this is rotated 90 degrees anticlockwise,
-# so the screen coordinates when drawing text are:
-#
-#
-#        0,239 *================* 133,239
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#              |                |
-#          0,0 *================* 133,0
-#
-# However, due to the rotation, native framebuff
-# coordinates have the x and y axis swapped.
-#
-# By Gary Bleads, June 2023    gary@bleads.co.uk
-#===============================================
-
-# pico W has less ram than non wifi pico
-# so must create buffers before any imports or other code
-_display_buffer = bytearray(240 * 135 * 2)
- 
-from machine import Pin,SPI,PWM
-import framebuf
-import time
-import settings
-
-
-# ===========Start of FONTS Section=========================
-# Standard ASCII 5x8 font
-# https://gist.github.com/tdicola/229b3eeddc12d58fb0bc724a9062aa05
-FONT_HEIGHT = 8
-FONT_WIDTH = 5
-FONT = bytes([
-    0x00, 0x00, 0x00, 0x00, 0x00, # <space>
-    0x3E, 0x5B, 0x4F, 0x5B, 0x3E,
-    0x3E, 0x6B, 0x4F, 0x6B, 0x3E,
-    0x1C, 0x3E, 0x7C, 0x3E, 0x1C,
-    0x18, 0x3C, 0x7E, 0x3C, 0x18,
-    0x1C, 0x57, 0x7D, 0x57, 0x1C,
-    0x1C, 0x5E, 0x7F, 0x5E, 0x1C,
-    0x00, 0x18, 0x3C, 0x18, 0x00,
-    0xFF, 0xE7, 0xC3, 0xE7, 0xFF,
-    0x00, 0x18, 0x24, 0x18, 0x00,
-    0xFF, 0xE7, 0xDB, 0xE7, 0xFF,
-    0x30, 0x48, 0x3A, 0x06, 0x0E,
-    0x26, 0x29, 0x79, 0x29, 0x26,
-    0x40, 0x7F, 0x05, 0x05, 0x07,
-    0x40, 0x7F, 0x05, 0x25, 0x3F,
-    0x5A, 0x3C, 0xE7, 0x3C, 0x5A,
-    0x7F, 0x3E, 0x1C, 0x1C, 0x08,
-    0x08, 0x1C, 0x1C, 0x3E, 0x7F,
-    0x14, 0x22, 0x7F, 0x22, 0x14,
-    0x5F, 0x5F, 0x00, 0x5F, 0x5F,
-    0x06, 0x09, 0x7F, 0x01, 0x7F,
-    0x00, 0x66, 0x89, 0x95, 0x6A,
-    0x60, 0x60, 0x60, 0x60, 0x60,
-    0x94, 0xA2, 0xFF, 0xA2, 0x94,
-    0x08, 0x04, 0x7E, 0x04, 0x08, # UP
-    0x10, 0x20, 0x7E, 0x20, 0x10, # Down
-    0x08, 0x08, 0x2A, 0x1C, 0x08, # Right
-    0x08, 0x1C, 0x2A, 0x08, 0x08, # Left
-    0x1E, 0x10, 0x10, 0x10, 0x10,
-    0x0C, 0x1E, 0x0C, 0x1E, 0x0C,
-    0x30, 0x38, 0x3E, 0x38, 0x30,
-    0x06, 0x0E, 0x3E, 0x0E, 0x06,
-    0x00, 0x00, 0x00, 0x00, 0x00,
-    0x00, 0x00, 0x5F, 0x00, 0x00,
-    0x00, 0x07, 0x00, 0x07, 0x00,
-    0x14, 0x7F, 0x14, 0x7F, 0x14,
-    0x24, 0x2A, 0x7F, 0x2A, 0x12,
-    0x23, 0x13, 0x08, 0x64, 0x62,
-    0x36, 0x49, 0x56, 0x20, 0x50,
-    0x00, 0x08, 0x07, 0x03, 0x00,
-    0x00, 0x1C, 0x22, 0x41, 0x00,
-    0x00, 0x41, 0x22, 0x1C, 0x00,
-    0x2A, 0x1C, 0x7F, 0x1C, 0x2A,
-    0x08, 0x08, 0x3E, 0x08, 0x08,
-    0x00, 0x80, 0x70, 0x30, 0x00,
-    0x08, 0x08, 0x08, 0x08, 0x08,
-    0x00, 0x00, 0x60, 0x60, 0x00,
-    0x20, 0x10, 0x08, 0x04, 0x02,
-    0x3E, 0x51, 0x49, 0x45, 0x3E,
-    0x00, 0x42, 0x7F, 0x40, 0x00,
-    0x72, 0x49, 0x49, 0x49, 0x46,
-    0x21, 0x41, 0x49, 0x4D, 0x33,
-    0x18, 0x14, 0x12, 0x7F, 0x10,
-    0x27, 0x45, 0x45, 0x45, 0x39,
-    0x3C, 0x4A, 0x49, 0x49, 0x31,
-    0x41, 0x21, 0x11, 0x09, 0x07,
-    0x36, 0x49, 0x49, 0x49, 0x36,
-    0x46, 0x49, 0x49, 0x29, 0x1E,
-    0x00, 0x00, 0x14, 0x00, 0x00,
-    0x00, 0x40, 0x34, 0x00, 0x00,
-    0x00, 0x08, 0x14, 0x22, 0x41,
-    0x14, 0x14, 0x14, 0x14, 0x14,
-    0x00, 0x41, 0x22, 0x14, 0x08,
-    0x02, 0x01, 0x59, 0x09, 0x06,
-    0x3E, 0x41, 0x5D, 0x59, 0x4E,
-    0x7C, 0x12, 0x11, 0x12, 0x7C, # A
-    0x7F, 0x49, 0x49, 0x49, 0x36,
-    0x3E, 0x41, 0x41, 0x41, 0x22,
-    0x7F, 0x41, 0x41, 0x41, 0x3E,
-    0x7F, 0x49, 0x49, 0x49, 0x41,
-    0x7F, 0x09, 0x09, 0x09, 0x01,
-    0x3E, 0x41, 0x41, 0x51, 0x73,
-    0x7F, 0x08, 0x08, 0x08, 0x7F,
-    0x00, 0x41, 0x7F, 0x41, 0x00,
-    0x20, 0x40, 0x41, 0x3F, 0x01,
-    0x7F, 0x08, 0x14, 0x22, 0x41,
-    0x7F, 0x40, 0x40, 0x40, 0x40,
-    0x7F, 0x02, 0x1C, 0x02, 0x7F,
-    0x7F, 0x04, 0x08, 0x10, 0x7F,
-    0x3E, 0x41, 0x41, 0x41, 0x3E,
-    0x7F, 0x09, 0x09, 0x09, 0x06,
-    0x3E, 0x41, 0x51, 0x21, 0x5E,
-    0x7F, 0x09, 0x19, 0x29, 0x46,
-    0x26, 0x49, 0x49, 0x49, 0x32,
-    0x03, 0x01, 0x7F, 0x01, 0x03,
-    0x3F, 0x40, 0x40, 0x40, 0x3F,
-    0x1F, 0x20, 0x40, 0x20, 0x1F,
-    0x3F, 0x40, 0x38, 0x40, 0x3F,
-    0x63, 0x14, 0x08, 0x14, 0x63,
-    0x03, 0x04, 0x78, 0x04, 0x03,
-    0x61, 0x59, 0x49, 0x4D, 0x43,
-    0x00, 0x7F, 0x41, 0x41, 0x41,
-    0x02, 0x04, 0x08, 0x10, 0x20,
-    0x00, 0x41, 0x41, 0x41, 0x7F,
-    0x04, 0x02, 0x01, 0x02, 0x04,
-    0x40, 0x40, 0x40, 0x40, 0x40,
-    0x00, 0x03, 0x07, 0x08, 0x00,
-    0x20, 0x54, 0x54, 0x78, 0x40,
-    0x7F, 0x28, 0x44, 0x44, 0x38,
-    0x38, 0x44, 0x44, 0x44, 0x28,
-    0x38, 0x44, 0x44, 0x28, 0x7F,
-    0x38, 0x54, 0x54, 0x54, 0x18,
-    0x00, 0x08, 0x7E, 0x09, 0x02,
-    0x18, 0xA4, 0xA4, 0x9C, 0x78,
-    0x7F, 0x08, 0x04, 0x04, 0x78,
-    0x00, 0x44, 0x7D, 0x40, 0x00,
-    0x20, 0x40, 0x40, 0x3D, 0x00,
-    0x7F, 0x10, 0x28, 0x44, 0x00,
-    0x00, 0x41, 0x7F, 0x40, 0x00,
-    0x7C, 0x04, 0x78, 0x04, 0x78,
-    0x7C, 0x08, 0x04, 0x04, 0x78,
-    0x38, 0x44, 0x44, 0x44, 0x38,
-    0xFC, 0x18, 0x24, 0x24, 0x18,
-    0x18, 0x24, 0x24, 0x18, 0xFC,
-    0x7C, 0x08, 0x04, 0x04, 0x08,
-    0x48, 0x54, 0x54, 0x54, 0x24,
-    0x04, 0x04, 0x3F, 0x44, 0x24,
-    0x3C, 0x40, 0x40, 0x20, 0x7C,
-    0x1C, 0x20, 0x40, 0x20, 0x1C,
-    0x3C, 0x40, 0x30, 0x40, 0x3C,
-    0x44, 0x28, 0x10, 0x28, 0x44,
-    0x4C, 0x90, 0x90, 0x90, 0x7C,
-    0x44, 0x64, 0x54, 0x4C, 0x44,
-    0x00, 0x08, 0x36, 0x41, 0x00,
-    0x00, 0x00, 0x77, 0x00, 0x00,
-    0x00, 0x41, 0x36, 0x08, 0x00,
-    0x02, 0x01, 0x02, 0x04, 0x02,
-    0x3C, 0x26, 0x23, 0x26, 0x3C,
-    0x1E, 0xA1, 0xA1, 0x61, 0x12
-])
-
-
-
-
-#=================================================================
-#=================================================================
-#=================================================================
-# LCD Display Class. Based on the Waveshare 1.14" example
-#=================================================================
-#=================================================================
-#=================================================================
-class Display(framebuf.FrameBuffer):
-
-
-    def rgb_to_int (self,r,g,b):
-        
-        # return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
-        
-        r4 = (r & 0x80) >> 7
-        r3 = (r & 0x40) >> 6
-        r2 = (r & 0x20) >> 5
-        r1 = (r & 0x10) >> 4
-        r0 = (r & 0x08) >> 3
-
-        g5 = (g & 0x80) >> 7
-        g4 = (g & 0x40) >> 6
-        g3 = (g & 0x20) >> 5
-        g2 = (g & 0x10) >> 4
-        g1 = (g & 0x08) >> 3
-        g0 = (g & 0x04) >> 2
-        
-        b4 = (b & 0x80) >> 7
-        b3 = (b & 0x40) >> 6
-        b2 = (b & 0x20) >> 5
-        b1 = (b & 0x10) >> 4
-        b0 = (b & 0x08) >> 3
-        
-        rgb565 = ((g2 << 15) | (g1 << 14) | (g0 << 13) |
-                  (b4 << 12) | (b3 << 11) | (b2 << 10) | (b1 << 9) |(b0 << 8) |
-                  (r4 << 7) | (r3 << 6) | (r2 << 5) | (r1 << 4) | (r0 << 3) |
-                  (g5 << 2) | (g4 << 1) | g3 )
-                                    
-        return int(rgb565)
-
-    def hex_to_rgb565(self, hex_color):   
-        if hex_color.startswith('#'):
-            hex_color = hex_color[1:]  # Strip the '#' character if present
-        r, g, b = int(hex_color[:2], 16), int(hex_color[2:4], 16), int(hex_color[4:], 16)
-        return self.rgb_to_int(r,g,b)
-        # Convert the RGB values to RGB565
-        rgb565 = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
-        return rgb565
-
-    # Constructor
-    def __init__(self, active_font, hex_color):
-
-        self.width = 240
-        self.height = 135
-        self.red   =   self.rgb_to_int(255,0,0)
-        self.green =   self.rgb_to_int(0,255,0)
-        self.blue  =   self.rgb_to_int(0,255,0)
-        self.white =   self.rgb_to_int(255,255,255)
-        self.black =   self.rgb_to_int(0,0,0)
-
-        self.amber =   self.rgb_to_int(255,64,0)
-        self.yellow=   self.rgb_to_int(255,255,0)
-        self.cyan  =   self.rgb_to_int(0,255,255)
-        
-        self.text_fg = self.hex_to_rgb565(hex_color)
-        self.text_bg = self.black
-        
-        self.selected_digit = 0;
-        self.cs1 = Pin(settings.CS1_PIN,Pin.OUT)
-        self.cs2 = Pin(settings.CS2_PIN,Pin.OUT)
-        self.cs3 = Pin(settings.CS3_PIN,Pin.OUT)
-        self.rst = Pin(settings.RST_PIN,Pin.OUT)        
-        self.bl  = Pin(settings.BL_PIN)        
-        
-        # set the LCD backlight level
-        self.pwm = PWM(self.bl)
-        self.pwm.freq(1000)
-        self.set_brightness(10)
-        
-        # Use Hardware SPI for speed. 
-        self.spi = SPI(1,
-                       25_000_000,
-                       polarity=0,
-                       phase=0,
-                       sck=Pin(settings.CLK_PIN),
-                       mosi=Pin(settings.DIN_PIN),
-                       miso=None)
-        
-         # this has to be after setting up SPI as the LCDs DC pin has been wired to the SPI1 miso input
-        self.dc = Pin(settings.DC_PIN,Pin.OUT)
-        self.dc.value(1)
-        
-        # Set up the frame buffer
-        global _display_buffer
-        self.buffer = _display_buffer
-        super().__init__(self.buffer, self.width, self.height, framebuf.RGB565)
-        
-        # Wiggle the LCD reset line
-        self.reset_all()
-        
-        # Reset all digits
-        for digit in range(0,6):
-            self.select_digit(digit)
-            self.init()
-            
-        self.set_font(active_font, hex_color)
-        
-        self.clear()
-        
-
-    # Change the backlight level from 0 to 100
-    # note in previous version this ranged from 0 to 10
-    def set_brightness(self, level):        
-        if (level < 0):
-            level = 0
-            
-        if (level > 100):
-            level = 100            
-            
-        self.pwm.duty_u16(655*level)
-    
-    
-    # Selects the current digit from 0 (left) to 5 (right)
-    def select_digit(self, num):
-        self.selected_digit = 5-num
-         
-
-    # chip select one LCD
-    def cs_l(self): 
-        self.cs1.value(self.selected_digit&0x01)
-        self.cs2.value((self.selected_digit>>1)&0x01)
-        self.cs3.value((self.selected_digit>>2)&0x01)
-                
-                
-    # release cip select for all LCDs
-    def cs_h(self):
-        self.cs1.value(1)
-        self.cs2.value(1)
-        self.cs3.value(1)
-
-
-    #  Write a single command byte to the current LCD
-    def write_cmd(self, cmd):
-        self.cs_h()
-        self.dc(0)
-        self.cs_l()
-        self.spi.write(bytearray([cmd]))
-        self.cs_h()
-
-
-    #  Write a single data byte to the current LCD
-    def write_data(self, buf):
-        self.cs_h()
-        self.dc(1)
-        self.cs_l()
-        self.spi.write(bytearray([buf]))
-        self.cs_h()
-
-    # Wiggle the LCD reset pins
-    def reset_all(self):
-        self.rst(1)
-        time.sleep(0.01)
-        self.rst(0)
-        time.sleep(0.01)
-        self.rst(1)
-        time.sleep(0.01)
-
-
-    # Initialise the currently selected LCD
-    def init(self):
-        self.write_cmd(0x36) # Set access mode (orientation, RGB/BGR order, etc.)
-        self.write_data(0x70) # Parameters for RGB color filter panel and screen rotation.
-
-        self.write_cmd(0x3A) # Set color format of the display interface.
-        self.write_data(0x05) # Set to 16-bit/pixel color mode.
-
-        self.write_cmd(0xB2) # Set front and back porch periods for normal display mode.
-        self.write_data(0x0C) # Front porch
-        self.write_data(0x0C) # Back porch
-        self.write_data(0x00) # Idle mode off
-        self.write_data(0x33) # Front porch of partial mode
-        self.write_data(0x33) # Back porch of partial mode
-        
-
-        self.write_cmd(0xB7) # Control the gate driving voltage.
-        self.write_data(0x35) # Gate control setting
-
-        self.write_cmd(0xBB) # Set the VCOM voltage for contrast adjustment.
-        self.write_data(0x19) # VCOM setting
-
-        self.write_cmd(0xC0) #  Set the LCM inversion and refresh settings.
-        self.write_data(0x2C) # LCM control setting
-
-        self.write_cmd(0xC2) # Enable VDV and VRH voltage control commands.
-        self.write_data(0x01) # Enable VDV and VRH
-
-        self.write_cmd(0xC3) # Set the voltage at which the display operates.
-        self.write_data(0x12) # VRH setting
-
-        self.write_cmd(0xC4) # Set the amplitude of the display voltage.
-        self.write_data(0x20) # VDV setting
-
-        self.write_cmd(0xC6) # Adjust the frame rate of the display in normal mode.
-        self.write_data(0x0F) # Frame rate control setting
-
-        self.write_cmd(0xD0) # Control the power settings for the display.
-        self.write_data(0xA4) # Setting for the DVDD voltage
-        self.write_data(0xA1) # Setting related to VCIRE, which is a voltage setting
-
-        self.write_cmd(0xE0) # Adjust the gamma curve of the display (positive).
-        # These values adjust the curve to control the brightness and color of the display positively.
-        self.write_data(0xD0)
-        self.write_data(0x04)
-        self.write_data(0x0D)
-        self.write_data(0x11)
-        self.write_data(0x13)
-        self.write_data(0x2B)
-        self.write_data(0x3F)
-        self.write_data(0x54)
-        self.write_data(0x4C)
-        self.write_data(0x18)
-        self.write_data(0x0D)
-        self.write_data(0x0B)
-        self.write_data(0x1F)
-        self.write_data(0x23)
-
-        self.write_cmd(0xE1) # Adjust the gamma curve of the display (negative).
-        # These values adjust the curve to control the brightness and color of the display negatively.
-        self.write_data(0xD0)
-        self.write_data(0x04)
-        self.write_data(0x0C)
-        self.write_data(0x11)
-        self.write_data(0x13)
-        self.write_data(0x2C)
-        self.write_data(0x3F)
-        self.write_data(0x44)
-        self.write_data(0x51)
-        self.write_data(0x2F)
-        self.write_data(0x1F)
-        self.write_data(0x1F)
-        self.write_data(0x20)
-        self.write_data(0x23)
-
-        self.write_cmd(0x21) # Enable display color inversion.
-        self.write_cmd(0x11) # Exit sleep mode.
-        self.write_cmd(0x29) # Turn on the display.
-
-
-
-    # Sends the entire frame buffer to the currently selected LCD
-    def show(self):
-        self.write_cmd(0x2A)
-        self.write_data(0x00)
-        self.write_data(0x28)
-        self.write_data(0x01)
-        self.write_data(0x17)
-        
-        self.write_cmd(0x2B)
-        self.write_data(0x00)
-        self.write_data(0x35)
-        self.write_data(0x00)
-        self.write_data(0xBB)
-        
-        self.write_cmd(0x2C)
-        
-        self.cs_h()
-        self.dc(1)
-        self.cs_l()
-        self.spi.write(self.buffer)
-        self.cs_h()
-        
-
-    # Clears all digits to black
-    def clear (self):
-        for d in range(0,6):
-            self.select_digit(d)
-            self.fill(self.black)
-            self.show()
-
-
-    # Displays a single character.
-    # The coordinates are for the bottom left of the character
-    def print_char(self, letter, left, top, col):
-        code = ord(letter) * 5    # 5 bytes per character
-        for ii in range(5):
-            line = FONT[code + 4 - ii]
-            for yy in range(8):
-                if (line >> yy) & 0x1:
-                    
-                    # Draw the character 4x oversized
-                    x0 = ii*4+109-left
-                    x1 = x0+1
-                    x2 = x1+1
-                    x3 = x2+1
-                    
-                    y0 = yy*4+205-top
-                    y1 = y0+1
-                    y2 = y1+1
-                    y3 = y2+1
-                    
-                    self.pixel(y0,x0,col) 
-                    self.pixel(y1,x0,col) 
-                    self.pixel(y2,x0,col) 
-                    self.pixel(y3,x0,col) 
-                    self.pixel(y0,x1,col) 
-                    self.pixel(y1,x1,col) 
-                    self.pixel(y2,x1,col) 
-                    self.pixel(y3,x1,col) 
-                    self.pixel(y0,x2,col) 
-                    self.pixel(y1,x2,col) 
-                    self.pixel(y2,x2,col) 
-                    self.pixel(y3,x2,col) 
-                    self.pixel(y0,x3,col) 
-                    self.pixel(y1,x3,col) 
-                    self.pixel(y2,x3,col) 
-                    self.pixel(y3,x3,col) 
-
-
-    # Displays up to six short words of text on the current LCD, centred X and Y
-    def display_text(self,line):
-        
-        self.fill(self.black)
-        
-        words = line.split(" ")
-        height = len(words) * 32
-        top = int(self.width/2 + height/2) - 20
-        
-        for word in words:
-            width = len(word) * 24
-            left = int((self.height - width)/2)-4
-            
-            for letter in word:
-                self.print_char(letter, left, top, self.fg_colour)
-                left = left + 24
-                
-            top = top - 40        
-        
-        self.show()
-
-    # Loads a number image file onto the selected LCD,
-    # i.e. display_digit(0) displays file "0.raw"
-    #
-    # This is based on a binary image file (RGB565) with the same dimensions as the screen
-    # updates the global display_buffer directly, reading the file in 1KB chunks for speed
-    # The .raw image files must be preprocessed before uploading to the Pico.
-    #
-    # see https://www.penguintutor.com/programming/picodisplayanimations
-    # for a python program to generate the files in the correct format.
-    def display_nixie (self, num):
-        
-        if num is not None:
-            position = 0
-            blocksize = 1024
-
-            filename = str(int(num)) + ".raw"
-            with open (filename, "rb") as file:
-                chunk = file.read(blocksize)        
-                while chunk:
-                    self.buffer[position:position+len(chunk)] = chunk
-                    position = position + len(chunk)
-                    chunk = file.read(blocksize)
-        else:
-            print("Clearing digit ", self.selected_digit)
-            self.fill(self.black)
-        
-        self.show()
-        
-
-    # Display single digits as dots on a 5x7 matrix
-    def display_dots(self, digit):
-                           
-        # Create a small buffer and draw the pixel shape into it
-        pixelsize = 24
-        fb = framebuf.FrameBuffer(bytearray(pixelsize*pixelsize*2), pixelsize, pixelsize, framebuf.RGB565)
-        fb.ellipse(12, 12, 11, 11, self.fg_colour, True)
-         
-        # copy the pixel buffer into the LCD frame buffer for each lit dot
-        self.fill(self.black)
-        code = (ord("0") + int(digit)) * 5    # 5 bytes per character
-        for ii in range(5):
-            line = FONT[code + 4 - ii]
-            for yy in range(8):
-                if (line >> yy) & 0x1:
-                    # add the pixel with a little spacing
-                    self.blit(fb, yy*(pixelsize+6)+20, ii*pixelsize+6)
-        self.show()
-        
-
-
-    def display_7seg(self, digit):
-        digits = [0b1111110, # 0
-                  0b0110000, # 1
-                  0b1101101, # 2
-                  0b1111001, # 3
-                  0b0110011, # 4
-                  0b1011011, # 5
-                  0b0011111, # 6
-                  0b1110000, # 7
-                  0b1111111, # 8
-                  0b1110011] # 9
-                
-        self.fill(self.black)
-        
-        segments = digits[int(digit)]
-    
-        if (segments & 0x40) > 0:  # segment A
-            self.rect(0,0,24,135, self.fg_colour, True)
-
-        if (segments & 0x20) > 0:  # segment B
-            self.rect(0,0,120,24, self.fg_colour, True)
-
-        if (segments & 0x10) > 0:  # segment C
-            self.rect(116,0,120,24, self.fg_colour, True)
-            
-        if (segments & 0x08) > 0:  # segment D
-            self.rect(219,0,24,135, self.fg_colour, True)
-            
-        if (segments & 0x04) > 0:  # segment E
-            self.rect(116,115,120,24, self.fg_colour, True)
-            
-        if (segments & 0x02) > 0:  # segment F
-            self.rect(0,115,120,24, self.fg_colour, True)
-            
-        if (segments & 0x01) > 0:  # segment G
-            self.rect(110,0,24,135, self.fg_colour, True)
-            
-        self.show()
-        
-    def set_font(self, font, hex_color):
-        self.font_style = font
-        self.fg_colour = self.hex_to_rgb565(hex_color)
-        # print("font style = {}, hex color{} rgb565 {}:".format(font, hex_color, self.fg_colour))
-        
-    def display_digit(self, digit):
-        if self.font_style == "nixie":
-            self.display_nixie(digit)
-            
-        elif self.font_style == "dot":
-            self.display_dots(digit)            
-        else:
-            self.display_7seg(digit)
-
-
-    def show_colon(self, digit, visible):
-        self.select_digit(digit)
-        self.fill(self.black)
-        
-        if visible:
-            self.ellipse(80, 70, 12, 12, self.fg_colour, True)
-            self.ellipse(150, 70, 12, 12, self.fg_colour, True)
-        self.show()
-
-"""
-lcd = Display('7seg', "#ff0000")
-lcd.clear()
-lcd.set_font('7seg', "#ff0000")
-lcd.set_brightness(50)
-lcd.select_digit(5) 
-lcd.display_text("Await WiFi")
-lcd.select_digit(0) 
-lcd.display_digit(8)
-"""
-
-                           
+#===============================================
+# LCD driver for the Waveshare ST7789 1.14"
+# 240x134 pixel LCD
+#
+# Note that this is rotated 90 degrees anticlockwise,
+# so the screen coordinates when drawing text are:
+#
+#
+#        0,239 *================* 133,239
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#              |                |
+#          0,0 *================* 133,0
+#
+# However, due to the rotation, native framebuff
+# coordinates have the x and y axis swapped.
+#
+# By Gary Bleads, June 2023    gary@bleads.co.uk
+#===============================================
+
+# pico W has less ram than non wifi pico
+# so must create buffers before any imports or other code
+#
+# Without a frame buffer every frame is drawn and sent a strip at a time (see
+# Display.render), which saves 50KB of heap. FRAME_BUFFER = True keeps the full
+# 64,800 byte frame buffer, so main.py can draw the next second ahead of its tick.
+FRAME_BUFFER = False
+STRIP_ROWS = 15  # rows per strip, the 135 rows of a frame are 9 strips of 7200 bytes
+STRIP_COUNT = 2  # strip buffers, one is sent while the next is drawn
+if FRAME_BUFFER:
+    _display_buffer = bytearray(240 * 135 * 2)
+    _strip_buffers = None
+else:
+    _display_buffer = None
+    _strip_buffers = [bytearray(240 * STRIP_ROWS * 2) for i in range(STRIP_COUNT)]
+ 
+from machine import Pin,SPI,PWM
+import framebuf
+import time
+import gc
+from array import array
+import settings
+import stats
+
+try:
+    from rp2 import DMA # MicroPython 1.22 and later
+except ImportError:
+    DMA = None
+
+# Strip mode: nixie images are read from flash a strip at a time into the strip
+# buffers while DMA sends the previous strip to the LCD, so reading and sending
+# overlap. Without a frame buffer it is always on. With one it needs rp2.DMA and
+# STRIP_COUNT of 2 or more, and is only used if the strips leave STRIP_MIN_FREE
+# bytes of heap, otherwise each image is loaded into the frame buffer and then sent.
+STRIP_MIN_FREE = 40000   # bytes of heap to leave free
+SPI1_SSPDR = 0x40040008  # SPI1 data register, DMA writes the strips here
+DREQ_SPI1_TX = 18        # SPI1 transmit FIFO data request, paces the DMA
+DELTA_FILE = "deltas.bin" # rectangles that change between nixie digits, from fonts/delta_convert.py
+# Nixie digits as one byte of brightness per pixel, coloured with the nixie colour setting
+# through a palette. Used instead of the .raw images if 0.idx is on the Pico, see fonts/index_convert.py
+INDEX_SUFFIX = ".idx"
+
+# Digit transitions (see Display.transition_frame) mix two digits a strip at a time
+# with integer lookups. BLEND_TABLE[w * 64 + v] is v * w / BLEND_LEVELS for a 5 or 6 bit
+# colour channel v, so a pixel at level w of the new digit is, per channel,
+# BLEND_TABLE[(BLEND_LEVELS - w) * 64 + old] + BLEND_TABLE[w * 64 + new]
+# Halves are rounded down, so the two entries never add up to more than the channel holds
+BLEND_LEVELS = 16
+BLEND_TABLE = bytes((v * w + BLEND_LEVELS // 2 - 1) // BLEND_LEVELS for w in range(BLEND_LEVELS + 1) for v in range(64))
+# blend levels of the new digit through a flicker transition, like a tube that is slow to strike
+FLICKER = bytes((0, 11, 2, 16, 4, 9, 16, 6, 14, 16, 10, 16))
+
+# Pixel loops, viper on the Pico and plain Python elsewhere.
+# The pixels are big endian RGB565, as in the frame buffer and sent to the LCDs
+try:
+    import micropython
+
+    # Swaps the two bytes of each pixel in buf[:n], turning the big endian RGB565 sent to the
+    # LCDs into the little endian RGB565 of a BMP file. This runs for every row of a screenshot
+    @micropython.viper
+    def swap_pixel_bytes(buf, n: int):
+        p = ptr8(buf)
+        i = 0
+        while i < n:
+            t = p[i]
+            p[i] = p[i + 1]
+            p[i + 1] = t
+            i += 2
+
+    # Blends the pixels of src[:n] into dst[:n] at level of BLEND_LEVELS, 0 leaves dst
+    @micropython.viper
+    def blend_pixels(dst, src, n: int, level: int):
+        d = ptr8(dst)
+        s = ptr8(src)
+        t = ptr8(BLEND_TABLE)
+        a = (int(BLEND_LEVELS) - level) << 6
+        b = level << 6
+        i = 0
+        while i < n:
+            h = d[i]
+            l = d[i + 1]
+            h2 = s[i]
+            l2 = s[i + 1]
+            r = t[a + (h >> 3)] + t[b + (h2 >> 3)]
+            g = t[a + (((h & 7) << 3) | (l >> 5))] + t[b + (((h2 & 7) << 3) | (l2 >> 5))]
+            d[i] = (r << 3) | (g >> 3)
+            d[i + 1] = ((g & 7) << 5) | (t[a + (l & 31)] + t[b + (l2 & 31)])
+            i += 2
+
+    # Looks up the n palette indexes in src, writing their colours to dst[:2 * n].
+    # palette is an array('H') of 256 colours as the frame buffer holds them
+    @micropython.viper
+    def palette_expand(dst, src, n: int, palette):
+        d = ptr16(dst)
+        s = ptr8(src)
+        p = ptr16(palette)
+        i = 0
+        while i < n:
+            d[i] = p[s[i]]
+            i += 1
+
+    # Moves each row of dst[:n] along by shift bytes, filling the start of the row with
+    # the last shift bytes of the same row of src. Rows are row bytes long
+    @micropython.viper
+    def roll_pixels(dst, src, n: int, row: int, shift: int):
+        d = ptr8(dst)
+        s = ptr8(src)
+        r = 0
+        while r < n:
+            i = r + row - 1
+            while i >= r + shift:
+                d[i] = d[i - shift]
+                i -= 1
+            i = 0
+            while i < shift:
+                d[r + i] = s[r + row - shift + i]
+                i += 1
+            r += row
+
+    swap_pixel_bytes(bytearray(2), 2) # ptr8 is only defined where viper is compiled
+except (ImportError, NameError):
+    def swap_pixel_bytes(buf, n):
+        buf[0:n:2], buf[1:n:2] = buf[1:n:2], buf[0:n:2]
+
+    def blend_pixels(dst, src, n, level):
+        t = BLEND_TABLE
+        a = (BLEND_LEVELS - level) << 6
+        b = level << 6
+        for i in range(0, n, 2):
+            h, l, h2, l2 = dst[i], dst[i + 1], src[i], src[i + 1]
+            g = t[a + (((h & 7) << 3) | (l >> 5))] + t[b + (((h2 & 7) << 3) | (l2 >> 5))]
+            dst[i] = ((t[a + (h >> 3)] + t[b + (h2 >> 3)]) << 3) | (g >> 3)
+            dst[i + 1] = ((g & 7) << 5) | (t[a + (l & 31)] + t[b + (l2 & 31)])
+
+    def palette_expand(dst, src, n, palette):
+        for i in range(n):
+            v = palette[src[i]]
+            dst[2 * i] = v & 0xFF
+            dst[2 * i + 1] = v >> 8
+
+    def roll_pixels(dst, src, n, row, shift):
+        for r in range(0, n, row):
+            dst[r + shift:r + row] = dst[r:r + row - shift]
+            dst[r:r + shift] = src[r + row - shift:r + row]
+
+
+# ===========Start of FONTS Section=========================
+# Standard ASCII 5x8 font
+# https://gist.github.com/tdicola/229b3eeddc12d58fb0bc724a9062aa05
+FONT_HEIGHT = 8
+FONT_WIDTH = 5
+FONT = bytes([
+    0x00, 0x00, 0x00, 0x00, 0x00, # <space>
+    0x3E, 0x5B, 0x4F, 0x5B, 0x3E,
+    0x3E, 0x6B, 0x4F, 0x6B, 0x3E,
+    0x1C, 0x3E, 0x7C, 0x3E, 0x1C,
+    0x18, 0x3C, 0x7E, 0x3C, 0x18,
+    0x1C, 0x57, 0x7D, 0x57, 0x1C,
+    0x1C, 0x5E, 0x7F, 0x5E, 0x1C,
+    0x00, 0x18, 0x3C, 0x18, 0x00,
+    0xFF, 0xE7, 0xC3, 0xE7, 0xFF,
+    0x00, 0x18, 0x24, 0x18, 0x00,
+    0xFF, 0xE7, 0xDB, 0xE7, 0xFF,
+    0x30, 0x48, 0x3A, 0x06, 0x0E,
+    0x26, 0x29, 0x79, 0x29, 0x26,
+    0x40, 0x7F, 0x05, 0x05, 0x07,
+    0x40, 0x7F, 0x05, 0x25, 0x3F,
+    0x5A, 0x3C, 0xE7, 0x3C, 0x5A,
+    0x7F, 0x3E, 0x1C, 0x1C, 0x08,
+    0x08, 0x1C, 0x1C, 0x3E, 0x7F,
+    0x14, 0x22, 0x7F, 0x22, 0x14,
+    0x5F, 0x5F, 0x00, 0x5F, 0x5F,
+    0x06, 0x09, 0x7F, 0x01, 0x7F,
+    0x00, 0x66, 0x89, 0x95, 0x6A,
+    0x60, 0x60, 0x60, 0x60, 0x60,
+    0x94, 0xA2, 0xFF, 0xA2, 0x94,
+    0x08, 0x04, 0x7E, 0x04, 0x08, # UP
+    0x10, 0x20, 0x7E, 0x20, 0x10, # Down
+    0x08, 0x08, 0x2A, 0x1C, 0x08, # Right
+    0x08, 0x1C, 0x2A, 0x08, 0x08, # Left
+    0x1E, 0x10, 0x10, 0x10, 0x10,
+    0x0C, 0x1E, 0x0C, 0x1E, 0x0C,
+    0x30, 0x38, 0x3E, 0x38, 0x30,
+    0x06, 0x0E, 0x3E, 0x0E, 0x06,
+    0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x5F, 0x00, 0x00,
+    0x00, 0x07, 0x00, 0x07, 0x00,
+    0x14, 0x7F, 0x14, 0x7F, 0x14,
+    0x24, 0x2A, 0x7F, 0x2A, 0x12,
+    0x23, 0x13, 0x08, 0x64, 0x62,
+    0x36, 0x49, 0x56, 0x20, 0x50,
+    0x00, 0x08, 0x07, 0x03, 0x00,
+    0x00, 0x1C, 0x22, 0x41, 0x00,
+    0x00, 0x41, 0x22, 0x1C, 0x00,
+    0x2A, 0x1C, 0x7F, 0x1C, 0x2A,
+    0x08, 0x08, 0x3E, 0x08, 0x08,
+    0x00, 0x80, 0x70, 0x30, 0x00,
+    0x08, 0x08, 0x08, 0x08, 0x08,
+    0x00, 0x00, 0x60, 0x60, 0x00,
+    0x20, 0x10, 0x08, 0x04, 0x02,
+    0x3E, 0x51, 0x49, 0x45, 0x3E,
+    0x00, 0x42, 0x7F, 0x40, 0x00,
+    0x72, 0x49, 0x49, 0x49, 0x46,
+    0x21, 0x41, 0x49, 0x4D, 0x33,
+    0x18, 0x14, 0x12, 0x7F, 0x10,
+    0x27, 0x45, 0x45, 0x45, 0x39,
+    0x3C, 0x4A, 0x49, 0x49, 0x31,
+    0x41, 0x21, 0x11, 0x09, 0x07,
+    0x36, 0x49, 0x49, 0x49, 0x36,
+    0x46, 0x49, 0x49, 0x29, 0x1E,
+    0x00, 0x00, 0x14, 0x00, 0x00,
+    0x00, 0x40, 0x34, 0x00, 0x00,
+    0x00, 0x08, 0x14, 0x22, 0x41,
+    0x14, 0x14, 0x14, 0x14, 0x14,
+    0x00, 0x41, 0x22, 0x14, 0x08,
+    0x02, 0x01, 0x59, 0x09, 0x06,
+    0x3E, 0x41, 0x5D, 0x59, 0x4E,
+    0x7C, 0x12, 0x11, 0x12, 0x7C, # A
+    0x7F, 0x49, 0x49, 0x49, 0x36,
+    0x3E, 0x41, 0x41, 0x41, 0x22,
+    0x7F, 0x41, 0x41, 0x41, 0x3E,
+    0x7F, 0x49, 0x49, 0x49, 0x41,
+    0x7F, 0x09, 0x09, 0x09, 0x01,
+    0x3E, 0x41, 0x41, 0x51, 0x73,
+    0x7F, 0x08, 0x08, 0x08, 0x7F,
+    0x00, 0x41, 0x7F, 0x41, 0x00,
+    0x20, 0x40, 0x41, 0x3F, 0x01,
+    0x7F, 0x08, 0x14, 0x22, 0x41,
+    0x7F, 0x40, 0x40, 0x40, 0x40,
+    0x7F, 0x02, 0x1C, 0x02, 0x7F,
+    0x7F, 0x04, 0x08, 0x10, 0x7F,
+    0x3E, 0x41, 0x41, 0x41, 0x3E,
+    0x7F, 0x09, 0x09, 0x09, 0x06,
+    0x3E, 0x41, 0x51, 0x21, 0x5E,
+    0x7F, 0x09, 0x19, 0x29, 0x46,
+    0x26, 0x49, 0x49, 0x49, 0x32,
+    0x03, 0x01, 0x7F, 0x01, 0x03,
+    0x3F, 0x40, 0x40, 0x40, 0x3F,
+    0x1F, 0x20, 0x40, 0x20, 0x1F,
+    0x3F, 0x40, 0x38, 0x40, 0x3F,
+    0x63, 0x14, 0x08, 0x14, 0x63,
+    0x03, 0x04, 0x78, 0x04, 0x03,
+    0x61, 0x59, 0x49, 0x4D, 0x43,
+    0x00, 0x7F, 0x41, 0x41, 0x41,
+    0x02, 0x04, 0x08, 0x10, 0x20,
+    0x00, 0x41, 0x41, 0x41, 0x7F,
+    0x04, 0x02, 0x01, 0x02, 0x04,
+    0x40, 0x40, 0x40, 0x40, 0x40,
+    0x00, 0x03, 0x07, 0x08, 0x00,
+    0x20, 0x54, 0x54, 0x78, 0x40,
+    0x7F, 0x28, 0x44, 0x44, 0x38,
+    0x38, 0x44, 0x44, 0x44, 0x28,
+    0x38, 0x44, 0x44, 0x28, 0x7F,
+    0x38, 0x54, 0x54, 0x54, 0x18,
+    0x00, 0x08, 0x7E, 0x09, 0x02,
+    0x18, 0xA4, 0xA4, 0x9C, 0x78,
+    0x7F, 0x08, 0x04, 0x04, 0x78,
+    0x00, 0x44, 0x7D, 0x40, 0x00,
+    0x20, 0x40, 0x40, 0x3D, 0x00,
+    0x7F, 0x10, 0x28, 0x44, 0x00,
+    0x00, 0x41, 0x7F, 0x40, 0x00,
+    0x7C, 0x04, 0x78, 0x04, 0x78,
+    0x7C, 0x08, 0x04, 0x04, 0x78,
+    0x38, 0x44, 0x44, 0x44, 0x38,
+    0xFC, 0x18, 0x24, 0x24, 0x18,
+    0x18, 0x24, 0x24, 0x18, 0xFC,
+    0x7C, 0x08, 0x04, 0x04, 0x08,
+    0x48, 0x54, 0x54, 0x54, 0x24,
+    0x04, 0x04, 0x3F, 0x44, 0x24,
+    0x3C, 0x40, 0x40, 0x20, 0x7C,
+    0x1C, 0x20, 0x40, 0x20, 0x1C,
+    0x3C, 0x40, 0x30, 0x40, 0x3C,
+    0x44, 0x28, 0x10, 0x28, 0x44,
+    0x4C, 0x90, 0x90, 0x90, 0x7C,
+    0x44, 0x64, 0x54, 0x4C, 0x44,
+    0x00, 0x08, 0x36, 0x41, 0x00,
+    0x00, 0x00, 0x77, 0x00, 0x00,
+    0x00, 0x41, 0x36, 0x08, 0x00,
+    0x02, 0x01, 0x02, 0x04, 0x02,
+    0x3C, 0x26, 0x23, 0x26, 0x3C,
+    0x1E, 0xA1, 0xA1, 0x61, 0x12
+])
+
+
+
+
+# Strip buffers sent to the selected LCD, by DMA if there is rp2.DMA so one strip is
+# sent while the next is filled, otherwise by spi.write before the next is filled
+class StripWriter(object):
+    def __init__(self, spi, width, rows, strips):
+        self.spi = spi
+        self.strips = strips
+        # each strip as a frame buffer of its rows, for drawing into
+        self.bands = [framebuf.FrameBuffer(strip, width, rows, framebuf.RGB565) for strip in strips]
+        self.index = 0
+        self.dma = DMA() if DMA else None
+        if self.dma:
+            self.ctrl = self.dma.pack_ctrl(size=0, inc_write=False, treq_sel=DREQ_SPI1_TX)
+
+    # The strip to fill next, DMA is not reading it as only one strip is sent at a time
+    def next(self):
+        return self.strips[self.index]
+
+    # The strip from next() as a frame buffer
+    def next_band(self):
+        return self.bands[self.index]
+
+    # Starts sending the first nbytes of the strip from next() once the previous one has gone.
+    # With advance False next() stays on the same strip, to send it again to another LCD
+    def send(self, nbytes, advance=True):
+        strip = self.strips[self.index]
+        if self.dma is None:
+            self.spi.write(strip if nbytes == len(strip) else memoryview(strip)[:nbytes])
+        else:
+            self.wait()
+            self.dma.config(read=strip, write=SPI1_SSPDR, count=nbytes,
+                            ctrl=self.ctrl, trigger=True)
+        if advance:
+            self.index = (self.index + 1) % len(self.strips)
+
+    # Waits until the last strip has been sent
+    def wait(self):
+        if self.dma is None:
+            return
+        while self.dma.active():
+            pass
+        time.sleep_us(4) # the SPI FIFO still holds up to 8 bytes
+
+    def close(self):
+        if self.dma:
+            self.wait()
+            self.dma.close()
+
+
+#=================================================================
+#=================================================================
+#=================================================================
+# LCD Display Class. Based on the Waveshare 1.14" example
+#=================================================================
+#=================================================================
+#=================================================================
+class Display(framebuf.FrameBuffer):
+
+
+    def rgb_to_int (self,r,g,b):
+        
+        # return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+        
+        r4 = (r & 0x80) >> 7
+        r3 = (r & 0x40) >> 6
+        r2 = (r & 0x20) >> 5
+        r1 = (r & 0x10) >> 4
+        r0 = (r & 0x08) >> 3
+
+        g5 = (g & 0x80) >> 7
+        g4 = (g & 0x40) >> 6
+        g3 = (g & 0x20) >> 5
+        g2 = (g & 0x10) >> 4
+        g1 = (g & 0x08) >> 3
+        g0 = (g & 0x04) >> 2
+        
+        b4 = (b & 0x80) >> 7
+        b3 = (b & 0x40) >> 6
+        b2 = (b & 0x20) >> 5
+        b1 = (b & 0x10) >> 4
+        b0 = (b & 0x08) >> 3
+        
+        rgb565 = ((g2 << 15) | (g1 << 14) | (g0 << 13) |
+                  (b4 << 12) | (b3 << 11) | (b2 << 10) | (b1 << 9) |(b0 << 8) |
+                  (r4 << 7) | (r3 << 6) | (r2 << 5) | (r1 << 4) | (r0 << 3) |
+                  (g5 << 2) | (g4 << 1) | g3 )
+                                    
+        return int(rgb565)
+
+    def hex_to_rgb565(self, hex_color):   
+        if hex_color.startswith('#'):
+            hex_color = hex_color[1:]  # Strip the '#' character if present
+        r, g, b = int(hex_color[:2], 16), int(hex_color[2:4], 16), int(hex_color[4:], 16)
+        return self.rgb_to_int(r,g,b)
+        # Convert the RGB values to RGB565
+        rgb565 = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+        return rgb565
+
+    # colour is a settings.Colour, already converted, or a hex string
+    def colour_to_rgb565(self, colour):
+        if isinstance(colour, settings.Colour):
+            return colour.rgb565
+        return self.hex_to_rgb565(colour)
+
+    # Constructor
+    def __init__(self, active_font, colour):
+
+        self.width = 240
+        self.height = 135
+        self.red   =   self.rgb_to_int(255,0,0)
+        self.green =   self.rgb_to_int(0,255,0)
+        self.blue  =   self.rgb_to_int(0,255,0)
+        self.white =   self.rgb_to_int(255,255,255)
+        self.black =   self.rgb_to_int(0,0,0)
+
+        self.amber =   self.rgb_to_int(255,64,0)
+        self.yellow=   self.rgb_to_int(255,255,0)
+        self.cyan  =   self.rgb_to_int(0,255,255)
+        
+        self.text_fg = self.colour_to_rgb565(colour)
+        self.text_bg = self.black
+        
+        self.selected_digit = 0;
+        self.frames = 0 # count of show() calls, tells whether the frame buffer has been sent since it was drawn
+        # what each LCD shows, by chip select, as (kind, value, font, colour) where
+        # draw_<kind>(value) in that font and colour draws it again, see snapshot()
+        self.shadow = [None] * 6
+        self.drawn = None # the same for the frame buffer, recorded for the LCD by show()
+        self.cs1 = Pin(settings.CS1_PIN,Pin.OUT)
+        self.cs2 = Pin(settings.CS2_PIN,Pin.OUT)
+        self.cs3 = Pin(settings.CS3_PIN,Pin.OUT)
+        self.rst = Pin(settings.RST_PIN,Pin.OUT)        
+        self.bl  = Pin(settings.BL_PIN)        
+        
+        # set the LCD backlight level
+        self.pwm = PWM(self.bl)
+        self.pwm.freq(1000)
+        self.set_brightness(10)
+        
+        # Use Hardware SPI for speed. 
+        self.spi = SPI(1,
+                       25_000_000,
+                       polarity=0,
+                       phase=0,
+                       sck=Pin(settings.CLK_PIN),
+                       mosi=Pin(settings.DIN_PIN),
+                       miso=None)
+        
+         # this has to be after setting up SPI as the LCDs DC pin has been wired to the SPI1 miso input
+        self.dc = Pin(settings.DC_PIN,Pin.OUT)
+        self.dc.value(1)
+        self.strips = None
+        self.transition_strip = None # the new digit's rows in a transition, made on first use
+        
+        # Set up the frame buffer
+        global _display_buffer
+        self.buffer = _display_buffer
+        if self.buffer is None:
+            # no frame buffer, frames are drawn into the strips by render(). The display's own
+            # frame buffer methods only reach the first strip, draw with the display_ methods
+            self.strips = StripWriter(self.spi, self.width, STRIP_ROWS, _strip_buffers)
+            self.band_rows = STRIP_ROWS
+            super().__init__(_strip_buffers[0], self.width, STRIP_ROWS, framebuf.RGB565)
+        else:
+            self.band_rows = self.height # rows drawn at a time
+            super().__init__(self.buffer, self.width, self.height, framebuf.RGB565)
+        
+        # Wiggle the LCD reset line
+        self.reset_all()
+        
+        # Reset all digits
+        for digit in range(0,6):
+            self.select_digit(digit)
+            self.init()
+            
+        self.dot = framebuf.FrameBuffer(bytearray(24*24*2), 24, 24, framebuf.RGB565)
+        # nixie images as palette indexes if the Pico has them, see nixie_file
+        self.palette = None
+        self.palette_colour = None # the colour the palette was filled for
+        try:
+            open("0" + INDEX_SUFFIX).close()
+            self.palette = array('H', [0] * 256)
+            self.index_buf = bytearray(STRIP_ROWS * self.width) # indexes read for a strip of pixels
+        except OSError:
+            pass
+        self.set_font(active_font, colour)
+        self.deltas = self.load_deltas()
+        
+        self.clear()
+        strips = self.use_strips() # allocates the strips and turns on DMA with a frame buffer
+        print("display strip mode", "on" if strips else "off")
+
+
+    # Turns strip mode on if DMA is available and there is enough heap for the strips,
+    # returns True if it is on. Without a frame buffer it is always on
+    def use_strips(self, on=True):
+        if self.buffer is None:
+            return True
+        if self.strips:
+            self.strips.close()
+            self.strips = None
+        if on and DMA and STRIP_COUNT > 1:
+            gc.collect()
+            size = STRIP_ROWS * self.width * 2
+            if gc.mem_free() - STRIP_COUNT * size >= STRIP_MIN_FREE:
+                self.strips = StripWriter(self.spi, self.width, STRIP_ROWS,
+                                          [bytearray(size) for i in range(STRIP_COUNT)])
+        return self.strips is not None
+        
+
+    # Change the backlight level from 0 to 100
+    # note in previous version this ranged from 0 to 10
+    def set_brightness(self, level):        
+        if (level < 0):
+            level = 0
+            
+        if (level > 100):
+            level = 100            
+            
+        self.pwm.duty_u16(655*level)
+    
+    
+    # Selects the current digit from 0 (left) to 5 (right)
+    def select_digit(self, num):
+        self.selected_digit = 5-num
+         
+
+    # chip select one LCD
+    def cs_l(self): 
+        self.cs1.value(self.selected_digit&0x01)
+        self.cs2.value((self.selected_digit>>1)&0x01)
+        self.cs3.value((self.selected_digit>>2)&0x01)
+                
+                
+    # release cip select for all LCDs
+    def cs_h(self):
+        self.cs1.value(1)
+        self.cs2.value(1)
+        self.cs3.value(1)
+
+
+    #  Write a single command byte to the current LCD
+    def write_cmd(self, cmd):
+        self.cs_h()
+        self.dc(0)
+        self.cs_l()
+        self.spi.write(bytearray([cmd]))
+        self.cs_h()
+        if stats.enabled:
+            stats.counters[stats.SPI_BYTES] += 1
+
+
+    #  Write a single data byte to the current LCD
+    def write_data(self, buf):
+        self.cs_h()
+        self.dc(1)
+        self.cs_l()
+        self.spi.write(bytearray([buf]))
+        self.cs_h()
+        if stats.enabled:
+            stats.counters[stats.SPI_BYTES] += 1
+
+    # Wiggle the LCD reset pins
+    def reset_all(self):
+        self.rst(1)
+        time.sleep(0.01)
+        self.rst(0)
+        time.sleep(0.01)
+        self.rst(1)
+        time.sleep(0.01)
+
+
+    # Initialise the currently selected LCD
+    def init(self):
+        self.write_cmd(0x36) # Set access mode (orientation, RGB/BGR order, etc.)
+        self.write_data(0x70) # Parameters for RGB color filter panel and screen rotation.
+
+        self.write_cmd(0x3A) # Set color format of the display interface.
+        self.write_data(0x05) # Set to 16-bit/pixel color mode.
+
+        self.write_cmd(0xB2) # Set front and back porch periods for normal display mode.
+        self.write_data(0x0C) # Front porch
+        self.write_data(0x0C) # Back porch
+        self.write_data(0x00) # Idle mode off
+        self.write_data(0x33) # Front porch of partial mode
+        self.write_data(0x33) # Back porch of partial mode
+        
+
+        self.write_cmd(0xB7) # Control the gate driving voltage.
+        self.write_data(0x35) # Gate control setting
+
+        self.write_cmd(0xBB) # Set the VCOM voltage for contrast adjustment.
+        self.write_data(0x19) # VCOM setting
+
+        self.write_cmd(0xC0) #  Set the LCM inversion and refresh settings.
+        self.write_data(0x2C) # LCM control setting
+
+        self.write_cmd(0xC2) # Enable VDV and VRH voltage control commands.
+        self.write_data(0x01) # Enable VDV and VRH
+
+        self.write_cmd(0xC3) # Set the voltage at which the display operates.
+        self.write_data(0x12) # VRH setting
+
+        self.write_cmd(0xC4) # Set the amplitude of the display voltage.
+        self.write_data(0x20) # VDV setting
+
+        self.write_cmd(0xC6) # Adjust the frame rate of the display in normal mode.
+        self.write_data(0x0F) # Frame rate control setting
+
+        self.write_cmd(0xD0) # Control the power settings for the display.
+        self.write_data(0xA4) # Setting for the DVDD voltage
+        self.write_data(0xA1) # Setting related to VCIRE, which is a voltage setting
+
+        self.write_cmd(0xE0) # Adjust the gamma curve of the display (positive).
+        # These values adjust the curve to control the brightness and color of the display positively.
+        self.write_data(0xD0)
+        self.write_data(0x04)
+        self.write_data(0x0D)
+        self.write_data(0x11)
+        self.write_data(0x13)
+        self.write_data(0x2B)
+        self.write_data(0x3F)
+        self.write_data(0x54)
+        self.write_data(0x4C)
+        self.write_data(0x18)
+        self.write_data(0x0D)
+        self.write_data(0x0B)
+        self.write_data(0x1F)
+        self.write_data(0x23)
+
+        self.write_cmd(0xE1) # Adjust the gamma curve of the display (negative).
+        # These values adjust the curve to control the brightness and color of the display negatively.
+        self.write_data(0xD0)
+        self.write_data(0x04)
+        self.write_data(0x0C)
+        self.write_data(0x11)
+        self.write_data(0x13)
+        self.write_data(0x2C)
+        self.write_data(0x3F)
+        self.write_data(0x44)
+        self.write_data(0x51)
+        self.write_data(0x2F)
+        self.write_data(0x1F)
+        self.write_data(0x1F)
+        self.write_data(0x20)
+        self.write_data(0x23)
+
+        self.write_cmd(0x21) # Enable display color inversion.
+        self.write_cmd(0x11) # Exit sleep mode.
+        self.write_cmd(0x29) # Turn on the display.
+
+
+
+    # Draws a frame with draw_<kind>(arg, fb, dy) and sends it to the currently selected LCD.
+    # With a frame buffer it is drawn once with the display as fb and dy 0. Without one
+    # it is drawn for each strip in turn with fb the strip and dy its first row, so it
+    # draws at y - dy and leaves rows outside the strip to clipping. Strips are sent as
+    # they are drawn, by DMA while the next one is drawn
+    def render(self, kind, arg):
+        record = self.content(kind, arg)
+        if self.showing(record):
+            return
+        draw = getattr(self, 'draw_' + kind)
+        if self.buffer is not None:
+            draw(arg, self, 0)
+            self.drawn = record
+            self.show()
+            return
+        strips = self.strips
+        self.begin_frame()
+        for dy in range(0, self.height, STRIP_ROWS):
+            draw(arg, strips.next_band(), dy)
+            strips.send(min(STRIP_ROWS, self.height - dy) * self.width * 2)
+        strips.wait()
+        self.cs_h()
+        self.shadow[self.selected_digit] = record
+        if stats.enabled:
+            stats.counters[stats.SPI_BYTES] += self.width * self.height * 2
+
+    # Sends the entire frame buffer to the currently selected LCD
+    def show(self):
+        self.begin_frame()
+        self.spi.write(self.buffer)
+        self.cs_h()
+        self.frames += 1
+        # unknown if the frame buffer was drawn with the framebuf methods since, so not recorded twice
+        self.shadow[self.selected_digit] = self.drawn
+        self.drawn = None
+        if stats.enabled:
+            stats.counters[stats.SPI_BYTES] += len(self.buffer)
+
+    # Sets the whole screen as the drawing window and leaves the LCD selected for pixel data
+    def begin_frame(self):
+        self.begin_window(0, 0, self.width, self.height)
+
+    # Sets a w by h drawing window at frame buffer position x, y and leaves the LCD selected
+    # for pixel data. The visible pixels start at column 40 and row 53 of the LCD's memory
+    def begin_window(self, x, y, w, h):
+        x += 40
+        y += 53
+        self.write_cmd(0x2A)
+        self.write_data(x >> 8)
+        self.write_data(x & 0xFF)
+        self.write_data((x + w - 1) >> 8)
+        self.write_data((x + w - 1) & 0xFF)
+        
+        self.write_cmd(0x2B)
+        self.write_data(y >> 8)
+        self.write_data(y & 0xFF)
+        self.write_data((y + h - 1) >> 8)
+        self.write_data((y + h - 1) & 0xFF)
+        
+        self.write_cmd(0x2C)
+        
+        self.cs_h()
+        self.dc(1)
+        self.cs_l()
+        
+
+    # A shadow record of a frame drawn now. A digit is recorded as the font's kind
+    # so records of the same picture compare equal however it was drawn
+    def content(self, kind, value):
+        if kind == 'digit' and value is not None:
+            kind = 'nixie' if self.font_style == 'nixie' else 'dots' if self.font_style == 'dot' else '7seg'
+        return (kind, value, self.font_style, self.colour)
+
+    # True if the selected LCD already shows the frame of a shadow record, so it need not be sent
+    def showing(self, record):
+        if record != self.shadow[self.selected_digit]:
+            return False
+        if stats.enabled:
+            stats.counters[stats.SKIPPED_FRAMES] += 1
+        return True
+
+    # The shadow record of each LCD from the left, for the web server
+    def shadow_state(self):
+        state = []
+        for digit in range(6):
+            record = self.shadow[5 - digit]
+            if record is None:
+                state.append({'digit': digit, 'kind': None})
+                continue
+            kind, value, font, colour = record
+            state.append({'digit': digit, 'kind': kind, 'value': value, 'font': font,
+                          'colour': colour.hex if isinstance(colour, settings.Colour) else colour})
+        return state
+
+    # Yields the frame last sent to a digit's LCD as little endian RGB565 rows, the pixel
+    # rows of a BMP file. It is drawn again from the shadow record a band at a time into buf,
+    # or read from flash for a nixie image, so no frame sized buffer is needed
+    def snapshot(self, digit, buf):
+        kind, value, font, colour = self.shadow[5 - digit] or ('digit', None, self.font_style, self.colour)
+        rows = len(buf) // (self.width * 2)
+        mv = memoryview(buf)
+        if kind == 'nixie':
+            palette = None
+            if self.palette is not None and colour != self.palette_colour:
+                palette = array('H', [0] * 256) # for the colour it was shown in
+                self.fill_palette(palette, colour)
+            size = min(rows, STRIP_ROWS) * self.width * 2
+            with self.nixie_file(value) as file:
+                n = self.read_nixie(file, buf, size, palette)
+                while n:
+                    swap_pixel_bytes(buf, n)
+                    yield mv[:n]
+                    n = self.read_nixie(file, buf, size, palette)
+            return
+        band = framebuf.FrameBuffer(buf, self.width, rows, framebuf.RGB565)
+        for dy in range(0, self.height, rows):
+            n = min(rows, self.height - dy) * self.width * 2
+            # in the recorded font and colour, put back before yielding as the clock may draw meanwhile.
+            # These draw_ methods do not use the nixie palette, so it is left as it is
+            current = (self.font_style, self.colour)
+            if (font, colour) != current:
+                self.use_font(font, colour)
+            getattr(self, 'draw_' + kind)(value, band, dy)
+            if (font, colour) != current:
+                self.use_font(*current)
+            swap_pixel_bytes(buf, n)
+            yield mv[:n]
+
+    # Clears all digits to black
+    def clear (self):
+        for d in range(0,6):
+            self.select_digit(d)
+            self.display_digit(None)
+
+
+    # Displays a single character.
+    # The coordinates are for the bottom left of the character
+    def print_char(self, letter, left, top, col, fb=None, dy=0):
+        if fb is None:
+            fb = self
+        row = 109-left-dy # first frame buffer row of the character, its 5 columns are 20 rows
+        if row >= self.band_rows or row + 20 <= 0:
+            return # not in this strip
+        code = ord(letter) * 5    # 5 bytes per character
+        for ii in range(5):
+            line = FONT[code + 4 - ii]
+            for yy in range(8):
+                if (line >> yy) & 0x1:
+                    # Draw the character 4x oversized
+                    fb.fill_rect(yy*4+205-top, ii*4+row, 4, 4, col)
+
+
+    # Displays up to six short words of text on the current LCD, centred X and Y
+    def display_text(self,line):
+        self.render('text', line)
+
+    def draw_text(self, line, fb=None, dy=0):
+        if fb is None:
+            fb = self
+            self.drawn = self.content('text', line)
+        fb.fill(self.black)
+        
+        words = line.split(" ")
+        height = len(words) * 32
+        top = int(self.width/2 + height/2) - 20
+        
+        for word in words:
+            width = len(word) * 24
+            left = int((self.height - width)/2)-4
+            
+            for letter in word:
+                self.print_char(letter, left, top, self.fg_colour, fb, dy)
+                left = left + 24
+                
+            top = top - 40        
+
+    # Loads a number image file onto the selected LCD,
+    # i.e. display_digit(0) displays file "0.raw"
+    def display_nixie (self, num):
+        if num is not None and self.showing(self.content('nixie', num)):
+            return
+        if num is not None and self.strips:
+            self.stream_nixie(num)
+        elif num is None:
+            self.render('digit', None) # clears it
+        else:
+            self.load_nixie(num)
+            self.show()
+
+    # Opens the image file of a nixie digit: n.idx, palette indexes, if the Pico has them
+    # (see fonts/index_convert.py), otherwise n.raw, RGB565 pixels
+    def nixie_file(self, num):
+        return open(str(int(num)) + (INDEX_SUFFIX if self.palette is not None else ".raw"), "rb")
+
+    # Reads the next n bytes of pixels of a nixie image from file into buf, returns the bytes read.
+    # From a .idx file n / 2 indexes are read into index_buf and looked up in palette, by default
+    # the one for the current colour. n is at most the size of a strip
+    def read_nixie(self, file, buf, n, palette=None):
+        if self.palette is None:
+            return file.readinto(buf if n == len(buf) else memoryview(buf)[:n])
+        index = self.index_buf
+        k = file.readinto(index if n == len(index) * 2 else memoryview(index)[:n // 2])
+        palette_expand(buf, index, k, palette or self.palette)
+        return k * 2
+
+    # Sends a number image file to the selected LCD in strip mode,
+    # each strip is read while DMA sends the one before. The frame buffer is not changed.
+    # If the LCD shows a digit that deltas.bin has the changes from, only they are sent
+    def stream_nixie(self, num):
+        shown = self.shadow[self.selected_digit]
+        if shown and shown[0] == 'nixie' and shown[2:] == (self.font_style, self.colour):
+            rects = self.deltas.get((shown[1], int(num)))
+            if rects:
+                self.stream_delta(num, rects)
+                return
+        strips = self.strips
+        size = 0
+        with self.nixie_file(num) as file:
+            self.begin_frame()
+            n = self.read_nixie(file, strips.next(), len(strips.next()))
+            while n:
+                strips.send(n)
+                size += n
+                n = self.read_nixie(file, strips.next(), len(strips.next()))
+            strips.wait()
+        self.cs_h()
+        self.shadow[self.selected_digit] = self.content('nixie', num)
+        if stats.enabled:
+            stats.counters[stats.FLASH_BYTES] += size if self.palette is None else size // 2
+            stats.counters[stats.SPI_BYTES] += size
+
+    # Sends the rectangles of a number image file that differ from the digit the LCD shows,
+    # rects being x, y, w, h bytes for each. Each is sent to its own window, its rows read
+    # into the strips and each strip sent by DMA while the next is read
+    def stream_delta(self, num, rects):
+        strips = self.strips
+        pixel_bytes = 2 if self.palette is None else 1 # in the file
+        size = 0
+        with self.nixie_file(num) as file:
+            for i in range(0, len(rects), 4):
+                x, y, w, h = rects[i], rects[i + 1], rects[i + 2], rects[i + 3]
+                window = (x, y, w, h) # set once the first strip of the rectangle is read
+                strip = memoryview(strips.next())
+                n = 0
+                for row in range(y, y + h):
+                    if n + w * 2 > len(strip):
+                        self.send_to_window(window, n)
+                        window = None
+                        size += n
+                        strip = memoryview(strips.next())
+                        n = 0
+                    file.seek((row * self.width + x) * pixel_bytes)
+                    n += self.read_nixie(file, strip[n:n + w * 2], w * 2)
+                self.send_to_window(window, n)
+                size += n
+            strips.wait()
+        self.cs_h()
+        self.shadow[self.selected_digit] = self.content('nixie', num)
+        if stats.enabled:
+            stats.counters[stats.FLASH_BYTES] += size * pixel_bytes // 2
+            stats.counters[stats.SPI_BYTES] += size
+
+    # Sends n bytes of the strip from next(), moving the LCD's window first if one is given.
+    # The window only moves once the strip before has been sent
+    def send_to_window(self, window, n):
+        if window:
+            self.strips.wait()
+            self.begin_window(*window)
+        self.strips.send(n)
+
+    # Reads the rectangles that change between nixie digits written by fonts/delta_convert.py.
+    # Returns a dict of (from, to) digits to x, y, w, h bytes for each rectangle, empty without the file
+    def load_deltas(self):
+        deltas = {}
+        try:
+            with open(DELTA_FILE, "rb") as file:
+                data = file.read()
+        except OSError:
+            return deltas
+        if data[:4] != b"DLT1":
+            print(DELTA_FILE, "is not a delta file")
+            return deltas
+        pos = 6
+        for i in range(data[4] | (data[5] << 8)):
+            count = data[pos + 2] | (data[pos + 3] << 8)
+            deltas[(data[pos], data[pos + 1])] = data[pos + 4:pos + 4 + count * 4]
+            pos += 4 + count * 4
+        return deltas
+
+    # Sends one frame of a change from digit old to new in the current font to the selected LCD,
+    # progress going from 0 (old) to 256 (new). effect is 'crossfade', 'roll' or 'flicker'.
+    # Each strip has the old digit's rows drawn, or read for a nixie image, into it and the
+    # new digit's into transition_strip, then mixed by blend_pixels or roll_pixels and sent by
+    # DMA while the next is made. Returns False, sending nothing, if there are no strips
+    def transition_frame(self, effect, old, new, progress):
+        strips = self.strips
+        if strips is None:
+            return False
+        if self.transition_strip is None:
+            self.transition_strip = bytearray(STRIP_ROWS * self.width * 2)
+            self.transition_band = framebuf.FrameBuffer(self.transition_strip, self.width, STRIP_ROWS, framebuf.RGB565)
+        row = self.width * 2
+        if effect == 'roll':
+            shift = progress * self.width // 256 * 2 # the new digit rolls down from the top
+        elif effect == 'flicker':
+            level = FLICKER[progress * (len(FLICKER) - 1) // 256]
+        else:
+            level = progress * BLEND_LEVELS // 256
+        nixie = self.font_style == 'nixie'
+        if nixie:
+            old_file = self.nixie_file(old)
+            new_file = self.nixie_file(new)
+        try:
+            self.begin_frame()
+            for dy in range(0, self.height, STRIP_ROWS):
+                n = min(STRIP_ROWS, self.height - dy) * row
+                strip = strips.next()
+                if nixie:
+                    self.read_nixie(old_file, strip, len(strip))
+                    self.read_nixie(new_file, self.transition_strip, len(strip))
+                else:
+                    self.draw_digit(old, strips.next_band(), dy)
+                    self.draw_digit(new, self.transition_band, dy)
+                if effect == 'roll':
+                    roll_pixels(strip, self.transition_strip, n, row, shift)
+                else:
+                    blend_pixels(strip, self.transition_strip, n, level)
+                strips.send(n)
+            strips.wait()
+        finally:
+            if nixie:
+                old_file.close()
+                new_file.close()
+        self.cs_h()
+        self.shadow[self.selected_digit] = None # part way between two records
+        if stats.enabled:
+            stats.counters[stats.SPI_BYTES] += self.width * self.height * 2
+            if nixie:
+                stats.counters[stats.FLASH_BYTES] += self.width * self.height * (4 if self.palette is None else 2)
+        return True
+
+    # Loads a number image file into the frame buffer without sending it
+    #
+    # This is based on a binary image file (RGB565) with the same dimensions as the screen
+    # updates the global display_buffer directly, reading the file in 1KB chunks for speed
+    # The .raw image files must be preprocessed before uploading to the Pico, .idx files
+    # are read through the palette (see nixie_file)
+    #
+    # see https://www.penguintutor.com/programming/picodisplayanimations
+    # for a python program to generate the files in the correct format.
+    def load_nixie(self, num):
+        if num is not None:
+            position = 0
+            blocksize = 1024
+
+            mv = memoryview(self.buffer)
+            with self.nixie_file(num) as file:
+                n = self.read_nixie(file, mv[0:blocksize], blocksize)
+                while n:
+                    position = position + n
+                    n = self.read_nixie(file, mv[position:position+blocksize], blocksize)
+            if stats.enabled:
+                stats.counters[stats.FLASH_BYTES] += position if self.palette is None else position // 2
+            self.drawn = self.content('nixie', num)
+        else:
+            print("Clearing digit ", self.selected_digit)
+            self.fill(self.black)
+            self.drawn = self.content('digit', None)
+        
+
+    # Display single digits as dots on a 5x7 matrix
+    def display_dots(self, digit):
+        self.render('dots', digit)
+
+    def draw_dots(self, digit, fb=None, dy=0):
+        if fb is None:
+            fb = self
+            self.drawn = self.content('dots', digit)
+        pixelsize = 24
+        # copy the pixel buffer into the LCD frame buffer for each lit dot
+        fb.fill(self.black)
+        code = (ord("0") + int(digit)) * 5    # 5 bytes per character
+        for ii in range(5):
+            y = ii*pixelsize+6-dy
+            if y >= self.band_rows or y + pixelsize <= 0:
+                continue # this row of dots is not in the strip
+            line = FONT[code + 4 - ii]
+            for yy in range(8):
+                if (line >> yy) & 0x1:
+                    # add the pixel with a little spacing
+                    fb.blit(self.dot, yy*(pixelsize+6)+20, y)
+        
+
+
+    def display_7seg(self, digit):
+        self.render('7seg', digit)
+
+    def draw_7seg(self, digit, fb=None, dy=0):
+        if fb is None:
+            fb = self
+            self.drawn = self.content('7seg', digit)
+        digits = [0b1111110, # 0
+                  0b0110000, # 1
+                  0b1101101, # 2
+                  0b1111001, # 3
+                  0b0110011, # 4
+                  0b1011011, # 5
+                  0b0011111, # 6
+                  0b1110000, # 7
+                  0b1111111, # 8
+                  0b1110011] # 9
+                
+        fb.fill(self.black)
+        
+        segments = digits[int(digit)]
+    
+        if (segments & 0x40) > 0:  # segment A
+            fb.rect(0,0-dy,24,135, self.fg_colour, True)
+
+        if (segments & 0x20) > 0:  # segment B
+            fb.rect(0,0-dy,120,24, self.fg_colour, True)
+
+        if (segments & 0x10) > 0:  # segment C
+            fb.rect(116,0-dy,120,24, self.fg_colour, True)
+            
+        if (segments & 0x08) > 0:  # segment D
+            fb.rect(219,0-dy,24,135, self.fg_colour, True)
+            
+        if (segments & 0x04) > 0:  # segment E
+            fb.rect(116,115-dy,120,24, self.fg_colour, True)
+            
+        if (segments & 0x02) > 0:  # segment F
+            fb.rect(0,115-dy,120,24, self.fg_colour, True)
+            
+        if (segments & 0x01) > 0:  # segment G
+            fb.rect(110,0-dy,24,135, self.fg_colour, True)
+        
+    def set_font(self, font, colour):
+        self.use_font(font, colour)
+        if self.palette is not None and font == "nixie" and colour != self.palette_colour:
+            self.fill_palette(self.palette, colour)
+            self.palette_colour = colour
+        # print("font style = {}, colour {} rgb565 {}:".format(font, colour, self.fg_colour))
+        
+    # Sets the font and colour the draw_ methods use, leaving the nixie palette to set_font
+    def use_font(self, font, colour):
+        self.font_style = font
+        self.colour = colour
+        self.fg_colour = self.colour_to_rgb565(colour)
+        # the dot for the dot font, drawn once and copied for each lit dot
+        self.dot.fill(self.black)
+        self.dot.ellipse(12, 12, 11, 11, self.fg_colour, True)
+
+    # Fills palette with the colours of 256 brightness levels of a nixie tube in colour. Like the
+    # glow in the photographs, the strongest part of the colour lights first and the others
+    # follow as it brightens, so the tube is deep in hue where dim, passes through the colour
+    # and is white, or grey for a dark colour, at the middle of the strokes
+    def fill_palette(self, palette, colour):
+        if isinstance(colour, settings.Colour):
+            r, g, b = colour.rgb
+        else:
+            colour = colour.lstrip('#')
+            r, g, b = int(colour[:2], 16), int(colour[2:4], 16), int(colour[4:], 16)
+        top = max(r, g, b)
+        for i in range(256):
+            level = 3 * i # the sum of the red, green and blue the .idx files hold a third of
+            rr = min(top, max(0, level - top + r))
+            gg = min(top, max(0, level - top + g))
+            bb = min(top, max(0, level - top + b))
+            rgb565 = ((rr & 0xF8) << 8) | ((gg & 0xFC) << 3) | (bb >> 3)
+            palette[i] = ((rgb565 & 0xFF) << 8) | (rgb565 >> 8)  # byte swapped for the LCD framebuffer
+
+    # Displays a digit in the current font, None clears the LCD
+    def display_digit(self, digit):
+        if self.font_style == "nixie" and digit is not None:
+            self.display_nixie(digit) # streamed in strip mode
+        else:
+            self.render('digit', digit)
+
+    # Draws a digit in the current font into the frame buffer without sending it,
+    # so it can be prepared ahead of the time it is shown
+    def draw_digit(self, digit, fb=None, dy=0):
+        if fb is None:
+            fb = self
+            self.drawn = self.content('digit', digit)
+        if digit is None:
+            fb.fill(self.black)
+
+        elif self.font_style == "nixie":
+            self.load_nixie(digit) # only with a frame buffer, render() does not call this
+            
+        elif self.font_style == "dot":
+            self.draw_dots(digit, fb, dy)
+        else:
+            self.draw_7seg(digit, fb, dy)
+
+
+    def show_colon(self, digit, visible):
+        self.select_digit(digit)
+        self.render('colon', visible)
+
+    def draw_colon(self, visible, fb=None, dy=0):
+        if fb is None:
+            fb = self
+            self.drawn = self.content('colon', visible)
+        fb.fill(self.black)
+        
+        if visible:
+            fb.ellipse(80, 70-dy, 12, 12, self.fg_colour, True)
+            fb.ellipse(150, 70-dy, 12, 12, self.fg_colour, True)
+
+"""
+lcd = Display('7seg', "#ff0000")
+lcd.clear()
+lcd.set_font('7seg', "#ff0000")
+lcd.set_brightness(50)
+lcd.select_digit(5) 
+lcd.display_text("Await WiFi")
+lcd.select_digit(0) 
+lcd.display_digit(8)
+"""
+
+                           
         
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+  events.py  Copyright (c) 2024 Michael Margolis
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED
+"""
+
+"""
+Publishes clock state changes (time, digits, alarm, ntp sync) to subscribers
+such as the web server's /events stream.
+Each subscriber has a small bounded queue. An event replaces any unsent event
+of the same name, so a slow subscriber only ever holds the latest state of
+each kind and memory use does not grow while it catches up.
+"""
+
+import json
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class Subscriber(object):
+    def __init__(self, max_pending):
+        self.pending = [] # (name, payload) tuples, oldest first
+        self.max_pending = max_pending
+        self.dropped = 0  # events discarded because the queue was full
+        self.ready = asyncio.Event()
+
+    def put(self, name, payload):
+        for i in range(len(self.pending)):
+            if self.pending[i][0] == name:
+                del self.pending[i] # superseded by this newer event
+                break
+        else:
+            if len(self.pending) >= self.max_pending:
+                del self.pending[0]
+                self.dropped += 1
+        self.pending.append((name, payload))
+        self.ready.set()
+
+    def get(self):
+        # returns the oldest pending (name, payload) or None
+        if self.pending:
+            return self.pending.pop(0)
+        self.ready.clear()
+        return None
+
+
+class EventHub(object):
+    def __init__(self, max_subscribers=2, max_pending=8):
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.subscribers = []
+        self.latest = {} # most recent data for each event name, sent to new subscribers
+
+    def subscribe(self):
+        # returns a new Subscriber primed with the latest of each event, None if there are already max_subscribers
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        sub = Subscriber(self.max_pending)
+        for name in self.latest:
+            sub.put(name.encode(), json.dumps(self.latest[name]).encode())
+        self.subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub in self.subscribers:
+            self.subscribers.remove(sub)
+
+    def publish(self, name, data):
+        # data is encoded once as json and shared by all subscribers
+        self.latest[name] = data
+        if not self.subscribers:
+            return
+        payload = json.dumps(data).encode()
+        name = name.encode()
+        for sub in self.subscribers:
+            sub.put(name, payload)
@@ -0,0 +1,111 @@
+# Finds the parts of each nixie image that change when the clock goes from one digit
+# to the next, so display.py can send only those parts instead of the whole frame.
+#
+# Run in the folder holding 0.raw to 9.raw (made by animation_convert.py):
+#     python delta_convert.py
+# and upload the deltas.bin it writes to the pi pico with the .raw files.
+# Without deltas.bin, or for pairs it does not list, whole frames are sent.
+#
+# deltas.bin is b'DLT1' and a count of pairs, then for each pair the digit it is
+# from, the digit it is to and a count of rectangles, then x, y, w, h of each
+# rectangle in frame buffer pixels (see display.py). Counts are 16 bit little
+# endian, everything else a byte. A pixel is left out only if it is identical in
+# both images, so the panel shows exactly the new image once its rectangles are sent.
+
+import struct
+
+WIDTH = 240
+HEIGHT = 135
+TILE = 8           # changed pixels are found in tiles of 8x8 and joined into rectangles
+RECT_COST = 400    # bytes of SPI time a rectangle costs in commands and per row flash reads
+MIN_SAVING = 0.1   # pairs that save less than this part of a frame are left to whole frames
+prefix = ""
+suffix = ".raw"
+outfile = "deltas.bin"
+
+# the digit changes the clock makes: each digit to the next, the tens of minutes and
+# seconds 5 to 0, the hours 23 to 00 in 24 hour mode and 12 to 1 in 12 hour mode
+PAIRS = [(n, (n + 1) % 10) for n in range(10)] + [(5, 0), (2, 0), (3, 0), (2, 1)]
+
+
+def load(digit):
+    with open(prefix + str(digit) + suffix, "rb") as file:
+        data = file.read()
+    if len(data) != WIDTH * HEIGHT * 2:
+        raise ValueError("{}{} is not a {}x{} RGB565 image".format(digit, suffix, WIDTH, HEIGHT))
+    return data
+
+
+def changed_rows(old, new):
+    # for each row, the columns where the two images differ
+    rows = []
+    for y in range(HEIGHT):
+        start = y * WIDTH * 2
+        a = old[start:start + WIDTH * 2]
+        b = new[start:start + WIDTH * 2]
+        rows.append([x for x in range(WIDTH) if a[x * 2:x * 2 + 2] != b[x * 2:x * 2 + 2]])
+    return rows
+
+
+def tile_runs(rows, y0):
+    # runs (first, last) of tile columns with a change in the band of rows from y0,
+    # with gaps too small to pay for another rectangle joined over
+    cols = sorted(set(x // TILE for row in rows[y0:y0 + TILE] for x in row))
+    band_rows = min(TILE, HEIGHT - y0)
+    runs = []
+    for c in cols:
+        if runs and (c - runs[-1][1] - 1) * TILE * band_rows * 2 < RECT_COST:
+            runs[-1][1] = c
+        else:
+            runs.append([c, c])
+    return runs
+
+
+def rectangles(rows):
+    # (x, y, w, h) rectangles that cover every changed pixel
+    rects = []  # [x0, y0, x1, y1] inclusive, in tiles for x
+    for y0 in range(0, HEIGHT, TILE):
+        y1 = min(HEIGHT, y0 + TILE) - 1
+        for c0, c1 in tile_runs(rows, y0):
+            # a run that spans the same tile columns as a rectangle ending in the band above extends it
+            for r in rects:
+                if r[0] == c0 and r[2] == c1 and r[3] == y0 - 1:
+                    r[3] = y1
+                    break
+            else:
+                rects.append([c0, y0, c1, y1])
+    out = []
+    for c0, y0, c1, y1 in rects:
+        # shrunk to the changed pixels inside it
+        x0, x1 = c0 * TILE, min(WIDTH, (c1 + 1) * TILE) - 1
+        ys = [y for y in range(y0, y1 + 1) if any(x0 <= x <= x1 for x in rows[y])]
+        xs = [x for y in ys for x in rows[y] if x0 <= x <= x1]
+        out.append((min(xs), ys[0], max(xs) - min(xs) + 1, ys[-1] - ys[0] + 1))
+    return out
+
+
+def delta_bytes(rects):
+    return sum(w * h * 2 for x, y, w, h in rects)
+
+
+def convert_all_files():
+    images = [load(d) for d in range(10)]
+    frame = WIDTH * HEIGHT * 2
+    out = []
+    for old, new in PAIRS:
+        rects = rectangles(changed_rows(images[old], images[new]))
+        cost = delta_bytes(rects) + RECT_COST * len(rects)
+        print("{} -> {}: {} rectangles, {} of {} bytes".format(old, new, len(rects), delta_bytes(rects), frame))
+        if cost <= frame * (1 - MIN_SAVING):
+            out.append((old, new, rects))
+    with open(outfile, "wb") as file:
+        file.write(b"DLT1" + struct.pack("<H", len(out)))
+        for old, new, rects in out:
+            file.write(struct.pack("<BBH", old, new, len(rects)))
+            for rect in rects:
+                file.write(struct.pack("BBBB", *rect))
+    print("{} of {} pairs written to {}".format(len(out), len(PAIRS), outfile))
+
+
+if __name__ == "__main__":
+    convert_all_files()
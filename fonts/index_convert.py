@@ -0,0 +1,47 @@
+# Stores the nixie images as the brightness of each pixel, so display.py can draw the tubes
+# in the colour chosen in the web UI instead of only the colour they were photographed in.
+#
+# Run in the folder holding 0.raw to 9.raw (made by animation_convert.py):
+#     python index_convert.py
+# and upload the 0.idx to 9.idx it writes to the pi pico. With 0.idx on the Pico the .idx
+# files are used instead of the .raw files, which can then be left off.
+#
+# An .idx file is a byte for each pixel, in the same order as the .raw file: the mean of its
+# red, green and blue as 0 to 255. display.py looks each byte up in a palette of 256 colours
+# for the nixie colour, made again only when the colour changes (see display.fill_palette).
+# The photographs glow red, so with a colour of #ff0000 the tubes look much as in the .raw
+# files. The files are half the size, so half as much is read from flash for each frame.
+
+from delta_convert import WIDTH, HEIGHT
+
+prefix = ""
+suffix = ".raw"
+outsuffix = ".idx"
+
+
+def brightness(data):
+    out = bytearray(WIDTH * HEIGHT)
+    for i in range(WIDTH * HEIGHT):
+        pixel = (data[i * 2] << 8) | data[i * 2 + 1]
+        r = (pixel >> 11) << 3
+        g = ((pixel >> 5) & 0x3F) << 2
+        b = (pixel & 0x1F) << 3
+        r, g, b = r | (r >> 5), g | (g >> 6), b | (b >> 5) # 0 to 255
+        out[i] = (r + g + b) // 3
+    return bytes(out)
+
+
+def convert_all_files():
+    for digit in range(10):
+        with open(prefix + str(digit) + suffix, "rb") as file:
+            data = file.read()
+        if len(data) != WIDTH * HEIGHT * 2:
+            raise ValueError("{}{} is not a {}x{} RGB565 image".format(digit, suffix, WIDTH, HEIGHT))
+        outfile = prefix + str(digit) + outsuffix
+        with open(outfile, "wb") as file:
+            file.write(brightness(data))
+        print("{} written".format(outfile))
+
+
+if __name__ == "__main__":
+    convert_all_files()
@@ -0,0 +1,95 @@
+# Packs a numbered set of .raw frames into one .seq file that animation.py plays on the LCDs,
+# such as splash.seq, played at boot, and chime.seq, played on the hour.
+#
+# Make the frames with animation_convert.py (setting its prefix and num_images), then in the
+# same folder run, for example
+#     python sequence_convert.py splash 12
+# to pack splash0.raw, splash1.raw, ... into splash.seq at 12 frames per second,
+# and upload splash.seq to the pi pico.
+#
+# A .seq file is b'SEQ1', then the width, height and count of frames as 16 bit little
+# endian, the frames per second as a byte and a spare byte. Each frame is a type byte and
+# the length of what follows as 32 bit little endian, then one of
+#   0 raw:   the RGB565 pixels of the frame
+#   1 RLE:   runs of a count of 1 to 255 pixels and the two bytes of the pixel
+#   2 delta: a count of rectangles as 16 bit, x, y, w, h of each as bytes, then the pixel
+#            rows of each rectangle, which are all that differ from the frame before
+# Each frame is stored in whichever is smallest. The first frame is never a delta, so
+# the sequence can be played again from the start.
+
+import os
+import struct
+import sys
+
+from delta_convert import WIDTH, HEIGHT, changed_rows, rectangles
+
+prefix = "splash"
+suffix = ".raw"
+fps = 12
+RAW, RLE, DELTA = 0, 1, 2
+MAX_RECTS = 255 # animation.py reads the rectangles of a frame into its 1024 byte buffer
+
+
+def load(name):
+    with open(name, "rb") as file:
+        data = file.read()
+    if len(data) != WIDTH * HEIGHT * 2:
+        raise ValueError("{} is not a {}x{} RGB565 image".format(name, WIDTH, HEIGHT))
+    return data
+
+
+def rle(frame):
+    out = bytearray()
+    i = 0
+    while i < len(frame):
+        pixel = frame[i:i + 2]
+        count = 1
+        while count < 255 and frame[i + count * 2:i + count * 2 + 2] == pixel:
+            count += 1
+        out += bytes((count,)) + pixel
+        i += count * 2
+    return bytes(out)
+
+
+def delta(old, new):
+    rects = rectangles(changed_rows(old, new))
+    if len(rects) > MAX_RECTS:
+        return None
+    out = bytearray(struct.pack("<H", len(rects)))
+    for rect in rects:
+        out += struct.pack("BBBB", *rect)
+    for x, y, w, h in rects:
+        for row in range(y, y + h):
+            start = (row * WIDTH + x) * 2
+            out += new[start:start + w * 2]
+    return bytes(out)
+
+
+def convert_sequence(prefix, fps):
+    frames = []
+    while os.path.exists(prefix + str(len(frames)) + suffix):
+        frames.append(load(prefix + str(len(frames)) + suffix))
+    if not frames:
+        raise ValueError("no frames named {}0{}".format(prefix, suffix))
+    outfile = prefix + ".seq"
+    with open(outfile, "wb") as file:
+        file.write(b"SEQ1" + struct.pack("<HHHBB", WIDTH, HEIGHT, len(frames), fps, 0))
+        for i, frame in enumerate(frames):
+            choices = [(RAW, frame), (RLE, rle(frame))]
+            if i:
+                changes = delta(frames[i - 1], frame)
+                if changes is not None:
+                    choices.append((DELTA, changes))
+            kind, data = min(choices, key=lambda c: len(c[1]))
+            print("frame {}: {} {} bytes".format(i, ("raw", "RLE", "delta")[kind], len(data)))
+            file.write(struct.pack("<BI", kind, len(data)))
+            file.write(data)
+    print("{} frames written to {}".format(len(frames), outfile))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        prefix = sys.argv[1]
+    if len(sys.argv) > 2:
+        fps = int(sys.argv[2])
+    convert_sequence(prefix, fps)
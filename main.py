@@ -1,321 +1,616 @@
-import time
-from machine import Pin,PWM
-
-import settings
-import display
-import ds3231
-import leds
-
-import wifi, secrets
-import ntptime
-import time_utils
-from button import Button
-
-from webserver import my_HTTPserver
-
-import micropython # for memory diags only
-
-micropython.alloc_emergency_exception_buf(100)  # Allocate buffer for interrupt exceptions
-
-"""
-WiFi/NTP code connects to router using credentials in the secrets.py file
-If connected, time_utils module attempts to set the machine.RTC using NTP time
-See wifi and time_utils modules for more info  
-"""
-net = wifi.wifi(10)
-
-DEBUG_MEM = False
-#=======================================================================
-# Helper Functions
-#=======================================================================
-
-  
-def alarm_callback(caller, is_alarm_toggle):
-    # toggle alarm on/off if is_alarm_toggle, else turn off buzzer if on
-    # mode button held for more than 2 seconds sets is_alarm_toggle True
-    if is_alarm_toggle:
-        if settings.get_setting("alarm_on") == "No":
-             settings.set_setting("alarm_on", 'Yes')
-        else:
-             settings.set_setting("alarm_on", 'No')
-        print("toggled alarm state to {}".format(settings.settings["alarm_on"]))
-        clock.update_info_text() 
-    clock.alarm.reset_trigger() 
-    print("clock trigger reset")
-
-def button_callback(caller, is_long_press):
-    if caller.name == "toggle_seconds":
-        if settings.get_setting("show_secs") == "No":
-            settings.set_setting("show_secs", "Yes")
-        else:
-            settings.set_setting("show_secs", "No")
-    elif caller.name == "sequence_font":
-        active_font = settings.get_setting("active_font")    
-        if active_font == "nixie":
-            settings.set_setting("active_font", "dot")
-        elif active_font =="dot":
-            settings.set_setting("active_font", "7seg")
-        elif active_font =="7seg":
-            settings.set_setting("active_font", "nixie")
-    clock.update_display_state()       
-    # in this version, settings.save_settings() is not called
-    
-#====================================================================
-# Alarm class
-#====================================================================
-class Alarm:
-    def __init__(self, leds, get_setting):
-        self.leds = leds
-        self.get_setting = get_setting
-        self.buzzer = PWM(Pin(settings.BUZZER_PIN, Pin.OUT))
-        self.buzzer.duty_u16(0)
-        self.triggered = False
-
-    def check(self, hour, minute, sec):
-        """sounds buzzer if given time matches the alarm time and if the trigger is enabled."""
-        alarm_enabled = self.get_setting("alarm_on")
-        alarm_hour = int(self.get_setting("alarm_hour"))
-        alarm_min = int(self.get_setting("alarm_min"))
-        # print(alarm_enabled, alarm_hour,hour, alarm_min,minute,sec)
-        if alarm_enabled == 'Yes' and alarm_hour == hour and alarm_min == minute and sec == 0:
-            self.triggered = True
-        if self.triggered:
-            if (sec % 2) == 0:
-                self.leds.rgb_strip.fill((255,255,255))
-            else:
-                leds.rgb_strip.fill((0,0,0))
-            self.leds.rgb_strip.write()
-            
-            self.buzzer.duty_u16(32768)
-            for i in range(0,4):
-                self.buzzer.freq(1500)
-                time.sleep(0.05)
-                self.buzzer.freq(2400)
-                time.sleep(0.05)
-            self.buzzer.duty_u16(0)
-            if alarm_min != minute:
-                self.triggered  = False # turn off alarm after one minute
-        
-    def reset_trigger(self):
-        # Stop the alarm
-        self.buzzer.duty_u16(0)
-        leds.set_color(settings.get_setting("led_color"), int(settings.get_setting("led_brightness")))
-        self.triggered  = False
-        
-       
-
-#====================================================================
-# Clock class
-#====================================================================
-class Clock():
-    tick = True # static flag to indcated 1hz isr trigger
-    
-    def __init__(self, lcd, leds, get_setting):
-        self.lcd = lcd
-        self.get_setting = get_setting # accesser for values in the settings module
-        self.alarm = Alarm(leds, get_setting)
-        self.active_font = None
-        self.info_text = None # text on digit 5 when not showing seconds
-        self.digits_cache = [None]*6
-        self.init_rtc()
-        
-    def init_rtc(self):
-        self.rtc_ds3231 = ds3231.DS3231(add = 0x68)
-        trim = int(self.get_setting("adjust_timing"))
-        print("setting rtc trim to {}".format(trim))
-        self.rtc_ds3231.Set_Timing(trim)
-        # Set up the handler to recieve a regular interrupt on the 1Hz output from the DS3231
-        rtc_1Hz_pin   = Pin(settings.RTC_1HZ_PIN, Pin.IN)
-        rtc_1Hz_pin.irq(trigger=Pin.IRQ_RISING, handler=self.rtc_1hz_isr)
-     
-  
-    def rtc_setter(self, dt):
-        # syncs ds3231 with the given time as python datetime tuple
-        self.rtc_ds3231.set_localtime(dt)
-        
-    @staticmethod
-    def rtc_1hz_isr(pin):
-        Clock.tick = True
-  
-    def show_digit_if_changed(self, digit, pos):
-        if digit != self.digits_cache[pos]:            
-            self.lcd.select_digit(pos)
-            if digit is None:
-                self.lcd.fill(self.lcd.black)
-                self.digits_cache[pos] = None
-            else:
-                self.lcd.display_digit(digit)
-                self.digits_cache[pos] = digit       
-            self.lcd.show()            
-
-    
-    def extract_digits(self, value):
-        # Assumes value is always two digits
-        return [value // 10, value % 10]
-
-    def show_time(self, hr, mins, sec):
-        digits = self.extract_digits(hr) + self.extract_digits(mins) + self.extract_digits(sec)
-        if self.get_setting("show_secs") == 'No':              
-            self.show_digit_if_changed(digits[3], 4)               
-            # Show tens of minute
-            self.show_digit_if_changed(digits[2], 3)
-            # show blinking colon
-            self.lcd.show_colon(2, digits[5]%2) # on every other second
-            self.digits_cache[2] = None # force digit display if changing to show_secs
-            # show hour. Suppress leading zero if in 12 hour mode
-            self.show_digit_if_changed(digits[1], 1)
-            
-            if self.get_setting("24_hour")=="24" or hr > 9:
-                self.show_digit_if_changed(digits[0], 0)
-            else:
-                self.show_digit_if_changed(None, 0)
-            self.update_info_text()       
-      
-        else:
-            # 6-digit mode : display hours, minutes and seconds
-            for idx, digit in enumerate(digits):
-                self.show_digit_if_changed(digit, idx)
-     
-    def update_info_text(self):
-        info_text = ""
-        if self.get_setting("show_date") == 'Yes':
-            month, day = self.rtc_ds3231.localtime()[1:3]
-            month_str = time_utils.months[month]
-            info_text += "{} {} ".format(month_str, day)
-        if self.get_setting("alarm_on") == 'Yes':
-            info_text += " Alarm {0}:{1:02d}".format(int(self.get_setting("alarm_hour")),
-                       int(self.get_setting("alarm_min")))
-        ##else:
-        ##    info_text += ("Alarm OFF")
-        # only update if changed
-        if info_text != self.info_text:
-            self.lcd.select_digit(5) 
-            self.lcd.display_text(info_text)
-            self.info_text = info_text
-  
-    def update_display_state(self):
-        self.lcd.set_brightness(int(self.get_setting("brightness")))
-        if self.active_font != self.get_setting("active_font"):
-            # print("old font",self.active_font, "->", self.get_setting("active_font"))
-            self.digits_cache = [None]*6
-        self.active_font = self.get_setting("active_font")
-        hex_color = self.get_setting(self.active_font)
-        self.lcd.set_font(self.active_font, hex_color)
-        self.info_text = None
-        self.update_info_text()
-          
-        t_utils.set_utc_offset(int(self.get_setting("utc_offset")))
-        t_utils.set_clock(self.rtc_setter)
-        hr, mins, sec = self.rtc_ds3231.localtime()[3:6]
-        self.show_time(hr, mins, sec)
-        
-    def show_ip_addr(self, addr, wait_time):
-        octets= ["This IP Addr",] + addr.split(".")
-        for i in range(len(octets)):
-            self.lcd.select_digit(i) 
-            self.lcd.display_text(octets[i])
-        time.sleep(wait_time)
-    
-    def service(self):
-        # call this once per tick
-        hr, mins, sec = self.rtc_ds3231.localtime()[3:6]
-        self.show_time(hr, mins, sec)
-        self.alarm.check(hr, mins, sec)
-        
-        if DEBUG_MEM:  # show heap every 10 minutes
-            if mins %10 == 0 and sec == 0:
-                print(hr, mins, sec)
-                micropython.mem_info() 
-     
-def web_callback(data):
-    # update settings with k,v pairs in the given dictionary
-    changed = 0
-    for k,v in data.items():
-        if v[:3] == '%23': # convert html representaion of # symbol
-            v = '#' + v[3:]
-        if settings.settings[k] != v:
-            changed += 1
-            print('settings change for', k, 'old val = ', settings.settings[k], 'new val' ,v)
-            settings.settings.update({k:v})
-    if changed:
-        print("updated {} items".format(changed))        
-        settings.save_settings()
-        leds.set_color(settings.get_setting("led_color"), int(settings.get_setting("led_brightness")))
-        clock.update_display_state()
-    
-    micropython.mem_info()         
-    # print('after post', settings.settings)
-    
-#=======================================================================
-# Main Body
-#=======================================================================
-
-settings.load_settings()
-
-active_font = settings.get_setting("active_font")
-hex_color = settings.get_setting(active_font)
-lcd = display.Display(active_font, hex_color)
-lcd.clear()
-leds.set_color(settings.get_setting("led_color"), int(settings.get_setting("led_brightness")))
-
-t_utils = time_utils.Time_utils(int(settings.get_setting("utc_offset")))
-
-clock = Clock(lcd, leds, settings.get_setting)
-
-Button.append("alarm", settings.MODE_PIN , pull=None, callback=alarm_callback, long_press_time=2000)  # Set long press dur in ms)
-Button.append("sequence_font", settings.LEFT_PIN , pull=None, callback=button_callback)
-Button.append("toggle_seconds", settings.RIGHT_PIN , pull=None, callback=button_callback) 
-
-#===================================================================
-# The main control loop starts here
-#===================================================================
-
-net.set_hostname('nixieclock') # todo needs testing
-
-for attempts in range(2):
-    lcd.set_brightness(100) # max brightness while showing startup status
-    lcd.select_digit(5) 
-    lcd.display_text("Wait for WiFi")
-    try:
-        status = net.connect(secrets.SSID, secrets.PASSWORD)
-        if net.status_text(status) == 'OK':
-            if net.is_connected():
-                lcd.display_text("Net OK")
-                if t_utils.check_sync(clock.rtc_setter):
-                    lcd.display_text("Synced with NTP")
-                else:
-                    lcd.display_text("NTP not Avail")
-                webserver = my_HTTPserver(settings, web_callback)
-                clock.show_ip_addr(net.this_ip, 4) # show ip address on clock for 4 seconds at startup
-                break
-        else:
-            lcd.display_text(net.status_text(status)) # show error if not connected
-            time.sleep(1)
-    except Exception as e:
-        print(e)
-            
-    
-if not net.is_connected():
-    lcd.display_text("Net not Avail")
-    print("ds3231", clock.rtc_ds3231.localtime())
-    time.sleep(2) # just to show the above text 
-
-   
-
-micropython.mem_info() # only for initial memory tests 
-
-while True:
-    if Clock.tick:
-        if net.is_connected():
-            if t_utils.check_sync(clock.rtc_setter):
-                print("clock synced")
-        clock.service() # update display and check alarm
-        Clock.tick = False
-    if net.is_connected():    
-        webserver.listen() # check and handle web UI request 
-    Button.service() # handle any pressed buttons
-    time.sleep(0.05)  # Polling interval
-    
-# The end.
-
-
+import time
+import gc
+from machine import Pin,PWM
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import settings
+import display
+import ds3231
+import leds
+
+import wifi, secrets
+import ntptime
+import time_utils
+import events
+import stats
+import animation
+from button import Button
+
+from webserver import my_HTTPserver
+
+import micropython # for memory diags only
+
+micropython.alloc_emergency_exception_buf(100)  # Allocate buffer for interrupt exceptions
+
+"""
+WiFi/NTP code connects to router using credentials in the secrets.py file
+If connected, time_utils module attempts to set the machine.RTC using NTP time
+See wifi and time_utils modules for more info  
+"""
+net = wifi.wifi(10)
+
+DEBUG_MEM = False
+boot_time = time.time()
+loop_ms = 0     # duration of the most recent main loop pass
+loop_max_ms = 0 # longest main loop pass since boot
+TRANSITION_MS = 400 # how long a digit change takes with a transition effect
+TRANSITION_FPS = 25 # frames per second aimed for, fewer are sent when they take longer
+SPLASH_FILE = "splash.seq" # played on every LCD at boot if it is on the Pico, see fonts/sequence_convert.py
+CHIME_FILE = "chime.seq" # played on every LCD on the hour if it is on the Pico
+#=======================================================================
+# Helper Functions
+#=======================================================================
+
+  
+def alarm_callback(caller, is_alarm_toggle):
+    # toggle alarm on/off if is_alarm_toggle, else turn off buzzer if on
+    # mode button held for more than 2 seconds sets is_alarm_toggle True
+    if is_alarm_toggle:
+        if not settings.get("alarm_on"):
+             settings.set_setting("alarm_on", 'Yes')
+        else:
+             settings.set_setting("alarm_on", 'No')
+        print("toggled alarm state to {}".format(settings.settings["alarm_on"]))
+        clock.apply_settings() 
+    clock.alarm.reset_trigger() 
+    print("clock trigger reset")
+
+def button_callback(caller, is_long_press):
+    if caller.name == "toggle_seconds":
+        if not settings.get("show_secs"):
+            settings.set_setting("show_secs", "Yes")
+        else:
+            settings.set_setting("show_secs", "No")
+    elif caller.name == "sequence_font":
+        active_font = settings.get("active_font")    
+        if active_font == "nixie":
+            settings.set_setting("active_font", "dot")
+        elif active_font =="dot":
+            settings.set_setting("active_font", "7seg")
+        elif active_font =="7seg":
+            settings.set_setting("active_font", "nixie")
+    clock.apply_settings()       
+    # in this version, settings.save_settings() is not called
+    
+#====================================================================
+# Alarm class
+#====================================================================
+class Alarm:
+    def __init__(self, leds, get_setting):
+        self.leds = leds
+        self.get_setting = get_setting # returns setting values as native types
+        self.buzzer = PWM(Pin(settings.BUZZER_PIN, Pin.OUT))
+        self.buzzer.duty_u16(0)
+        self.triggered = False
+
+    def check(self, hour, minute, sec, ticks=1):
+        """sounds buzzer if given time matches the alarm time and if the trigger is enabled.
+           ticks is the number of seconds since the last check, so a delayed check still
+           triggers if the skipped seconds included the alarm time"""
+        alarm_enabled = self.get_setting("alarm_on")
+        alarm_hour = self.get_setting("alarm_hour")
+        alarm_min = self.get_setting("alarm_min")
+        # print(alarm_enabled, alarm_hour,hour, alarm_min,minute,sec)
+        if alarm_enabled and alarm_hour == hour and alarm_min == minute and sec < ticks:
+            self.triggered = True
+        if self.triggered:
+            if (sec % 2) == 0:
+                self.leds.rgb_strip.fill((255,255,255))
+            else:
+                leds.rgb_strip.fill((0,0,0))
+            self.leds.rgb_strip.write()
+            
+            self.buzzer.duty_u16(32768)
+            for i in range(0,4):
+                self.buzzer.freq(1500)
+                time.sleep(0.05)
+                self.buzzer.freq(2400)
+                time.sleep(0.05)
+            self.buzzer.duty_u16(0)
+            if alarm_min != minute:
+                self.triggered  = False # turn off alarm after one minute
+        
+    def reset_trigger(self):
+        # Stop the alarm
+        self.buzzer.duty_u16(0)
+        leds.set_rgb(settings.get("led_color").rgb, settings.get("led_brightness"))
+        self.triggered  = False
+        
+       
+
+#====================================================================
+# Clock class
+#====================================================================
+class Clock():
+    ticks = 0   # count of 1hz interrupts, incremented by the isr
+    tick_ms = 0 # ticks_ms of the latest 1hz isr
+    tick_flag = asyncio.ThreadSafeFlag() # set by the isr to wake tick_loop
+
+    # the least work needed when a setting changes, see apply_settings
+    # led_color and led_brightness are applied by their own listener
+    setting_actions = {
+        "brightness": "brightness",
+        "active_font": "font",
+        "nixie": "font",
+        "dot": "font",
+        "7seg": "font",
+        "show_date": "info",
+        "alarm_on": "info",
+        "alarm_hour": "info",
+        "alarm_min": "info",
+        "show_secs": "layout",
+        "24_hour": "layout",
+        "utc_offset": "ntp",
+        "dst_mode": "ntp",
+        "adjust_timing": "trim",
+    }
+    
+    def __init__(self, lcd, leds, get_setting, events=None, player=None):
+        self.lcd = lcd
+        self.player = player # animation.Player for the hourly chime
+        self.chime = player is not None and animation.exists(CHIME_FILE)
+        self.chiming = False # the chime covers the LCDs, the time is drawn when it ends
+        self.get_setting = get_setting # accesser for values in the settings module as native types
+        self.alarm = Alarm(leds, get_setting)
+        self.active_font = get_setting("active_font")
+        self.font_colour = get_setting(self.active_font)
+        self.info_text = None # text on digit 5 when not showing seconds
+        self.digits_cache = [None]*6
+        self.colon_cache = None # colon visibility shown when not showing seconds
+        self.shown_sec = None # seconds of the time last shown
+        self.staged = None # (position, value, lcd.frames) drawn by stage_next for the next tick
+        self.events = events # EventHub told about time, digit, alarm and sync changes
+        self.published_digits = None
+        self.published_alarm = None
+        self.pending_actions = set() # actions from setting_actions waiting for apply_settings
+        self.ticks_done = 0 # value of Clock.ticks when the display was last updated
+        self.skipped_secs = 0 # seconds not shown because the main loop was late, since boot
+        self.tick_latency_max = 0 # worst ms from a 1hz interrupt to its second being shown
+        self.transitions = [] # (position, old digit, new digit) for run_transitions to change
+        self.transition_fps = 0 # frames per second of the latest transition
+        for key in self.setting_actions:
+            settings.subscribe(key, self.setting_changed)
+        self.init_rtc()
+        
+    def init_rtc(self):
+        self.rtc_ds3231 = ds3231.DS3231(add = 0x68)
+        trim = self.get_setting("adjust_timing")
+        print("setting rtc trim to {}".format(trim))
+        self.rtc_ds3231.Set_Timing(trim)
+        # Set up the handler to recieve a regular interrupt on the 1Hz output from the DS3231
+        rtc_1Hz_pin   = Pin(settings.RTC_1HZ_PIN, Pin.IN)
+        rtc_1Hz_pin.irq(trigger=Pin.IRQ_RISING, handler=self.rtc_1hz_isr)
+     
+  
+    def rtc_setter(self, dt):
+        # syncs ds3231 with the given time as python datetime tuple
+        self.rtc_ds3231.set_localtime(dt)
+        
+    @staticmethod
+    def rtc_1hz_isr(pin):
+        Clock.tick_ms = time.ticks_ms()
+        Clock.ticks += 1
+        Clock.tick_flag.set()
+
+    def pending_ticks(self):
+        # number of 1hz interrupts since the display was last updated
+        return Clock.ticks - self.ticks_done
+
+    def ticks_serviced(self, pending):
+        # call after service() has shown the time for the given number of pending ticks
+        while True:
+            # read the count and timestamp as a pair, the isr may run between the two reads
+            tick_ms = Clock.tick_ms
+            ticks = Clock.ticks
+            if tick_ms == Clock.tick_ms:
+                break
+        now = time.ticks_ms()
+        # ticks are one second apart so the oldest pending tick arrived (ticks - ticks_done - 1) seconds before the latest
+        latency = time.ticks_diff(now, tick_ms) + (ticks - self.ticks_done - 1) * 1000
+        if latency > self.tick_latency_max:
+            self.tick_latency_max = latency
+        self.ticks_done += pending
+        if pending > 1:
+            self.skipped_secs += pending - 1
+            print("main loop was late, skipped {} seconds".format(pending - 1))
+        if stats.enabled:
+            stats.counters[stats.MISSED_TICKS] += pending - 1
+            # time for the second now showing, from the isr for it
+            stats.tick_latency.add(latency - (pending - 1) * 1000)
+  
+    def show_digit_if_changed(self, digit, pos, animate=False):
+        if digit != self.digits_cache[pos]:            
+            old = self.digits_cache[pos]
+            if animate and old is not None and digit is not None and self.get_setting("transition") != "none":
+                self.transitions.append((pos, old, digit)) # shown by run_transitions
+            else:
+                self.lcd.select_digit(pos)
+                self.lcd.display_digit(digit) # None clears the digit
+            self.digits_cache[pos] = digit       
+
+    
+    def extract_digits(self, value):
+        # Assumes value is always two digits
+        return [value // 10, value % 10]
+
+    def show_time(self, hr, mins, sec, animate=False):
+        # animate queues changed digits for run_transitions instead of drawing them
+        digits = self.extract_digits(hr) + self.extract_digits(mins) + self.extract_digits(sec)
+        if not self.get_setting("show_secs"):              
+            self.show_digit_if_changed(digits[3], 4, animate)               
+            # Show tens of minute
+            self.show_digit_if_changed(digits[2], 3, animate)
+            # show blinking colon
+            if digits[5]%2 != self.colon_cache:
+                self.lcd.show_colon(2, digits[5]%2) # on every other second
+                self.colon_cache = digits[5]%2
+            self.digits_cache[2] = None # force digit display if changing to show_secs
+            # show hour. Suppress leading zero if in 12 hour mode
+            self.show_digit_if_changed(digits[1], 1, animate)
+            
+            if self.get_setting("24_hour") == 24 or hr > 9:
+                self.show_digit_if_changed(digits[0], 0, animate)
+            else:
+                self.show_digit_if_changed(None, 0)
+            self.update_info_text()       
+      
+        else:
+            # 6-digit mode : display hours, minutes and seconds
+            for idx, digit in enumerate(digits):
+                self.show_digit_if_changed(digit, idx, animate)
+        self.shown_sec = sec
+
+    async def play_chime(self):
+        # plays CHIME_FILE on every LCD while the clock keeps time, then draws the time again
+        try:
+            await self.player.play(CHIME_FILE)
+        finally:
+            self.chiming = False
+            self.digits_cache = [None]*6
+            self.info_text = None
+            self.colon_cache = None
+            hr, mins, sec = self.rtc_ds3231.localtime()[3:6]
+            self.show_time(hr, mins, sec)
+
+    async def run_transitions(self):
+        # changes the digits queued by show_time with the transition effect, each frame
+        # sent to every changing LCD in turn. Frames are paced at TRANSITION_FPS and made
+        # for the time they are sent at, so when they take longer fewer are sent and the
+        # change still ends after TRANSITION_MS. The next tick ends it at once
+        if not self.transitions:
+            return
+        effect = self.get_setting("transition")
+        interval = 1000 // TRANSITION_FPS
+        ticks = Clock.ticks
+        start = time.ticks_ms()
+        frames = 0
+        while self.transitions and Clock.ticks == ticks:
+            frame_start = time.ticks_ms()
+            progress = (time.ticks_diff(frame_start, start) + interval) * 256 // TRANSITION_MS
+            if progress >= 256:
+                break # the last frame is the new digit
+            sent = True
+            for pos, old, new in self.transitions:
+                self.lcd.select_digit(pos)
+                sent = self.lcd.transition_frame(effect, old, new, progress)
+                if not sent:
+                    break
+            if not sent:
+                break # no strips to make frames in, the digits are drawn whole below
+            frames += 1
+            frame_ms = time.ticks_diff(time.ticks_ms(), frame_start)
+            if stats.enabled:
+                stats.transition_frame.add(frame_ms)
+            # web requests and buttons are served between frames
+            await asyncio.sleep(max(0, interval - frame_ms) / 1000)
+        for pos, old, new in self.transitions:
+            self.lcd.select_digit(pos)
+            self.lcd.display_digit(new)
+        self.transitions = []
+        elapsed = max(1, time.ticks_diff(time.ticks_ms(), start))
+        self.transition_fps = frames * 1000 // elapsed
+        if stats.enabled:
+            stats.counters[stats.TRANSITION_FRAMES] += frames
+            stats.counters[stats.DROPPED_FRAMES] += max(0, TRANSITION_MS // interval - 1 - frames)
+
+    def stage_next(self):
+        # call in idle time, draws the part of the display that changes at the next tick into the
+        # frame buffer, so on the tick show_staged only has to send it.
+        # That is the seconds digit when seconds are shown, otherwise the colon.
+        # Without a frame buffer there is nothing to draw ahead into, the display
+        # starts sending each frame as soon as its first strip is drawn
+        if self.lcd.buffer is None:
+            return
+        if self.shown_sec is None or (self.staged and self.staged[2] == self.lcd.frames):
+            return # nothing shown yet, or already staged and not drawn over since
+        sec = (self.shown_sec + 1) % 60
+        if self.get_setting("show_secs"):
+            if self.get_setting("transition") != "none":
+                return # the seconds digit changes through run_transitions, nothing to send at once
+            self.lcd.draw_digit(sec % 10)
+            self.staged = (5, sec % 10, self.lcd.frames)
+        else:
+            self.lcd.draw_colon(sec % 2)
+            self.staged = (2, sec % 2, self.lcd.frames)
+
+    def show_staged(self, sec):
+        # sends the frame drawn by stage_next if it is what the given second shows
+        staged = self.staged
+        self.staged = None
+        if staged is None or staged[2] != self.lcd.frames:
+            return # nothing staged, or the frame buffer has been drawn over since
+        pos, value = staged[:2]
+        if (pos == 5) != bool(self.get_setting("show_secs")) or value != (sec % 10 if pos == 5 else sec % 2):
+            return # layout changed or the time jumped, show_time draws it
+        self.lcd.select_digit(pos)
+        self.lcd.show()
+        if pos == 5:
+            self.digits_cache[5] = value
+        else:
+            self.colon_cache = value
+     
+    def update_info_text(self):
+        info_text = ""
+        if self.get_setting("show_date"):
+            month, day = self.rtc_ds3231.localtime()[1:3]
+            month_str = time_utils.months[month]
+            info_text += "{} {} ".format(month_str, day)
+        if self.get_setting("alarm_on"):
+            info_text += " Alarm {0}:{1:02d}".format(self.get_setting("alarm_hour"),
+                       self.get_setting("alarm_min"))
+        ##else:
+        ##    info_text += ("Alarm OFF")
+        # only update if changed
+        if info_text != self.info_text:
+            self.lcd.select_digit(5) 
+            self.lcd.display_text(info_text)
+            self.info_text = info_text
+  
+    def setting_changed(self, key, value):
+        # settings listener, the action is done by the next apply_settings call
+        if key in ("nixie", "dot", "7seg") and key != self.get_setting("active_font"):
+            return # colour of a font that is not showing
+        self.pending_actions.add(self.setting_actions[key])
+
+    def apply_settings(self):
+        # call after a batch of settings changes, does each needed action once
+        actions = self.pending_actions
+        if not actions:
+            return
+        self.pending_actions = set()
+        if "brightness" in actions:
+            self.lcd.set_brightness(self.get_setting("brightness"))
+        if "trim" in actions:
+            self.rtc_ds3231.Set_Timing(self.get_setting("adjust_timing"))
+        if "ntp" in actions:
+            # the only action that talks to the network, it can take several seconds
+            t_utils.set_utc_offset(self.get_setting("utc_offset"))
+            if t_utils.set_clock(self.rtc_setter):
+                self.publish_sync()
+        if actions & {"font", "layout"}:
+            # digits part way through a transition are drawn whole by show_time below
+            for pos, old, new in self.transitions:
+                self.digits_cache[pos] = None
+            self.transitions = []
+        if "font" in actions:
+            font = self.get_setting("active_font")
+            colour = self.get_setting(font)
+            self.lcd.set_font(font, colour)
+            # nixie images are only tinted by the colour when they are .idx files (see display.nixie_file)
+            tinted = font != "nixie" or self.lcd.palette is not None
+            if font != self.active_font or (colour != self.font_colour and tinted):
+                self.digits_cache = [None]*6
+            if colour != self.font_colour:
+                self.info_text = None # the info text and colon are drawn in the font colour
+                self.colon_cache = None
+            self.active_font = font
+            self.font_colour = colour
+        if "layout" in actions:
+            self.digits_cache = [None]*6
+            self.info_text = None
+            self.colon_cache = None
+        if actions & {"font", "layout", "info", "ntp"} and not self.chiming:
+            hr, mins, sec = self.rtc_ds3231.localtime()[3:6]
+            self.show_time(hr, mins, sec) # only redraws what has changed, including the info text
+        
+    def show_ip_addr(self, addr, wait_time):
+        octets= ["This IP Addr",] + addr.split(".")
+        for i in range(len(octets)):
+            self.lcd.select_digit(i) 
+            self.lcd.display_text(octets[i])
+        time.sleep(wait_time)
+    
+    def publish_state(self, hr, mins, sec):
+        if not self.events:
+            return
+        self.events.publish("time", "{:02d}:{:02d}:{:02d}".format(hr, mins, sec))
+        if self.digits_cache != self.published_digits:
+            self.published_digits = list(self.digits_cache)
+            self.events.publish("digits", self.published_digits)
+        alarm = (self.get_setting("alarm_on"), self.alarm.triggered,
+                 self.get_setting("alarm_hour"), self.get_setting("alarm_min"))
+        if alarm != self.published_alarm:
+            self.published_alarm = alarm
+            self.events.publish("alarm", {"on": alarm[0], "triggered": alarm[1],
+                                          "time": "{}:{:02d}".format(alarm[2], alarm[3])})
+
+    def publish_sync(self):
+        if self.events:
+            self.events.publish("sync", {"time": "{:02d}:{:02d}:{:02d}".format(*self.rtc_ds3231.localtime()[3:6])})
+
+    def service(self, ticks=1):
+        # call this once per tick, ticks > 1 catches up after the main loop was held up
+        hr, mins, sec = self.rtc_ds3231.localtime()[3:6]
+        if mins == 0 and sec == 0 and self.chime and not self.chiming:
+            self.chiming = True
+            asyncio.create_task(self.play_chime()) # plays between this and the next ticks
+        if not self.chiming:
+            self.show_staged(sec) # the part that changes every second goes first, drawn ahead by stage_next
+            # only the latest time is drawn, changed digits go through run_transitions unless catching up
+            self.show_time(hr, mins, sec, animate=ticks == 1)
+        self.alarm.check(hr, mins, sec, ticks)
+        self.publish_state(hr, mins, sec)
+        
+        if DEBUG_MEM:  # show heap every 10 minutes
+            if mins %10 == 0 and sec == 0:
+                print(hr, mins, sec)
+                micropython.mem_info() 
+     
+def web_callback(data):
+    # update settings with k,v pairs in the given dictionary
+    changed = 0
+    # values have already been url decoded and validated by the webserver
+    for k,v in data.items():
+        if settings.settings.get(k) != v:
+            changed += 1
+            print('settings change for', k, 'old val = ', settings.settings.get(k), 'new val' ,v)
+            settings.set_setting(k, v)
+    if changed:
+        print("updated {} items".format(changed))        
+        settings.save_settings()
+        clock.apply_settings()
+    
+    micropython.mem_info()         
+    # print('after post', settings.settings)
+
+def led_setting_changed(key, value):
+    leds.set_rgb(settings.get("led_color").rgb, settings.get("led_brightness"))
+
+def web_status():
+    # values reported by the web server at /api/status
+    dt = clock.rtc_ds3231.localtime()
+    return {
+        "time": "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}".format(*dt[:6]),
+        "synced": t_utils.is_synced(),
+        "last_sync_s": None if t_utils.time_synced is None else time.ticks_diff(time.ticks_ms(), t_utils.time_synced) // 1000,
+        "uptime_s": time.time() - boot_time,
+        "mem_free": gc.mem_free(),
+        "mem_alloc": gc.mem_alloc(),
+        "loop_ms": loop_ms,
+        "loop_max_ms": loop_max_ms,
+        "skipped_secs": clock.skipped_secs,
+        "tick_latency_max_ms": clock.tick_latency_max,
+        "transition_fps": clock.transition_fps,
+        "animation_fps": player.fps,
+        "settings_writes": settings.write_count,
+        "settings_save_requests": settings.save_requests
+    }
+    
+#=======================================================================
+# Main Body
+#=======================================================================
+
+settings.load_settings()
+
+active_font = settings.get("active_font")
+lcd = display.Display(active_font, settings.get(active_font))
+lcd.clear()
+player = animation.Player(lcd)
+if animation.exists(SPLASH_FILE):
+    asyncio.run(player.play(SPLASH_FILE)) # nothing else is running yet
+leds.set_rgb(settings.get("led_color").rgb, settings.get("led_brightness"))
+settings.subscribe("led_color", led_setting_changed)
+settings.subscribe("led_brightness", led_setting_changed)
+
+t_utils = time_utils.Time_utils(settings.get("utc_offset"))
+
+event_hub = events.EventHub()
+clock = Clock(lcd, leds, settings.get, event_hub, player)
+
+Button.append("alarm", settings.MODE_PIN , pull=None, callback=alarm_callback, long_press_time=2000)  # Set long press dur in ms)
+Button.append("sequence_font", settings.LEFT_PIN , pull=None, callback=button_callback)
+Button.append("toggle_seconds", settings.RIGHT_PIN , pull=None, callback=button_callback) 
+
+#===================================================================
+# The main control loop starts here
+#===================================================================
+
+net.set_hostname('nixieclock') # todo needs testing
+webserver = None
+
+for attempts in range(2):
+    lcd.set_brightness(100) # max brightness while showing startup status
+    lcd.select_digit(5) 
+    lcd.display_text("Wait for WiFi")
+    try:
+        status = net.connect(secrets.SSID, secrets.PASSWORD)
+        if net.status_text(status) == 'OK':
+            if net.is_connected():
+                lcd.display_text("Net OK")
+                if t_utils.check_sync(clock.rtc_setter):
+                    lcd.display_text("Synced with NTP")
+                else:
+                    lcd.display_text("NTP not Avail")
+                webserver = my_HTTPserver(settings, web_callback, web_status, event_hub, lcd)
+                clock.show_ip_addr(net.this_ip, 4) # show ip address on clock for 4 seconds at startup
+                break
+        else:
+            lcd.display_text(net.status_text(status)) # show error if not connected
+            time.sleep(1)
+    except Exception as e:
+        print(e)
+            
+    
+if not net.is_connected():
+    lcd.display_text("Net not Avail")
+    print("ds3231", clock.rtc_ds3231.localtime())
+    time.sleep(2) # just to show the above text 
+
+   
+
+micropython.mem_info() # only for initial memory tests 
+
+def pass_done(start):
+    # records the time taken by a pass of the tick or clock loop
+    global loop_ms, loop_max_ms
+    loop_ms = time.ticks_diff(time.ticks_ms(), start)
+    if loop_ms > loop_max_ms:
+        loop_max_ms = loop_ms
+    if stats.enabled:
+        stats.loop_time.add(loop_ms)
+        stats.sample_heap()
+
+async def tick_loop():
+    # woken by the 1hz isr, so the new second is sent to the display without waiting for a poll
+    clock.ticks_done = Clock.ticks # ticks during startup are not late, nothing was showing the time
+    clock.service() # show the time now rather than at the first tick
+    while True:
+        clock.stage_next() # draw what changes at the next tick while waiting for it
+        await Clock.tick_flag.wait()
+        start = time.ticks_ms()
+        pending = clock.pending_ticks()
+        if pending:
+            clock.service(pending) # update display and check alarm, once however many ticks are waiting
+            clock.ticks_serviced(pending)
+            # after the display update, a sync shows at the next tick
+            if net.is_connected():
+                if t_utils.check_sync(clock.rtc_setter):
+                    print("clock synced")
+                    clock.publish_sync()
+        pass_done(start)
+        await clock.run_transitions() # after pass_done, it awaits between frames
+
+async def clock_loop():
+    while True:
+        start = time.ticks_ms()
+        Button.service() # handle any pressed buttons
+        settings.service() # write settings to flash once changes have settled
+        clock.stage_next() # again if a button or settings change has drawn over the staged frame
+        pass_done(start)
+        await asyncio.sleep(0.05)  # Polling interval, web UI requests are served while waiting
+
+async def main():
+    if webserver:
+        await webserver.start() # web UI requests are handled by their own tasks
+    asyncio.create_task(tick_loop())
+    await clock_loop()
+
+asyncio.run(main())
+    
+# The end.
+
+
@@ -1,153 +1,350 @@
-#=============================================================
-#=============================================================
-#=============================================================
-# Settings and global variables, shared by all python modules
-#=============================================================
-#=============================================================
-#=============================================================
-from collections import OrderedDict
-import json
-
-# GPIO Pin Numbers for LCD
-RST_PIN    = 12
-CLK_PIN    = 10
-DIN_PIN    = 11
-DC_PIN     = 8
-CS1_PIN    = 2
-CS2_PIN    = 3
-CS3_PIN    = 4
-BL_PIN     = 13
-
-# GPIO pins for push buttons
-MODE_PIN  = 17
-LEFT_PIN  = 16
-RIGHT_PIN = 15
-
-# Other GPIO Pins
-BUZZER_PIN = 14
-NEOPIXEL_PIN = 22
-RTC_1HZ_PIN = 18
-
-
-# Global Variables
-
-settings = {
-    "alarm_on": "No",
-    "alarm_hour": '6',
-    "alarm_min": '30',
-    "active_font": "nixie",
-    "nixie": "#ff7b00",
-    "dot": "#ff0000",
-    "7seg": "#00ffff",
-    "brightness" : "50",
-    "led_color": "#ff7b00",
-    "led_brightness" : "20",
-    "led_alarm_color" : "#cccccc",
-    "24_hour" : "24",
-    "show_secs" : "No",
-    "show_date" : "No",
-    "utc_offset" : "0",
-    "dst_mode": "auto_eu",
-    "adjust_timing" : "128"
-}
-
-
-# ordered dictionary to preserve dropdown sequence
-dst_options = OrderedDict([ 
-    ("dst_off", "DST Off"),
-    ("dst_on", "DST On"),
-    ("auto_eu", "Auto EU"),
-    ("auto_na", "Auto NA")
-    ])
-
-"""
-tags are used to define the browser user interface
-first touple element is key to settings dictionary
-second element is:
- 'N' if numeric input
- 'R' if radio button,
- 'F' if font selection,
- 'L' if LED colour
- 'D' if selection dropdown
- '-' if blank line seperator
-third element is text prompt
-final elements are guiidance for range of values 
-"""
-
-tags = ( 
-            ('alarm_on', 'R', 'Alarm Enabled', 'Yes', 'No'),  
-            ('alarm_hour', 'N', 'Alarm hour', 1, 23),
-            ('alarm_min', 'N', 'Alarm minute', 0, 59),
-            ('', '-'),
-            ('active_font', 'F','Font', 'nixie:Nixie', 'dot:Dot Matrix', '7seg:7 Segment'),
-            ('brightness', 'N','Brightness %', 1, 100),
-            ('', '-'),
-            ('led_color', 'L','LED color'),
-            ('led_brightness', 'N','LED brightness %', 1, 100),
-            ('', '-'),
-            ('24_hour', 'R','Hours Format', '12', '24'),
-            ('show_secs', 'R','Show Seconds', 'Yes', 'No'),
-            ('show_date', 'R','Show Date', 'Yes', 'No'),
-            ('utc_offset', 'N', 'Offset from UTC', -12, 12),
-            ('dst_mode', 'D', 'DST Mode', dst_options),
-            # ('', '-'),
-            # ('adjust_timing', 'N', 'Trim timing', 0, 255)
-       )
-
-
-    
-tick = True
-
-
-#==============================================================================
-#==============================================================================
-#==============================================================================
-# Functions to Read and write the Settings File "settings.json" on eeprom
-#==============================================================================
-#==============================================================================
-#==============================================================================
-
-# Save all settings to "disk".
-def save_settings():
-    print("saving settings")
-    with open("settings.json", "w") as f:
-        json.dump(settings, f)
- 
-            
-# Load all settings from "disk"
-def load_settings():
-    global settings
-    try:
-        with open("settings.json", "r") as f:
-            settings = json.load(f)
-    except:
-        print("Unable to load settings.json. Creating new file")
-        print(settings)
-        save_settings()
-
-# Retrieve a single setting value from memory
-def get_setting(key):
-    try:
-        v = settings[key]  
-        return v
-    except KeyError:
-        print("Key '{}' not found in settings. Delete file settings.json and try again".format(key))
-
-# set a single setting value
-def set_setting(key, value):
-    try:
-        settings[key] = value     
-    except KeyError:
-        print("Key '{}' not found in settings, unable to save".format(key))
-    
-
-
-# Update a single setting value in memory and "disk"
-def save_setting(key,value):
-    if key in settings:
-        settings[key] = value
-        save_settings()
-    else:
-        raise Exception("Key '" + key + "' not found in settings. Delete file settings.json and try again")
-
- 
+#=============================================================
+#=============================================================
+#=============================================================
+# Settings and global variables, shared by all python modules
+#=============================================================
+#=============================================================
+#=============================================================
+from collections import OrderedDict
+import json
+import os
+
+try:
+    from time import ticks_ms, ticks_add, ticks_diff
+except ImportError:
+    # here if running in full python
+    import time
+    ticks_ms = lambda : int(time.monotonic() * 1000)
+    ticks_add = lambda t, delta : t + delta
+    ticks_diff = lambda a, b : a - b
+
+try:
+    from binascii import crc32
+except ImportError:
+    def crc32(data, crc=0):
+        crc ^= 0xffffffff
+        for b in data:
+            crc ^= b
+            for _ in range(8):
+                crc = (crc >> 1) ^ (0xedb88320 & -(crc & 1))
+        return crc ^ 0xffffffff
+
+# GPIO Pin Numbers for LCD
+RST_PIN    = 12
+CLK_PIN    = 10
+DIN_PIN    = 11
+DC_PIN     = 8
+CS1_PIN    = 2
+CS2_PIN    = 3
+CS3_PIN    = 4
+BL_PIN     = 13
+
+# GPIO pins for push buttons
+MODE_PIN  = 17
+LEFT_PIN  = 16
+RIGHT_PIN = 15
+
+# Other GPIO Pins
+BUZZER_PIN = 14
+NEOPIXEL_PIN = 22
+RTC_1HZ_PIN = 18
+
+
+# Global Variables
+
+settings = {
+    "alarm_on": "No",
+    "alarm_hour": '6',
+    "alarm_min": '30',
+    "active_font": "nixie",
+    "nixie": "#ff7b00",
+    "dot": "#ff0000",
+    "7seg": "#00ffff",
+    "brightness" : "50",
+    "transition": "none",
+    "led_color": "#ff7b00",
+    "led_brightness" : "20",
+    "led_alarm_color" : "#cccccc",
+    "24_hour" : "24",
+    "show_secs" : "No",
+    "show_date" : "No",
+    "utc_offset" : "0",
+    "dst_mode": "auto_eu",
+    "adjust_timing" : "128"
+}
+
+
+# ordered dictionary to preserve dropdown sequence
+dst_options = OrderedDict([ 
+    ("dst_off", "DST Off"),
+    ("dst_on", "DST On"),
+    ("auto_eu", "Auto EU"),
+    ("auto_na", "Auto NA")
+    ])
+
+transition_options = OrderedDict([
+    ("none", "None"),
+    ("crossfade", "Crossfade"),
+    ("roll", "Roll"),
+    ("flicker", "Flicker")
+    ])
+
+"""
+tags are used to define the browser user interface
+first touple element is key to settings dictionary
+second element is:
+ 'N' if numeric input
+ 'R' if radio button,
+ 'F' if font selection,
+ 'L' if LED colour
+ 'D' if selection dropdown
+ '-' if blank line seperator
+third element is text prompt
+final elements are guiidance for range of values 
+"""
+
+tags = ( 
+            ('alarm_on', 'R', 'Alarm Enabled', 'Yes', 'No'),  
+            ('alarm_hour', 'N', 'Alarm hour', 1, 23),
+            ('alarm_min', 'N', 'Alarm minute', 0, 59),
+            ('', '-'),
+            ('active_font', 'F','Font', 'nixie:Nixie', 'dot:Dot Matrix', '7seg:7 Segment'),
+            ('brightness', 'N','Brightness %', 1, 100),
+            ('transition', 'D', 'Digit Change', transition_options),
+            ('', '-'),
+            ('led_color', 'L','LED color'),
+            ('led_brightness', 'N','LED brightness %', 1, 100),
+            ('', '-'),
+            ('24_hour', 'R','Hours Format', '12', '24'),
+            ('show_secs', 'R','Show Seconds', 'Yes', 'No'),
+            ('show_date', 'R','Show Date', 'Yes', 'No'),
+            ('utc_offset', 'N', 'Offset from UTC', -12, 12),
+            ('dst_mode', 'D', 'DST Mode', dst_options),
+            # ('', '-'),
+            # ('adjust_timing', 'N', 'Trim timing', 0, 255)
+       )
+
+# settings with the same format as tags that are not shown in the browser
+hidden_tags = (
+            ('adjust_timing', 'N', 'Trim timing', 0, 255),
+       )
+
+# colour settings, shown by the font group and led tags or not shown at all
+colour_keys = ('nixie', 'dot', '7seg', 'led_color', 'led_alarm_color')
+
+
+class Colour(object):
+    # a colour setting converted once into the forms used by the LCDs and neopixels
+    def __init__(self, hex_color):
+        self.hex = hex_color
+        r, g, b = int(hex_color[1:3], 16), int(hex_color[3:5], 16), int(hex_color[5:7], 16)
+        self.rgb = (r, g, b)  # neopixel tuple
+        rgb565 = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+        self.rgb565 = ((rgb565 & 0xFF) << 8) | (rgb565 >> 8)  # byte swapped for the LCD framebuffer
+
+    def __eq__(self, other):
+        return isinstance(other, Colour) and other.hex == self.hex
+
+
+defaults = dict(settings) # used in place of any loaded value that is not valid
+values = {}     # settings converted to native types, see get()
+listeners = {}  # key -> functions called with (key, value) when that setting changes
+
+    
+tick = True
+
+# incremented whenever a setting value changes so consumers such as the
+# web server can tell when anything they have cached from settings is stale
+version = 0
+
+
+#==============================================================================
+#==============================================================================
+#==============================================================================
+# Functions to Read and write the Settings File "settings.json" on eeprom
+#==============================================================================
+#==============================================================================
+#==============================================================================
+
+# Settings are written to flash at most once per SAVE_DELAY_MS after the first of
+# a burst of changes, so repeated edits from the web page or buttons are coalesced
+# into one write. Each write goes to a temporary file that is renamed into place,
+# with the previous file kept as a backup. The last line of each file is a CRC of
+# the json above it so a file truncated by a power cut is detected on loading and
+# the backup used instead.
+SETTINGS_FILE = "settings.json"
+BACKUP_FILE = "settings.bak"
+TEMP_FILE = "settings.tmp"
+SAVE_DELAY_MS = 5000
+
+save_due = None  # ticks_ms when pending changes should be written, None if nothing pending
+write_count = 0  # number of times the settings file has been written, kept in the file
+save_requests = 0 # calls to save_settings since boot, each one would have been a write before coalescing
+
+# Save all settings to "disk" once changes have settled, call service() regularly to do the write
+def save_settings():
+    global save_due, save_requests
+    save_requests += 1
+    if save_due is None:
+        save_due = ticks_add(ticks_ms(), SAVE_DELAY_MS)
+
+# Writes pending changes when they are due, or now if force is True. Returns True if written
+def service(force=False):
+    if save_due is None or not (force or ticks_diff(ticks_ms(), save_due) >= 0):
+        return False
+    write_settings()
+    return True
+
+def write_settings():
+    global save_due, write_count
+    write_count += 1
+    print("saving settings, write", write_count)
+    text = json.dumps({"settings": settings, "writes": write_count})
+    with open(TEMP_FILE, "w") as f:
+        f.write(text)
+        f.write("\n{:08x}\n".format(crc32(text.encode())))
+    try:
+        os.remove(BACKUP_FILE)
+    except OSError:
+        pass
+    try:
+        os.rename(SETTINGS_FILE, BACKUP_FILE)
+    except OSError:
+        pass # no previous file
+    os.rename(TEMP_FILE, SETTINGS_FILE)
+    save_due = None
+
+# returns (settings dict, write count) from the given file, raises ValueError or OSError if missing or damaged
+def read_settings_file(filename):
+    with open(filename, "r") as f:
+        text = f.read()
+    body, _, crc = text.rstrip().rpartition("\n")
+    if not body: # single line file written before crc checks were added
+        return json.loads(crc), 0
+    if int(crc, 16) != crc32(body.encode()):
+        raise ValueError("crc mismatch")
+    data = json.loads(body)
+    return data["settings"], data["writes"]
+ 
+            
+# Load all settings from "disk", falling back to the backup and then the defaults
+def load_settings():
+    global settings, version, write_count
+    # a complete temp file is newer than the backup if power failed while it was being renamed
+    for filename in (SETTINGS_FILE, TEMP_FILE, BACKUP_FILE):
+        try:
+            loaded, write_count = read_settings_file(filename)
+        except (OSError, ValueError, KeyError) as e:
+            print("Unable to load {}: {}".format(filename, e))
+            continue
+        settings.update(loaded) # keys missing from older files keep their defaults
+        update_values()
+        version += 1
+        if filename != SETTINGS_FILE:
+            write_settings() # restore the main file
+        return
+    print("Creating new {}".format(SETTINGS_FILE))
+    print(settings)
+    update_values()
+    write_settings()
+
+# Retrieve a single setting value from memory as the string stored in settings.json
+def get_setting(key):
+    return settings[key]
+
+# Retrieve a single setting converted to its native type:
+# int for numbers, True/False for Yes/No choices, Colour for colours, otherwise the string
+def get(key):
+    return values[key]
+
+# set a single setting value from its string form, listeners for the key are told if it changed
+def set_setting(key, value):
+    global version
+    if settings.get(key) != value:
+        settings[key] = value
+        values[key] = parse(key, value)
+        version += 1
+        for func in listeners.get(key, ()):
+            func(key, values[key])
+
+# calls func(key, value) whenever the setting for key changes
+def subscribe(key, func):
+    listeners.setdefault(key, []).append(func)
+
+def find_tag(key):
+    for tag in tags + hidden_tags:
+        if tag[0] == key:
+            return tag
+    return None
+
+# returns the native value of a setting from its string form
+def parse(key, value):
+    if key in colour_keys:
+        return Colour(value)
+    tag = find_tag(key)
+    if tag is None:
+        return value
+    if tag[1] == 'N':
+        return int(value)
+    if tag[1] == 'R':
+        if tag[3:] == ('Yes', 'No'):
+            return value == 'Yes'
+        if value.isdigit():
+            return int(value)
+    return value
+
+# converts every setting to its native type, replacing any that are not valid with the default
+def update_values():
+    for key in settings:
+        try:
+            if key in colour_keys or find_tag(key):
+                settings[key] = validate(key, settings[key])
+            values[key] = parse(key, settings[key])
+        except ValueError as e:
+            print("Invalid setting, using default:", e)
+            settings[key] = defaults[key]
+            values[key] = parse(key, settings[key])
+    
+
+
+# returns the given value as the string stored in settings,
+# raises ValueError if it is not valid for the key as described by tags
+def validate(key, value):
+    value = str(value)
+    if key in colour_keys:
+        # int() would also take a sign or spaces, which give Colour channels out of range
+        if len(value) != 7 or value[0] != '#' or not all(c in '0123456789abcdefABCDEF' for c in value[1:]):
+            raise ValueError("{} must be a colour as #rrggbb".format(key))
+        return value.lower()
+    for tag in tags + hidden_tags:
+        if tag[0] != key:
+            continue
+        if tag[1] == 'N':
+            v = int(value)
+            if v < tag[3] or v > tag[4]:
+                raise ValueError("{} must be {} to {}".format(key, tag[3], tag[4]))
+            return str(v)
+        elif tag[1] == 'R':
+            choices = tag[3:]
+        elif tag[1] == 'F':
+            choices = [f.split(':')[0] for f in tag[3:]]
+        elif tag[1] == 'D':
+            choices = list(tag[3])
+        else:
+            break
+        if value not in choices:
+            raise ValueError("{} must be one of {}".format(key, ', '.join(choices)))
+        return value
+    raise ValueError("{} is not a setting that can be changed".format(key))
+
+
+# Update a single setting value in memory and "disk"
+def save_setting(key,value):
+    if key in settings:
+        set_setting(key, value)
+        save_settings()
+    else:
+        raise Exception("Key '" + key + "' not found in settings. Delete file settings.json and try again")
+
+
+update_values()
@@ -0,0 +1,109 @@
+"""
+  sim  host-side simulator for the LCD NTP nixie clock
+
+  install() puts stand-ins for the MicroPython only modules (machine, framebuf,
+  neopixel, network, micropython, rp2) into sys.modules, adds asyncio.ThreadSafeFlag
+  and moves time, asyncio and NTP onto a virtual clock, after which the
+  firmware modules import and run unchanged under CPython:
+
+      import sim
+      board = sim.install()
+      import display
+      ...
+      board.save_clock("clock.png")
+
+  See run.py to run the whole of main.py, and the README for the model's limits.
+"""
+
+import asyncio
+import builtins
+import calendar
+import gc
+import os
+import sys
+import time
+import traceback
+import tracemalloc
+
+from . import devices, hw
+from .vclock import VirtualClock, VirtualEventLoopPolicy, SimulationEnd, ThreadSafeFlag
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAP_SIZE = 160 * 1024  # about the heap a Pico W has left once WiFi is up
+FLASH_READ_RATE = 2000000  # bytes per second, an estimate for littlefs reads of 1KB or more
+
+hardware = None  # the Hardware instance once installed
+
+
+def _mktime(tm):
+    # MicroPython mktime: no time zone, out of range months roll into the year
+    year, month = tm[0] + (tm[1] - 1) // 12, (tm[1] - 1) % 12 + 1
+    return calendar.timegm((year, month, 1, 0, 0, 0)) + (tm[2] - 1) * 86400 + tm[3] * 3600 + tm[4] * 60 + tm[5]
+
+
+def install(epoch=None, speed=None, cpu_scale=0.0, rtc_start=None, wlan_status=3,
+            sqw_phase=0.0, http_port=None, trace_memory=False, flash_rate=FLASH_READ_RATE):
+    """
+    epoch       : unix time (UTC) at the simulated boot, as returned by NTP, default now
+    speed       : None runs flat out, 1.0 in step with real time
+    cpu_scale   : virtual seconds charged per host second spent running firmware code, 0 ignores it
+    rtc_start   : unix time held by the DS3231 at boot, default the same as epoch
+    wlan_status : network status that WLAN.connect() ends in, 3 is STAT_GOT_IP
+    sqw_phase   : seconds from the DS3231 seconds update to the rising edge of its 1Hz output
+    http_port   : port for the firmware web server instead of 80
+    trace_memory: use tracemalloc so gc.mem_alloc() reports what the firmware has allocated
+    flash_rate  : bytes per second read from files the firmware opens by relative path, 0 reads in no time
+    """
+    global hardware
+    from . import machine, framebuf, neopixel, network, micropython, rp2
+
+    clock = VirtualClock(epoch, speed, cpu_scale)
+    hardware = hw.hardware = hw.Hardware(clock, rtc_start, wlan_status, sqw_phase)
+
+    sys.modules.update({'machine': machine, 'framebuf': framebuf, 'neopixel': neopixel,
+                        'network': network, 'micropython': micropython, 'rp2': rp2})
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    # the MicroPython additions to time, with CPython's time functions on the virtual clock
+    time.sleep = clock.sleep
+    time.sleep_ms = clock.sleep_ms
+    time.sleep_us = clock.sleep_us
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    time.ticks_cpu = clock.ticks_us
+    time.ticks_diff = clock.ticks_diff
+    time.ticks_add = clock.ticks_add
+    time.time = clock.time
+    host_gmtime = time.gmtime
+    time.gmtime = lambda secs=None: host_gmtime(clock.time() if secs is None else secs)
+    time.localtime = time.gmtime
+    time.mktime = _mktime
+
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    gc.mem_alloc = lambda: tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    gc.mem_free = lambda: max(0, HEAP_SIZE - gc.mem_alloc())
+    sys.print_exception = lambda exc, file=sys.stdout: traceback.print_exception(exc, file=file)
+
+    # the firmware opens its files by relative path, those reads come from flash
+    host_open = getattr(builtins.open, 'host_open', builtins.open)
+    def flash_open(file, mode='r', *args, **kwargs):
+        f = host_open(file, mode, *args, **kwargs)
+        if flash_rate and 'r' in mode and isinstance(file, str) and not os.path.isabs(file):
+            return devices.FlashFile(f, hardware, flash_rate)
+        return f
+    flash_open.host_open = host_open
+    builtins.open = flash_open
+
+    asyncio.set_event_loop_policy(VirtualEventLoopPolicy(clock))
+    if not hasattr(asyncio, 'ThreadSafeFlag'):
+        asyncio.ThreadSafeFlag = ThreadSafeFlag
+
+    # NTP answers with the virtual UTC time instead of going to pool.ntp.org
+    import ntptime
+    ntptime.time = clock.time
+    if http_port is not None:
+        import webserver
+        webserver.HTTP_PORT = http_port
+    return hardware
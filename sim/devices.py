@@ -0,0 +1,304 @@
+"""
+  devices.py  models of the clock's peripherals for the host simulator
+
+  ST7789   : one 240x135 LCD, decodes the command/data stream from the SPI bus
+             into its frame memory as the real controller does
+  DS3231   : the RTC register file on I2C, kept from the virtual clock, with the
+             1Hz square wave output driven onto a Pin
+  FlashFile: a file opened by the firmware, reads take the time the Pico's
+             flash would
+  write_png: saves RGB pixel rows as a PNG, no imaging library needed
+"""
+
+import calendar
+import struct
+import time as _time
+import zlib
+from collections import deque
+
+# ST7789 commands decoded by the model, the rest are recorded and otherwise ignored
+CASET = 0x2A
+RASET = 0x2B
+RAMWR = 0x2C
+MADCTL = 0x36
+INVOFF = 0x20
+INVON = 0x21
+SLPOUT = 0x11
+DISPON = 0x29
+
+GRAM_WIDTH = 320  # frame memory in the row/column exchanged (landscape) orientation set by MADCTL 0x70
+GRAM_HEIGHT = 240
+VISIBLE_X = 40    # the 240x135 glass shows this part of the frame memory
+VISIBLE_Y = 53
+VISIBLE_WIDTH = 240
+VISIBLE_HEIGHT = 135
+
+
+class ST7789(object):
+    def __init__(self, index, clock):
+        self.index = index
+        self.clock = clock
+        self.gram = bytearray(GRAM_WIDTH * GRAM_HEIGHT * 2)
+        self.cmd = None
+        self.params = bytearray()
+        self.col = (0, GRAM_WIDTH - 1)
+        self.row = (0, GRAM_HEIGHT - 1)
+        self.pos = 0            # pixel offset of the next RAMWR byte pair within the window
+        self.odd = None         # first byte of a pixel split across writes
+        self.inverted = False   # these IPS panels only show true colours with INVON
+        self.awake = False
+        self.on = False
+        self.frames = 0         # RAMWR commands received
+        self.pixels = 0         # pixels written to frame memory
+        self.bytes = 0          # all bytes received, commands included
+        self.commands = {}      # count of each command byte
+        self.writes = deque((), 256) # (virtual time, window, pixels) of recent RAMWRs
+        self.listeners = []     # func(panel) called when a RAMWR window has been filled
+
+    def write(self, dc, data):
+        # data arrives with the DC pin low for a command, high for its parameters or pixels
+        self.bytes += len(data)
+        if not dc:
+            for cmd in data:
+                self.command(cmd)
+            return
+        if self.cmd == RAMWR:
+            self.write_pixels(data)
+        else:
+            self.params.extend(data)
+            self.parameters()
+
+    def command(self, cmd):
+        self.commands[cmd] = self.commands.get(cmd, 0) + 1
+        self.cmd = cmd
+        self.params = bytearray()
+        if cmd == RAMWR:
+            self.frames += 1
+            self.pos = 0
+            self.odd = None
+            self.writes.append((self.clock.now, self.col + self.row, 0))
+        elif cmd == INVON:
+            self.inverted = False
+        elif cmd == INVOFF:
+            self.inverted = True
+        elif cmd == SLPOUT:
+            self.awake = True
+        elif cmd == DISPON:
+            self.on = True
+
+    def parameters(self):
+        p = self.params
+        if self.cmd == CASET and len(p) == 4:
+            self.col = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+        elif self.cmd == RASET and len(p) == 4:
+            self.row = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+
+    def window(self):
+        x0, x1 = self.col
+        y0, y1 = self.row
+        return x0, y0, max(0, x1 - x0 + 1), max(0, y1 - y0 + 1)
+
+    def write_pixels(self, data):
+        data = memoryview(data)
+        if self.odd is not None:
+            data = memoryview(bytes((self.odd,)) + bytes(data))
+            self.odd = None
+        if len(data) & 1:
+            self.odd = data[-1]
+            data = data[:-1]
+        x0, y0, w, h = self.window()
+        size = w * h
+        n = len(data) // 2
+        if not size or not n:
+            return
+        done = 0
+        while done < n:
+            # the window is filled row by row and wraps back to its start
+            pos = self.pos % size
+            row, col = divmod(pos, w)
+            run = min(w - col, n - done)
+            x, y = x0 + col, y0 + row
+            if x < GRAM_WIDTH and y < GRAM_HEIGHT:
+                fit = min(run, GRAM_WIDTH - x)
+                start = (y * GRAM_WIDTH + x) * 2
+                self.gram[start:start + fit * 2] = data[done * 2:(done + fit) * 2]
+            done += run
+            self.pos = pos + run
+        self.pixels += n
+        t, win, count = self.writes[-1]
+        self.writes[-1] = (t, win, count + n)
+        if self.pos % size == 0 and self.pos:
+            for func in self.listeners:
+                func(self)
+
+    def rgb565(self):
+        # the visible frame memory as big endian RGB565, one bytes object per row
+        rows = []
+        for y in range(VISIBLE_Y, VISIBLE_Y + VISIBLE_HEIGHT):
+            start = (y * GRAM_WIDTH + VISIBLE_X) * 2
+            rows.append(bytes(self.gram[start:start + VISIBLE_WIDTH * 2]))
+        return rows
+
+    def rgb_rows(self, upright=True, backlight=100):
+        # visible pixels as rows of RGB888 bytes, rotated to how the clock is viewed if upright
+        lut = rgb565_lut(self.inverted, backlight if self.on else 0)
+        rows = [b''.join(lut[int.from_bytes(r[i:i + 2], 'big')] for i in range(0, len(r), 2))
+                for r in self.rgb565()]
+        if not upright:
+            return rows
+        # the panels are mounted rotated 90 degrees clockwise
+        out = []
+        for x in range(VISIBLE_WIDTH):
+            out.append(b''.join(rows[y][x * 3:x * 3 + 3] for y in range(len(rows) - 1, -1, -1)))
+        return out
+
+
+_luts = {}
+
+
+def rgb565_lut(inverted, backlight):
+    key = (inverted, backlight)
+    if key not in _luts:
+        scale = max(0, min(100, backlight))
+        lut = []
+        for c in range(65536):
+            if inverted:
+                c ^= 0xffff
+            r = (c >> 11) & 0x1f
+            g = (c >> 5) & 0x3f
+            b = c & 0x1f
+            lut.append(bytes((((r << 3) | (r >> 2)) * scale // 100,
+                              ((g << 2) | (g >> 4)) * scale // 100,
+                              ((b << 3) | (b >> 2)) * scale // 100)))
+        _luts[key] = lut
+    return _luts[key]
+
+
+def write_png(filename, rows):
+    # rows is a list of equal length RGB888 byte strings
+    height = len(rows)
+    width = len(rows[0]) // 3 if rows else 0
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    raw = b''.join(b'\x00' + r for r in rows)
+    with open(filename, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def bcd(value):
+    return ((value // 10) << 4) | (value % 10)
+
+
+def from_bcd(code):
+    return ((code >> 4) & 0x0f) * 10 + (code & 0x0f)
+
+
+class DS3231(object):
+    # register level model, time is counted from the virtual clock
+    address = 0x68
+
+    def __init__(self, clock, start=None, on_edge=None, sqw_phase=0.0):
+        self.clock = clock
+        self.base = int(clock.epoch + clock.now if start is None else start) # rtc time, as unix seconds...
+        self.base_at = clock.now   # ...at this virtual time, when the seconds register last counted
+        self.chain = 0             # bumped when a seconds write resets the countdown chain
+        self.day = 1               # day of week register, its meaning is up to the firmware
+        self.regs = bytearray(0x13)
+        self.regs[0x0f] = 0x80     # OSF set, as after the battery has been fitted
+        self.regs[0x11] = 25       # 25.00 C
+        self.on_edge = on_edge     # func() called on each rising edge of the 1Hz output
+        self.sqw_phase = sqw_phase # delay from the seconds update to the rising edge of the 1Hz output
+        self.edges = 0
+        self.schedule_edge()
+
+    def seconds(self):
+        # rtc time now as whole unix seconds
+        return self.base + int(self.clock.now - self.base_at)
+
+    def schedule_edge(self):
+        # the first rising edge after now, then one a second from edge()
+        first = self.base_at + self.sqw_phase
+        when = first + int(self.clock.now - first) + 1 if self.clock.now >= first else first
+        self.clock.call_at(when, lambda: self.edge(self.chain, when))
+
+    def edge(self, chain, when):
+        if chain != self.chain:
+            return # the countdown chain was reset by a write to the seconds register
+        self.edges += 1
+        if self.on_edge and not (self.regs[0x0e] & 0x04): # INTCN clear selects the square wave
+            self.on_edge()
+        self.clock.call_at(when + 1, lambda: self.edge(chain, when + 1))
+
+    def time_regs(self):
+        tm = _time.gmtime(self.seconds())
+        return bytes((bcd(tm[5]), bcd(tm[4]), bcd(tm[3]), self.day,
+                      bcd(tm[2]), bcd(tm[1]), bcd(tm[0] % 100)))
+
+    def read(self, reg, n):
+        self.regs[0:7] = self.time_regs()
+        return bytes(self.regs[(reg + i) % len(self.regs)] for i in range(n))
+
+    def write(self, reg, data):
+        regs = bytearray(self.time_regs())
+        reset_chain = False
+        for i, value in enumerate(data):
+            r = (reg + i) % len(self.regs)
+            if r < 7:
+                regs[r] = value
+                reset_chain = reset_chain or r == 0
+            elif r == 0x0f:
+                self.regs[r] = (self.regs[r] & value & 0x80) | (value & 0x7b) # OSF can only be cleared
+            elif r not in (0x11, 0x12):
+                self.regs[r] = value
+        self.day = regs[3] & 0x07
+        tm = (2000 + from_bcd(regs[6]), from_bcd(regs[5] & 0x1f), from_bcd(regs[4] & 0x3f),
+              from_bcd(regs[2] & 0x3f), from_bcd(regs[1] & 0x7f), from_bcd(regs[0] & 0x7f))
+        seconds = calendar.timegm(tm + (0, 0, 0))
+        if reset_chain:
+            self.base = seconds
+            self.base_at = self.clock.now
+            self.chain += 1
+            self.schedule_edge()
+        else:
+            self.base = seconds - int(self.clock.now - self.base_at)
+
+
+class FlashFile(object):
+    # wraps a file opened by the firmware, charging reads at the flash read rate
+    def __init__(self, f, hardware, rate):
+        self.f = f
+        self.hardware = hardware
+        self.rate = rate
+
+    def read(self, *args):
+        data = self.f.read(*args)
+        self.hardware.flash_read(len(data), self.rate)
+        return data
+
+    def readinto(self, buf):
+        n = self.f.readinto(buf)
+        self.hardware.flash_read(n or 0, self.rate)
+        return n
+
+    def readline(self, *args):
+        line = self.f.readline(*args)
+        self.hardware.flash_read(len(line), self.rate)
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, self.f.read(0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
@@ -0,0 +1,227 @@
+"""
+  framebuf.py  stand-in for the MicroPython framebuf module
+
+  Supports the RGB565 and GS8 formats with the drawing methods used by the
+  clock. Pixels are stored as the C implementation stores them, so buffers
+  filled from .raw files or by blit look the same as on the Pico.
+  ellipse follows the algorithm in extmod/modframebuf.c so the colon and dot
+  font match the device pixel for pixel.
+"""
+
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+_ELLIPSE_FILL = 0x10
+_ELLIPSE_ALL = 0x0f
+
+
+class FrameBuffer(object):
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in (RGB565, GS8):
+            raise ValueError("invalid format")
+        self._buf = memoryview(buffer).cast('B')
+        self._w = width
+        self._h = height
+        self._stride = width if stride is None else stride
+        self._bpp = 2 if format == RGB565 else 1
+        self._format = format
+        if len(self._buf) < self._stride * height * self._bpp:
+            raise ValueError("buffer too small")
+
+    def _encode(self, c):
+        if self._bpp == 2:
+            return bytes((c & 0xff, (c >> 8) & 0xff))
+        return bytes((c & 0xff,))
+
+    def _get(self, x, y):
+        i = (y * self._stride + x) * self._bpp
+        if self._bpp == 2:
+            return self._buf[i] | (self._buf[i + 1] << 8)
+        return self._buf[i]
+
+    def _fill_rect(self, x, y, w, h, c):
+        # clipped to the buffer, as fill_rect in modframebuf.c
+        if w < 1 or h < 1 or x + w <= 0 or y + h <= 0 or y >= self._h or x >= self._w:
+            return
+        xend = min(self._w, x + w)
+        yend = min(self._h, y + h)
+        x = max(x, 0)
+        y = max(y, 0)
+        run = self._encode(c) * (xend - x)
+        bpp = self._bpp
+        for row in range(y, yend):
+            start = (row * self._stride + x) * bpp
+            self._buf[start:start + len(run)] = run
+
+    def fill(self, c):
+        if self._stride == self._w:
+            # doubles a filled run in place, no buffer sized temporary as on the device
+            size = self._w * self._h * self._bpp
+            run = self._encode(c)
+            self._buf[:len(run)] = run
+            done = len(run)
+            while done < size:
+                n = min(done, size - done)
+                self._buf[done:done + n] = self._buf[:n]
+                done += n
+        else:
+            self._fill_rect(0, 0, self._w, self._h, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        self._fill_rect(x, y, w, h, c)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self._w and 0 <= y < self._h):
+            return None
+        if c is None:
+            return self._get(x, y)
+        i = (y * self._stride + x) * self._bpp
+        if self._bpp == 2:
+            self._buf[i] = c & 0xff
+            self._buf[i + 1] = (c >> 8) & 0xff
+        else:
+            self._buf[i] = c & 0xff
+
+    def hline(self, x, y, w, c):
+        self._fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self._fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self._fill_rect(x, y, w, h, c)
+        else:
+            self._fill_rect(x, y, w, 1, c)
+            self._fill_rect(x, y + h - 1, w, 1, c)
+            self._fill_rect(x, y, 1, h, c)
+            self._fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        # Bresenham, as in modframebuf.c
+        dx = x2 - x1
+        sx = 1 if dx > 0 else -1
+        dx = abs(dx)
+        dy = y2 - y1
+        sy = 1 if dy > 0 else -1
+        dy = abs(dy)
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+        e = 2 * dy - dx
+        for _ in range(dx):
+            if steep:
+                self.pixel(y1, x1, c)
+            else:
+                self.pixel(x1, y1, c)
+            while e >= 0:
+                y1 += sy
+                e -= 2 * dx
+            x1 += sx
+            e += 2 * dy
+        self.pixel(x2, y2, c)
+
+    def _ellipse_points(self, cx, cy, x, y, c, mask):
+        if mask & _ELLIPSE_FILL:
+            if mask & 0x01:
+                self._fill_rect(cx, cy - y, x + 1, 1, c)
+            if mask & 0x02:
+                self._fill_rect(cx - x, cy - y, x + 1, 1, c)
+            if mask & 0x04:
+                self._fill_rect(cx - x, cy + y, x + 1, 1, c)
+            if mask & 0x08:
+                self._fill_rect(cx, cy + y, x + 1, 1, c)
+        else:
+            if mask & 0x01:
+                self.pixel(cx + x, cy - y, c)
+            if mask & 0x02:
+                self.pixel(cx - x, cy - y, c)
+            if mask & 0x04:
+                self.pixel(cx - x, cy + y, c)
+            if mask & 0x08:
+                self.pixel(cx + x, cy + y, c)
+
+    def ellipse(self, cx, cy, xr, yr, c, f=False, m=_ELLIPSE_ALL):
+        mask = (_ELLIPSE_FILL if f else 0) | (m & _ELLIPSE_ALL)
+        if xr == 0 and yr == 0:
+            if mask & _ELLIPSE_ALL:
+                self.pixel(cx, cy, c)
+            return
+        two_asquare = 2 * xr * xr
+        two_bsquare = 2 * yr * yr
+        x = xr
+        y = 0
+        xchange = yr * yr * (1 - 2 * xr)
+        ychange = xr * xr
+        error = 0
+        stoppingx = two_bsquare * xr
+        stoppingy = 0
+        while stoppingx >= stoppingy:
+            self._ellipse_points(cx, cy, x, y, c, mask)
+            y += 1
+            stoppingy += two_asquare
+            error += ychange
+            ychange += two_asquare
+            if 2 * error + xchange > 0:
+                x -= 1
+                stoppingx -= two_bsquare
+                error += xchange
+                xchange += two_bsquare
+        x = 0
+        y = yr
+        xchange = yr * yr
+        ychange = xr * xr * (1 - 2 * yr)
+        error = 0
+        stoppingx = 0
+        stoppingy = two_asquare * yr
+        while stoppingx <= stoppingy:
+            self._ellipse_points(cx, cy, x, y, c, mask)
+            x += 1
+            stoppingx += two_bsquare
+            error += xchange
+            xchange += two_bsquare
+            if 2 * error + ychange > 0:
+                y -= 1
+                stoppingy -= two_asquare
+                error += ychange
+                ychange += two_asquare
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        if isinstance(fbuf, tuple):
+            fbuf = FrameBuffer(*fbuf)
+        if (x >= self._w or y >= self._h or -x >= fbuf._w or -y >= fbuf._h):
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x0end = min(self._w, x + fbuf._w)
+        y0end = min(self._h, y + fbuf._h)
+        if key == -1 and palette is None and fbuf._format == self._format:
+            bpp = self._bpp
+            n = (x0end - x0) * bpp
+            for row in range(y0end - y0):
+                dst = ((y0 + row) * self._stride + x0) * bpp
+                src = ((y1 + row) * fbuf._stride + x1) * bpp
+                self._buf[dst:dst + n] = fbuf._buf[src:src + n]
+            return
+        for row in range(y0end - y0):
+            for col in range(x0end - x0):
+                c = fbuf._get(x1 + col, y1 + row)
+                if palette is not None:
+                    c = palette._get(c, 0)
+                if c != key:
+                    self.pixel(x0 + col, y0 + row, c)
+
+    def scroll(self, xstep, ystep):
+        raise NotImplementedError("FrameBuffer.scroll is not simulated")
+
+    def text(self, s, x, y, c=1):
+        raise NotImplementedError("FrameBuffer.text is not simulated")
@@ -0,0 +1,281 @@
+"""
+  http_requests.py  checks the web server's request parsing on stand-in client streams
+
+      python -m sim.http_requests
+
+  Each check feeds a request to my_HTTPserver.handle_client through a stand-in
+  for the client's stream, in chunks with a gap between them, and the stream
+  is then left open as browsers leave it. The server must answer as soon as
+  the headers and any body have arrived, whatever the chunking, and reject
+  requests that do not fit its request buffer. Further checks send several
+  requests on one connection, which the server keeps open between them unless
+  the client or the connection cap says otherwise. Times are virtual, from the
+  simulator's clock. Exits with status 1 if a check fails.
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from . import install
+
+GAP = 0.002 # virtual seconds between the chunks a client sends
+ANSWER_LIMIT = 0.010 # virtual seconds from the last chunk to the answer
+
+
+class ClientStream(object):
+    # stands in for both the reader and the writer of one connection
+    def __init__(self, clock, chunks, close=False):
+        self.clock = clock
+        self.chunks = [bytes(c) for c in chunks]
+        self.close_at_end = close # the client closes once its chunks are sent, otherwise it waits
+        self.out = bytearray()
+        self.last_sent = None # virtual time the last chunk was read
+        self.written_at = None # virtual time of the server's last write
+        self.closed_at = None
+
+    async def read(self, n):
+        if not self.chunks:
+            if not self.close_at_end:
+                await asyncio.sleep(3600) # left open
+            return b''
+        await asyncio.sleep(GAP)
+        chunk = self.chunks[0][:n]
+        self.chunks[0] = self.chunks[0][n:]
+        if not self.chunks[0]:
+            self.chunks.pop(0)
+            if not self.chunks:
+                self.last_sent = self.clock.now
+        return chunk
+
+    def write(self, data):
+        self.out += data
+        self.written_at = self.clock.now
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        if self.closed_at is None:
+            self.closed_at = self.clock.now
+
+    async def wait_closed(self):
+        pass
+
+    def status(self):
+        return bytes(self.out).split(b'\r\n', 1)[0].decode()
+
+    def responses(self):
+        # the status line of each response, each framed by its Content-Length
+        out = bytes(self.out)
+        found = []
+        while out:
+            head, _, out = out.partition(b'\r\n\r\n')
+            lines = head.split(b'\r\n')
+            found.append(lines[0].decode())
+            for line in lines[1:]:
+                name, _, value = line.partition(b':')
+                if name.lower() == b'content-length':
+                    out = out[int(value):]
+        return found
+
+    def closes(self):
+        # whether the last response says the server closes the connection
+        return b'\r\nConnection: close\r\n' in bytes(self.out).rsplit(b'HTTP/1.1 ', 1)[-1]
+
+    def answer_time(self):
+        # virtual seconds from the last chunk to the server's answer
+        if self.written_at is None or self.last_sent is None:
+            return None
+        return self.written_at - self.last_sent
+
+    def close_time(self):
+        # virtual seconds from the last chunk to the server closing the connection
+        if self.closed_at is None or self.last_sent is None:
+            return None
+        return self.closed_at - self.last_sent
+
+
+class ReadintoStream(ClientStream):
+    # a MicroPython style stream, read with readinto
+    async def readinto(self, buf):
+        data = await self.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def run_checks(board, server):
+    import webserver
+    vclock = board.clock
+    failures = []
+    updates = []
+    server.update_func = updates.append
+
+    def check(ok, message):
+        print("ok  " if ok else "FAIL", message)
+        if not ok:
+            failures.append(message)
+
+    def serve(*streams):
+        async def all_clients():
+            await asyncio.gather(*[server.handle_client(s, s) for s in streams])
+        asyncio.run(all_clients())
+
+    def answered(stream):
+        t = stream.answer_time()
+        return t is not None and t < ANSWER_LIMIT
+
+    get = b'GET / HTTP/1.1\r\nHost: clock\r\nUser-Agent: check\r\nAccept: text/html\r\n\r\n'
+    for cls in (ClientStream, ReadintoStream):
+        s = cls(vclock, [get])
+        serve(s)
+        check(s.status() == 'HTTP/1.1 200 OK' and answered(s),
+              "{}: GET on an open connection answered in {:.1f} ms".format(cls.__name__, (s.answer_time() or 0) * 1000))
+
+    s = ReadintoStream(vclock, split(get, 1))
+    serve(s)
+    check(s.status() == 'HTTP/1.1 200 OK' and answered(s), "GET sent a byte at a time")
+
+    s = ClientStream(vclock, [get.replace(b'\r\n', b'\n')])
+    serve(s)
+    check(s.status() == 'HTTP/1.1 200 OK', "GET with bare LF line endings")
+
+    form = b'alarm_hour=7&alarm_min=45&show_secs=Yes'
+    post = (b'POST / HTTP/1.1\r\nHost: clock\r\nContent-Type: application/x-www-form-urlencoded\r\n'
+            b'Content-Length: ' + str(len(form)).encode() + b'\r\n\r\n')
+    for name, chunks in (("with the headers", [post + form]),
+                         ("partly with the headers", [post + form[:10], form[10:25], form[25:]]),
+                         ("after the headers", [post, form])):
+        del updates[:]
+        s = ReadintoStream(vclock, chunks)
+        serve(s)
+        check(s.status() == 'HTTP/1.1 200 OK' and answered(s) and
+              updates == [{'alarm_hour': '7', 'alarm_min': '45', 'show_secs': 'Yes'}],
+              "POST form body sent {}".format(name))
+
+    decoded = [webserver.url_decode(v) for v in ('a+b%2Cc', '%e2%82%ac', '100%', '%a', '%ag', '% 1')]
+    check(decoded == ['a b,c', '€', '100%', '%a', '%ag', '% 1'],
+          "form escapes need two hex digits, others are kept as sent: {}".format(decoded))
+
+    body = json.dumps({"alarm_min": "15"}).encode()
+    patch = (b'PATCH /api/settings HTTP/1.1\r\nContent-Type: application/json\r\n'
+             b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n')
+    del updates[:]
+    s = ClientStream(vclock, [patch[:20], patch[20:] + body[:3], body[3:]])
+    serve(s)
+    check(s.status() == 'HTTP/1.1 200 OK' and answered(s) and updates == [{'alarm_min': '15'}],
+          "PATCH /api/settings JSON body split across reads")
+
+    def broken_status():
+        raise KeyError('status')
+    status_func, server.status_func = server.status_func, broken_status
+    print_exception, webserver.print_exception = webserver.print_exception, lambda e: None # no traceback shown
+    s = ClientStream(vclock, [b'GET /api/status HTTP/1.1\r\n\r\n'])
+    serve(s)
+    server.status_func = status_func
+    webserver.print_exception = print_exception
+    check(s.status() == 'HTTP/1.1 500 Internal Server Error' and s.closes(), "an API error answered with a 500")
+
+    big = b'GET / HTTP/1.1\r\nCookie: ' + b'x' * webserver.REQUEST_BUF_LEN + b'\r\n\r\n'
+    s = ClientStream(vclock, split(big, 512))
+    serve(s)
+    check(s.status() == 'HTTP/1.1 400 Bad Request' and s.chunks,
+          "headers longer than REQUEST_BUF_LEN rejected before all are read")
+
+    long_post = b'POST / HTTP/1.1\r\nContent-Length: ' + str(webserver.MAX_BODY_LEN + 1).encode() + b'\r\n\r\n'
+    s = ClientStream(vclock, [long_post, b'a=1'])
+    serve(s)
+    check(s.status() == 'HTTP/1.1 400 Bad Request', "body longer than MAX_BODY_LEN rejected")
+
+    for length in (b'-5', b'abc', b'+3'):
+        s = ClientStream(vclock, [b'POST / HTTP/1.1\r\nContent-Length: ' + length + b'\r\n\r\na=1'])
+        serve(s)
+        check(s.status() == 'HTTP/1.1 400 Bad Request' and
+              all(len(b) == webserver.REQUEST_BUF_LEN for b in webserver.request_bufs),
+              "Content-Length {} rejected".format(length.decode()))
+
+    s = ClientStream(vclock, [b'GET / HT'], close=True)
+    serve(s)
+    check(not s.out and s.closed_at is not None, "client closing before the headers end gets no answer")
+
+    # the chunks of four clients interleave, each has its own buffer
+    del updates[:]
+    streams = [ReadintoStream(vclock, split(post + form.replace(b'7', str(h).encode()), 16)) for h in (1, 2, 3, 4)]
+    serve(*streams)
+    check(all(s.status() == 'HTTP/1.1 200 OK' for s in streams) and
+          sorted(u['alarm_hour'] for u in updates) == ['1', '2', '3', '4'],
+          "four requests at once are each parsed from their own buffer")
+
+    # keep-alive, each request waits for the answer to the one before as browsers do
+    api = b'GET /api/settings HTTP/1.1\r\nHost: clock\r\n\r\n'
+    s = ReadintoStream(vclock, [get, api, patch + body], close=True)
+    serve(s)
+    check(s.responses() == ['HTTP/1.1 200 OK'] * 3 and not s.closes(),
+          "three requests on one connection: {}".format(s.responses()))
+
+    s = ClientStream(vclock, [get.replace(b'\r\n\r\n', b'\r\nConnection: close\r\n\r\n'), api], close=True)
+    serve(s)
+    check(s.responses() == ['HTTP/1.1 200 OK'] and s.closes() and s.chunks, "Connection: close is honoured")
+
+    s = ClientStream(vclock, [api.replace(b'HTTP/1.1', b'HTTP/1.0'), api], close=True)
+    serve(s)
+    check(s.responses() == ['HTTP/1.1 200 OK'] and s.closes(), "HTTP/1.0 closes after one response")
+
+    s = ClientStream(vclock, [api, b'GET /nothing HTTP/1.1\r\n\r\n', api], close=True)
+    serve(s)
+    check(s.responses() == ['HTTP/1.1 200 OK', 'HTTP/1.1 404 Not Found', 'HTTP/1.1 200 OK'],
+          "a 404 keeps the connection open")
+
+    s = ClientStream(vclock, [api])
+    serve(s)
+    idle = s.close_time() or 0
+    check(s.responses() == ['HTTP/1.1 200 OK'] and not s.closes() and
+          webserver.KEEP_ALIVE_TIMEOUT <= idle < webserver.KEEP_ALIVE_TIMEOUT + ANSWER_LIMIT,
+          "an idle connection is closed after {:.3f} s".format(idle))
+
+    s = ClientStream(vclock, [api + api], close=True)
+    serve(s)
+    check(s.responses() == ['HTTP/1.1 200 OK'] and s.closes(), "pipelined requests close after the first")
+
+    streams = [ClientStream(vclock, [api]) for i in range(webserver.MAX_CONNECTIONS)]
+    serve(*streams)
+    kept = sum(not s.closes() for s in streams)
+    check(kept == webserver.MAX_KEEP_ALIVE, "{} of {} connections kept open".format(kept, len(streams)))
+    check(len(webserver.request_bufs) == webserver.MAX_CONNECTIONS and server.connections == 0 and
+          server.keep_alives == 0,
+          "request buffers returned after every connection")
+    return failures
+
+
+def main():
+    board = install(epoch=1718000000)
+    workdir = tempfile.mkdtemp(prefix='nixie_http_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import settings
+        import webserver
+        server = webserver.my_HTTPserver(settings, None)
+        # the server prints what it rejects, only the checks are shown
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            failures = run_checks(board, server)
+        print("\n".join(line for line in log.getvalue().splitlines() if line[:4] in ("ok  ", "FAIL")))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("{} failed".format(len(failures)) if failures else "all checks passed")
+    return not failures
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,135 @@
+"""
+  hw.py  the simulated board: pin levels, buses and the devices wired to them
+
+  The stand-in machine, neopixel and network modules all act on the single
+  Hardware instance created by sim.install(), so a test or benchmark can reach
+  everything the firmware has touched through sim.hardware.
+"""
+
+from . import devices
+
+# board wiring, as in settings.py
+CS_PINS = (2, 3, 4)   # 3 bit address of the selected LCD, 7 selects none
+DC_PIN = 8
+RTC_1HZ_PIN = 18
+
+hardware = None  # set by sim.install()
+
+
+class PinState(object):
+    def __init__(self, pin_id):
+        self.id = pin_id
+        self.level = 0
+        self.mode = None
+        self.pull = None
+        self.trigger = 0
+        self.handler = None
+        self.obj = None  # the Pin passed to the irq handler
+
+
+class Hardware(object):
+    def __init__(self, clock, rtc_start=None, wlan_status=3, sqw_phase=0.0):
+        self.clock = clock
+        self.pins = {}
+        self.panels = [devices.ST7789(i, clock) for i in range(6)]
+        self.rtc = devices.DS3231(clock, rtc_start, lambda: self.pulse(RTC_1HZ_PIN), sqw_phase)
+        self.i2c_devices = {self.rtc.address: self.rtc}
+        self.pwm = {}            # PWM objects by pin id
+        self.neopixels = []
+        self.wlan_status = wlan_status  # status reached by WLAN.connect(), 3 is STAT_GOT_IP
+        self.hostname = 'PicoW'
+        self.spi_bytes = 0
+        self.spi_baudrates = {}  # SPI bus id to the baudrate it was last set up with
+        self.flash_read_bytes = 0
+        self.i2c_transfers = 0
+        self.irqs = 0
+
+    def pin(self, pin_id):
+        if pin_id not in self.pins:
+            self.pins[pin_id] = PinState(pin_id)
+        return self.pins[pin_id]
+
+    def set_level(self, pin_id, level):
+        # drives a pin from outside the firmware, calling its irq handler on a matching edge
+        state = self.pin(pin_id)
+        level = 1 if level else 0
+        old = state.level
+        state.level = level
+        if state.handler and old != level:
+            rising = level and state.trigger & 0x08   # Pin.IRQ_RISING
+            falling = not level and state.trigger & 0x04 # Pin.IRQ_FALLING
+            if rising or falling:
+                self.irqs += 1
+                state.handler(state.obj)
+
+    def pulse(self, pin_id):
+        # a rising then falling edge, as seen on the DS3231 1Hz output each second
+        self.set_level(pin_id, 1)
+        self.set_level(pin_id, 0)
+
+    def press(self, pin_id, seconds):
+        # holds a button down for the given virtual time, starting now
+        # the buttons pull their pin high, button.py reads them as active high when pull is None
+        self.set_level(pin_id, 1)
+        self.clock.call_at(self.clock.now + seconds, lambda: self.set_level(pin_id, 0))
+
+    def selected_panel(self):
+        address = 0
+        for bit, pin_id in enumerate(CS_PINS):
+            address |= self.pin(pin_id).level << bit
+        return self.panels[address] if address < len(self.panels) else None
+
+    def spi_write(self, data, baudrate):
+        self.spi_bytes += len(data)
+        panel = self.selected_panel()
+        if panel is not None:
+            panel.write(self.pin(DC_PIN).level, data)
+        self.clock.advance(len(data) * 8 / baudrate)
+
+    def spi_dma(self, data, bus=1):
+        # bytes written to the SPI transmit FIFO by DMA, returns the seconds they take to send
+        # the panel receives them at once, the firmware has to wait out the time before raising CS
+        self.spi_bytes += len(data)
+        panel = self.selected_panel()
+        if panel is not None:
+            panel.write(self.pin(DC_PIN).level, data)
+        return len(data) * 8 / self.spi_baudrates.get(bus, 1000000)
+
+    def flash_read(self, nbytes, rate):
+        self.flash_read_bytes += nbytes
+        self.clock.advance(nbytes / rate)
+
+    def i2c_device(self, addr):
+        if addr not in self.i2c_devices:
+            raise OSError(5) # EIO, as MicroPython reports a missing device
+        return self.i2c_devices[addr]
+
+    def i2c_cost(self, nbytes, freq):
+        # start, address, register, repeated start, address, data, each 9 clocks
+        self.i2c_transfers += 1
+        self.clock.advance((nbytes + 3) * 9 / freq)
+
+    def backlight(self):
+        # LCD backlight level 0-100 from the PWM on the BL pin
+        pwm = self.pwm.get(13)
+        return 100 if pwm is None else min(100, pwm.duty // 655) # display.py sets duty to 655 * level
+
+    def save_panels(self, path_format, upright=True, dim=False):
+        # writes each panel as a PNG, path_format has a {} for the panel number
+        # dim scales the pixels by the backlight level, otherwise they are shown at full brightness
+        level = self.backlight() if dim else 100
+        names = []
+        for panel in self.panels:
+            name = path_format.format(panel.index)
+            devices.write_png(name, panel.rgb_rows(upright, level))
+            names.append(name)
+        return names
+
+    def save_clock(self, filename, gap=8, dim=False):
+        # writes all six panels side by side, left digit first, as the clock is seen
+        level = self.backlight() if dim else 100
+        images = [p.rgb_rows(True, level) for p in reversed(self.panels)] # panel 5 is the left digit
+        spacer = b'\x00' * 3 * gap
+        rows = [spacer.join(img[y] for img in images) for y in range(len(images[0]))]
+        devices.write_png(filename, rows)
+        return filename
@@ -0,0 +1,162 @@
+"""
+  machine.py  stand-in for the MicroPython machine module on the simulated Pico W
+
+  Pin, PWM, SPI and I2C act on sim.hw.hardware. Only the parts of the API used
+  by the clock firmware are provided.
+"""
+
+import sys
+import time
+
+from . import hw
+
+
+class Pin(object):
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=None, pull=None, value=None):
+        self.id = id
+        self.state = hw.hardware.pin(id)
+        self.init(mode, pull, value)
+
+    def init(self, mode=None, pull=None, value=None):
+        if mode is not None:
+            self.state.mode = mode
+        if pull is not None:
+            self.state.pull = pull
+        if value is not None:
+            self.value(value)
+
+    def value(self, v=None):
+        if v is None:
+            return self.state.level
+        if self.state.mode != Pin.IN:
+            self.state.level = 1 if v else 0
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self.state.handler = handler
+        self.state.trigger = trigger
+        self.state.obj = self
+
+    def __repr__(self):
+        return "Pin({})".format(self.id)
+
+
+class PWM(object):
+    def __init__(self, pin, freq=None, duty_u16=None):
+        self.pin = pin
+        self._freq = 0
+        self.duty = 0
+        hw.hardware.pwm[pin.id] = self
+        if freq is not None:
+            self.freq(freq)
+        if duty_u16 is not None:
+            self.duty_u16(duty_u16)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self.duty
+        self.duty = max(0, min(65535, value))
+
+    def deinit(self):
+        self.duty = 0
+
+
+class SPI(object):
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id, baudrate=1000000, polarity=0, phase=0, bits=8, firstbit=MSB,
+                 sck=None, mosi=None, miso=None):
+        self.id = id
+        self.baudrate = baudrate
+        hw.hardware.spi_baudrates[id] = baudrate
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate:
+            self.baudrate = baudrate
+            hw.hardware.spi_baudrates[self.id] = baudrate
+
+    def write(self, buf):
+        hw.hardware.spi_write(buf, self.baudrate)
+
+    def deinit(self):
+        pass
+
+
+class I2C(object):
+    def __init__(self, id, scl=None, sda=None, freq=400000, timeout=50000):
+        self.id = id
+        self.freq = freq
+
+    def scan(self):
+        return sorted(hw.hardware.i2c_devices)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        data = hw.hardware.i2c_device(addr).read(memaddr, nbytes)
+        hw.hardware.i2c_cost(nbytes, self.freq)
+        return data
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        buf[:] = self.readfrom_mem(addr, memaddr, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        hw.hardware.i2c_device(addr).write(memaddr, bytes(buf))
+        hw.hardware.i2c_cost(len(buf), self.freq)
+
+
+class RTC(object):
+    # the rp2 RTC, kept in step with the virtual clock
+    def datetime(self, dt=None):
+        if dt is not None:
+            return # the firmware keeps time in the DS3231, setting the Pico RTC is not modelled
+        tm = time.gmtime(hw.hardware.clock.time())
+        return (tm[0], tm[1], tm[2], tm[6], tm[3], tm[4], tm[5], 0)
+
+
+def freq(hz=None):
+    return 125000000 if hz is None else None
+
+
+def unique_id():
+    return b'\xe6\x61\x38\x10\x43\x51\x2a\x2f'
+
+
+def idle():
+    hw.hardware.clock.advance(0.001)
+
+
+def reset():
+    sys.exit("machine.reset()")
+
+
+def soft_reset():
+    sys.exit("machine.soft_reset()")
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
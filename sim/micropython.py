@@ -0,0 +1,53 @@
+"""
+  micropython.py  stand-in for the MicroPython micropython module
+"""
+
+import gc
+
+
+def const(x):
+    return x
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=None):
+    print("mem: total={} free={} (host estimate)".format(gc.mem_alloc() + gc.mem_free(), gc.mem_free()))
+
+
+def opt_level(level=None):
+    return 0 if level is None else None
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def heap_lock():
+    return 0
+
+
+def heap_unlock():
+    return 0
+
+
+def kbd_intr(chr):
+    pass
+
+
+def stack_use():
+    return 0
+
+
+def qstr_info(verbose=None):
+    pass
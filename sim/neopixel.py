@@ -0,0 +1,39 @@
+"""
+  neopixel.py  stand-in for the MicroPython neopixel module
+
+  Colours are kept per pixel, write() copies them to shown, which is what the
+  LEDs would be displaying.
+"""
+
+from . import hw
+
+
+class NeoPixel(object):
+    ORDER = (1, 0, 2, 3)
+
+    def __init__(self, pin, n, bpp=3, timing=1):
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.pixels = [(0,) * bpp] * n
+        self.shown = list(self.pixels)
+        self.writes = 0
+        hw.hardware.neopixels.append(self)
+
+    def __len__(self):
+        return self.n
+
+    def __setitem__(self, i, colour):
+        self.pixels[i] = tuple(colour)
+
+    def __getitem__(self, i):
+        return self.pixels[i]
+
+    def fill(self, colour):
+        self.pixels = [tuple(colour)] * self.n
+
+    def write(self):
+        self.shown = list(self.pixels)
+        self.writes += 1
+        # 24 bits per LED at 800kHz
+        hw.hardware.clock.advance(self.n * self.bpp * 8 / 800000)
@@ -0,0 +1,67 @@
+"""
+  network.py  stand-in for the MicroPython network module of the Pico W
+
+  WLAN.connect() reaches sim.hardware.wlan_status after a short virtual delay.
+  The firmware's sockets are real host sockets, ifconfig reports the loopback
+  address so the web server can be reached from the host.
+"""
+
+from . import hw
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+CONNECT_TIME = 1.5  # virtual seconds from connect() to the final status
+
+
+def hostname(name=None):
+    if name is None:
+        return hw.hardware.hostname
+    hw.hardware.hostname = name
+
+
+class WLAN(object):
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._active = False
+        self._status = STAT_IDLE
+        self.ssid = None
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+
+    def connect(self, ssid=None, key=None):
+        self.ssid = ssid
+        self._status = STAT_CONNECTING
+        clock = hw.hardware.clock
+        clock.call_at(clock.now + CONNECT_TIME, self.connected)
+
+    def connected(self):
+        if self._status == STAT_CONNECTING:
+            self._status = hw.hardware.wlan_status
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+
+    def status(self, param=None):
+        return self._status
+
+    def isconnected(self):
+        return self._status == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        return ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+
+    def config(self, *args, **kwargs):
+        if args == ('mac',):
+            return b'\x28\xcd\xc1\x00\x00\x01'
+        return None
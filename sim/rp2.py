@@ -0,0 +1,62 @@
+"""
+  rp2.py  stand-in for the MicroPython rp2 module
+
+  Only DMA is modelled, and only transfers into an SPI data register, which is
+  how the display feeds the LCDs while the CPU carries on. The bytes reach the
+  panel when the transfer starts, active() stays true for the time the SPI
+  bus takes to send them.
+"""
+
+from . import hw
+
+SPI_SSPDR = {0x4003c008: 0, 0x40040008: 1} # data register address to SPI bus id
+POLL_TIME = 50e-6 # virtual seconds taken by each active() call while the transfer runs
+
+
+class DMA(object):
+    def __init__(self):
+        self.read = None
+        self.write = None
+        self.count = 0
+        self.ctrl = 0
+        self.busy_until = 0.0
+        self.transfers = 0
+
+    def pack_ctrl(self, default=None, **kwargs):
+        ctrl = dict(default or {})
+        ctrl.update(kwargs)
+        return ctrl
+
+    def unpack_ctrl(self, ctrl):
+        return dict(ctrl)
+
+    def config(self, read=None, write=None, count=None, ctrl=None, trigger=False):
+        if read is not None:
+            self.read = read
+        if write is not None:
+            self.write = write
+        if count is not None:
+            self.count = count
+        if ctrl is not None:
+            self.ctrl = ctrl
+        if trigger:
+            self.active(1)
+
+    def active(self, value=None):
+        clock = hw.hardware.clock
+        if value is None:
+            remaining = self.busy_until - clock.now
+            if remaining > 0:
+                clock.advance(min(remaining, POLL_TIME))
+            return 1 if clock.now < self.busy_until else 0
+        if value:
+            if self.write not in SPI_SSPDR:
+                raise NotImplementedError("DMA is only simulated into an SPI data register")
+            size = 1 << self.ctrl.get("size", 2)
+            data = memoryview(self.read).cast('B')[:self.count * size] # sent at once, so no copy is needed
+            self.transfers += 1
+            self.busy_until = max(self.busy_until, clock.now) + hw.hardware.spi_dma(data, SPI_SSPDR[self.write])
+        return None
+
+    def close(self):
+        pass
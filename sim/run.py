@@ -0,0 +1,123 @@
+"""
+  run.py  runs the clock firmware (main.py) on the host simulator
+
+      python -m sim.run [--seconds 30] [--out sim_out] [--port 8080] ...
+
+  The firmware runs in a scratch directory holding copies of the digit images,
+  the .idx images, deltas.bin and the .seq animations if they are next to them,
+  and the web page assets, so its settings.json does not touch the source tree.
+  When the virtual run time is up the six LCDs are saved as PNG files, one per
+  panel plus clock.png with all six side by side, and a summary is printed.
+"""
+
+import argparse
+import calendar
+import glob
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+
+from . import install, ROOT, SimulationEnd
+
+
+# files copied from the repository root for the firmware to find, the optional ones as the Pico would have them
+RUNTIME_FILES = ('*.raw', '*.idx', 'deltas.bin', '*.seq')
+
+
+def parse_time(text):
+    # 'YYYY-MM-DD HH:MM:SS' UTC to unix time
+    return calendar.timegm(time.strptime(text, '%Y-%m-%d %H:%M:%S'))
+
+
+def prepare_workdir(workdir, settings_file=None):
+    for pattern in RUNTIME_FILES:
+        for name in glob.glob(os.path.join(ROOT, pattern)):
+            shutil.copy(name, workdir)
+    for folder in ('images', 'www'):
+        path = os.path.join(ROOT, folder)
+        if os.path.isdir(path):
+            shutil.copytree(path, os.path.join(workdir, folder), dirs_exist_ok=True)
+    if settings_file:
+        shutil.copy(settings_file, os.path.join(workdir, 'settings.json'))
+
+
+def run_firmware(board, seconds):
+    # runs main.py until the virtual clock reaches seconds, returns the host seconds taken
+    board.clock.end_at(seconds)
+    start = time.perf_counter()
+    try:
+        runpy.run_path(os.path.join(ROOT, 'main.py'), run_name='__main__')
+    except SimulationEnd:
+        pass
+    return time.perf_counter() - start
+
+
+def boot_firmware(board, seconds):
+    # runs main.py until the virtual clock reaches seconds and returns its globals, so
+    # its objects can be inspected or driven further, e.g. asyncio.run(ns['main']())
+    board.clock.end_at(seconds)
+    ns = {'__name__': '__main__'}
+    with open(os.path.join(ROOT, 'main.py')) as f:
+        code = compile(f.read(), 'main.py', 'exec')
+    try:
+        exec(code, ns)
+    except SimulationEnd:
+        pass
+    return ns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sim.run', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--seconds', type=float, default=30, help='virtual seconds to run for')
+    parser.add_argument('--out', default='sim_out', help='directory for the LCD images')
+    parser.add_argument('--utc', help="UTC time at boot 'YYYY-MM-DD HH:MM:SS', default now")
+    parser.add_argument('--rtc', help="time held by the DS3231 at boot, default as --utc")
+    parser.add_argument('--speed', type=float, help='pace the run, 1.0 is real time, default flat out')
+    parser.add_argument('--cpu-scale', type=float, default=0.0,
+                        help='virtual seconds charged per host second of firmware code')
+    parser.add_argument('--port', type=int, default=8080, help='web server port on the host')
+    parser.add_argument('--wifi', type=int, default=3,
+                        help='status WLAN.connect() ends in, 3 connects, -2 is AP not found')
+    parser.add_argument('--settings', help='settings.json to start with')
+    parser.add_argument('--press', action='append', default=[], metavar='PIN:AT:HOLD',
+                        help='press the button on PIN at virtual second AT for HOLD seconds')
+    args = parser.parse_args(argv)
+
+    epoch = parse_time(args.utc) if args.utc else None
+    rtc_start = parse_time(args.rtc) if args.rtc else None
+    board = install(epoch=epoch, speed=args.speed, cpu_scale=args.cpu_scale, rtc_start=rtc_start,
+                    wlan_status=args.wifi, http_port=args.port)
+    for press in args.press:
+        pin, at, hold = press.split(':')
+        board.clock.call_at(float(at), lambda pin=int(pin), hold=float(hold): board.press(pin, hold))
+
+    out = os.path.abspath(args.out)
+    os.makedirs(out, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix='nixie_sim_')
+    prepare_workdir(workdir, args.settings)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    if getattr(sys.modules.get('secrets'), '__file__', '').find(ROOT) != 0:
+        sys.modules.pop('secrets', None) # the standard library module of the same name
+    try:
+        elapsed = run_firmware(board, args.seconds)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    board.save_panels(os.path.join(out, 'lcd{}.png'))
+    board.save_clock(os.path.join(out, 'clock.png'))
+    clock = board.clock
+    print("\nsimulated {:.1f}s in {:.2f}s ({:.0f}x real time)".format(
+        clock.now, elapsed, clock.now / elapsed if elapsed else 0))
+    print("1Hz edges {}  irqs {}  spi bytes {}  i2c transfers {}".format(
+        board.rtc.edges, board.irqs, board.spi_bytes, board.i2c_transfers))
+    print("frames per panel (left to right)", [p.frames for p in reversed(board.panels)])
+    print("images written to", out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+  settings_power_loss.py  checks saved settings survive a power cut during a write
+
+      python -m sim.settings_power_loss
+
+  Saves settings twice, so settings.json and settings.bak both hold a version,
+  then saves a newer version and cuts the power after each step of
+  write_settings: the json written to settings.tmp without its CRC line, the
+  CRC line written, settings.bak removed, settings.json renamed to
+  settings.bak and settings.tmp renamed to settings.json. On the next boot
+  load_settings must find the newer or the previous version, never the
+  defaults or the version before, and leave files that load the same again.
+  Once settings.json has been renamed away the newer version must be loaded
+  from the complete settings.tmp.
+  Exits with status 1 if a check fails.
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+from . import install
+
+# the steps of write_settings, and the version a boot after a power cut at each should load:
+# the previous one until settings.json is renamed away, then the newer one from settings.tmp
+STEPS = (('json written', 'previous'), ('crc written', 'previous'), ('backup removed', 'previous'),
+         ('settings renamed', 'newer'), ('temp renamed', 'newer'))
+
+
+class PowerCut(Exception):
+    pass
+
+
+class Cut(object):
+    # stands in for open and the os module in settings, cutting the power at one step of write_settings
+    def __init__(self, step):
+        self.step = step
+        self.steps = [] # the steps reached
+
+    def reached(self, step):
+        self.steps.append(step)
+        if step == self.step:
+            raise PowerCut(step)
+
+    def open(self, name, mode="r"):
+        file = open(name, mode)
+        return CutFile(file, self) if "w" in mode else file
+
+    def remove(self, name):
+        os.remove(name)
+        self.reached('backup removed')
+
+    def rename(self, old, new):
+        os.rename(old, new)
+        self.reached('settings renamed' if old != 'settings.tmp' else 'temp renamed')
+
+    def __getattr__(self, name):
+        return getattr(os, name)
+
+
+class CutFile(object):
+    # a file being written, the power is cut after the json or after its CRC line
+    def __init__(self, file, cut):
+        self.file = file
+        self.cut = cut
+        self.writes = 0
+
+    def write(self, text):
+        n = self.file.write(text)
+        self.writes += 1
+        self.cut.reached('json written' if self.writes == 1 else 'crc written')
+        return n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.file.close() # what reached the flash before the cut stays there
+
+
+def boot(settings):
+    # loads the settings from flash as a boot after the power cut would, returns alarm_min
+    settings.settings.clear()
+    settings.settings.update(settings.defaults)
+    settings.load_settings()
+    return settings.get_setting("alarm_min")
+
+
+def save(settings, alarm_min, cut=None):
+    settings.set_setting("alarm_min", alarm_min)
+    if cut is None:
+        settings.write_settings()
+        return
+    settings.open = cut.open
+    settings.os = cut
+    try:
+        settings.write_settings()
+    except PowerCut:
+        pass
+    finally:
+        del settings.open
+        settings.os = os
+
+
+def run_checks(settings, workdir):
+    # returns a list of failure messages
+    failures = []
+
+    def check(ok, message):
+        print("ok  " if ok else "FAIL", message)
+        if not ok:
+            failures.append(message)
+
+    default = settings.defaults["alarm_min"]
+    older, previous, newer = [str((int(default) + n) % 60) for n in (10, 20, 30)]
+    for step, expected in STEPS + ((None, 'newer'),):
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        save(settings, older)
+        save(settings, previous)
+        when = "power cut after " + step if step else "no power cut"
+        cut = Cut(step)
+        save(settings, newer, cut)
+        if step is None:
+            check(cut.steps == [name for name, _ in STEPS], "write_settings takes the steps {}".format(cut.steps))
+        loaded = boot(settings)
+        found = {newer: "newer", previous: "previous", older: "older", default: "default"}.get(loaded, loaded)
+        check(found == expected, "{}: loads the {} settings, {} expected".format(when, found, expected))
+        check(boot(settings) == loaded, "{}: loads the same again".format(when))
+    return failures
+
+
+def main():
+    install(epoch=1718000000)
+    workdir = tempfile.mkdtemp(prefix='nixie_settings_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import settings
+        # settings prints as it loads and saves, only the checks are shown
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            failures = run_checks(settings, workdir)
+        print("\n".join(line for line in log.getvalue().splitlines() if line[:4] in ("ok  ", "FAIL")))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("{} failed".format(len(failures)) if failures else "all checks passed")
+    return not failures
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
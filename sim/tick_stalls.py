@@ -0,0 +1,143 @@
+"""
+  tick_stalls.py  checks the clock catches up after the main loop is held up
+
+      python -m sim.tick_stalls
+
+  Boots main.py on the simulator, with the DS3231 model raising the 1Hz
+  interrupt, then stalls the main loop the way a slow NTP retry or web request
+  would. A short stall must not skip a second. A stall of several seconds
+  across the alarm minute must be reported as skipped seconds, drawn as one
+  render of the latest time, and still sound the alarm. Exits with status 1
+  if a check fails.
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+from . import install, SimulationEnd
+from .run import boot_firmware, prepare_workdir
+
+BOOT_SECONDS = 10     # long enough for main.py to connect and start its loop
+SHORT_STALL = 0.6     # seconds, less than a tick so nothing is skipped
+LONG_STALL = 3.5      # seconds, held across the start of the alarm minute
+LONG_STALL_LEAD = 1.2 # seconds before the alarm minute that the long stall starts
+
+
+def run_checks(board, ns):
+    # returns a list of failure messages
+    clock = ns['clock']
+    settings = ns['settings']
+    vclock = board.clock
+    failures = []
+
+    def check(ok, message):
+        print("ok  " if ok else "FAIL", message)
+        if not ok:
+            failures.append(message)
+
+    # alarm at the start of the next whole minute, far enough ahead for the short stall first
+    hr, mins, sec = clock.rtc_ds3231.localtime()[3:6]
+    minutes_ahead = 1 if sec < 50 else 2
+    # from the last 1Hz edge, so the stalls fall at the same point in the second however long boot took
+    last_edge = vclock.now - vclock.ticks_diff(vclock.ticks_ms(), type(clock).tick_ms) / 1000
+    minute_at = last_edge + minutes_ahead * 60 - sec
+    alarm_hr, alarm_min = divmod(hr * 60 + mins + minutes_ahead, 60)
+    settings.set_setting("alarm_on", "Yes")
+    settings.set_setting("alarm_hour", str(alarm_hr % 24))
+    settings.set_setting("alarm_min", str(alarm_min))
+
+    # stalls are injected into the main loop's call to settings.service, each across a 1Hz edge
+    stalls = [(minute_at - 6 - SHORT_STALL / 2, SHORT_STALL), (minute_at - LONG_STALL_LEAD, LONG_STALL)]
+    settings_service = settings.service
+
+    def stalling_service():
+        if stalls and vclock.now >= stalls[0][0]:
+            vclock.sleep(stalls.pop(0)[1]) # interrupts keep arriving while the loop is held
+        settings_service()
+
+    renders = [] # (ticks, skipped_secs, virtual ms taken) for each service call
+    clock_service = clock.service
+
+    def counting_service(ticks=1):
+        start = vclock.now
+        clock_service(ticks)
+        renders.append((ticks, clock.skipped_secs, (vclock.now - start) * 1000))
+
+    settings.service = stalling_service
+    clock.service = counting_service
+    skipped_before = clock.skipped_secs
+    try:
+        # up to just before the long stall, past the short one
+        vclock.end_at(minute_at - LONG_STALL_LEAD - 0.1)
+        try:
+            asyncio.run(ns['main']())
+        except SimulationEnd:
+            pass
+        check(clock.skipped_secs == skipped_before,
+              "{}s stall skips no seconds (skipped {})".format(SHORT_STALL, clock.skipped_secs - skipped_before))
+        check(clock.tick_latency_max < 1000,
+              "{}s stall keeps tick latency under a second ({} ms)".format(SHORT_STALL, clock.tick_latency_max))
+
+        del renders[:]
+        vclock.end_at(minute_at + 5)
+        try:
+            asyncio.run(ns['main']())
+        except SimulationEnd:
+            pass
+    finally:
+        settings.service = settings_service
+        clock.service = clock_service
+
+    skipped = clock.skipped_secs - skipped_before
+    check(skipped >= int(LONG_STALL) - 1,
+          "{}s stall reports skipped seconds (skipped {})".format(LONG_STALL, skipped))
+    catch_up = [ticks for ticks, _, _ in renders if ticks > 1]
+    # the oldest waiting tick came after the stall began, and is done once the catch-up render is,
+    # which includes the alarm's beeps when it starts
+    render_ms = max([ms for ticks, _, ms in renders if ticks > 1] or [0])
+    check(len(catch_up) == 1 and catch_up[0] == skipped + 1,
+          "pending ticks drawn in one render (renders with ticks > 1: {})".format(catch_up))
+    check(LONG_STALL * 1000 - 1000 < clock.tick_latency_max <= LONG_STALL * 1000 + render_ms + 100,
+          "worst tick latency covers the stall ({} ms, {:.0f} ms of it the catch-up render)".format(
+              clock.tick_latency_max, render_ms))
+    check(clock.pending_ticks() <= 1, "no ticks left waiting ({})".format(clock.pending_ticks()))
+    hr, mins = clock.rtc_ds3231.localtime()[3:5]
+    shown = clock.digits_cache[3:5] + clock.digits_cache[1:2]
+    check(shown == [mins // 10, mins % 10, hr % 10],
+          "display shows the latest time {:02d}:{:02d} (digits {})".format(hr, mins, shown))
+    check(clock.alarm.triggered, "alarm sounds when its first second was skipped")
+    status = ns['web_status']()
+    check(status["skipped_secs"] == clock.skipped_secs and status["tick_latency_max_ms"] == clock.tick_latency_max,
+          "/api/status reports skipped seconds and worst tick latency")
+    return failures
+
+
+def main():
+    board = install(epoch=1718000000, http_port=0)
+    workdir = tempfile.mkdtemp(prefix='nixie_ticks_')
+    prepare_workdir(workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.modules.pop('secrets', None) # the standard library module of that name
+    try:
+        # the firmware prints as it works, only the checks are shown
+        with contextlib.redirect_stdout(io.StringIO()):
+            ns = boot_firmware(board, BOOT_SECONDS)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            failures = run_checks(board, ns)
+        print("\n".join(line for line in log.getvalue().splitlines() if line[:4] in ("ok  ", "FAIL")))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("{} failed".format(len(failures)) if failures else "all checks passed")
+    return not failures
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
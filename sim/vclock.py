@@ -0,0 +1,189 @@
+"""
+  vclock.py  virtual time for the host simulator
+
+  All time seen by the firmware (time.sleep, time.ticks_ms, time.time, asyncio
+  sleeps and timeouts) comes from a VirtualClock. Time only moves forward when
+  the firmware waits or when a simulated device charges for an operation such
+  as an SPI transfer, so the clock runs as fast as the host allows unless a
+  real time speed is set.
+"""
+
+import asyncio
+import heapq
+import selectors
+import time as _time
+
+_sleep = _time.sleep  # time.sleep itself is replaced by sim.install()
+_perf_counter = _time.perf_counter
+_host_time = _time.time
+
+TICKS_PERIOD = 1 << 30  # MicroPython ticks_ms/ticks_us wrap at this value
+TICKS_HALF = TICKS_PERIOD // 2
+
+
+class SimulationEnd(BaseException):
+    # raised out of the firmware when the requested run time has passed
+    pass
+
+
+class VirtualClock(object):
+    def __init__(self, epoch=None, speed=None, cpu_scale=0.0):
+        self.now = 0.0           # seconds since the simulated boot
+        self.epoch = _host_time() if epoch is None else epoch  # unix time at boot
+        self.speed = speed       # None runs flat out, 1.0 paces the simulation at real time
+        self.cpu_scale = cpu_scale  # virtual seconds charged per host second of firmware execution
+        self.events = []         # heap of (when, seq, func)
+        self.seq = 0
+        self.stop_at = None
+        self.stopped = False
+        self.end_pending = False # the end was reached in a task, the event loop raises it
+        self.real_mark = _perf_counter()
+
+    def call_at(self, when, func):
+        # func() is called when virtual time reaches when
+        self.seq += 1
+        heapq.heappush(self.events, (when, self.seq, func))
+
+    def end_at(self, when):
+        # SimulationEnd is raised once, when virtual time reaches when
+        self.stop_at = when
+        self.stopped = False
+        self.end_pending = False
+
+    def next_event(self):
+        # seconds until the next scheduled event such as an interrupt, None if there are none
+        return max(0.0, self.events[0][0] - self.now) if self.events else None
+
+    def charge_cpu(self):
+        # adds the host time used by the firmware since the last call, scaled by cpu_scale
+        real = _perf_counter()
+        if self.cpu_scale:
+            self.advance_to(self.now + (real - self.real_mark) * self.cpu_scale, charge=False)
+        self.real_mark = _perf_counter()
+
+    def advance(self, seconds):
+        self.advance_to(self.now + max(0.0, seconds))
+
+    def advance_to(self, target, charge=True, pace=True):
+        if charge:
+            self.charge_cpu()
+            target = max(target, self.now)
+        if self.speed and pace:
+            ahead = (target - self.now) / self.speed
+            if ahead > 0:
+                _sleep(ahead)
+        while self.events and self.events[0][0] <= target:
+            when, _, func = heapq.heappop(self.events)
+            self.now = max(self.now, when)
+            func()
+        self.now = max(self.now, target)
+        if self.stop_at is not None and self.now >= self.stop_at and not self.stopped:
+            self.stopped = True
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                raise SimulationEnd()
+            # a task would only record the exception, so it is raised out of the
+            # event loop when the running task next waits
+            self.end_pending = True
+        self.real_mark = _perf_counter()
+
+    # MicroPython time module functions
+    def ticks_ms(self):
+        return int(self.now * 1000) % TICKS_PERIOD
+
+    def ticks_us(self):
+        return int(self.now * 1000000) % TICKS_PERIOD
+
+    @staticmethod
+    def ticks_diff(a, b):
+        return ((a - b + TICKS_HALF) % TICKS_PERIOD) - TICKS_HALF
+
+    @staticmethod
+    def ticks_add(t, delta):
+        return (t + delta) % TICKS_PERIOD
+
+    def time(self):
+        return int(self.epoch + self.now)
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def sleep_ms(self, ms):
+        self.advance(ms / 1000)
+
+    def sleep_us(self, us):
+        self.advance(us / 1000000)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    # real sockets are polled without blocking, waiting advances the virtual clock instead
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        if self.clock.end_pending:
+            self.clock.end_pending = False
+            raise SimulationEnd()
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        # the wait ends at the next device event, so an interrupt that sets a
+        # ThreadSafeFlag wakes the waiting task as it does on the Pico
+        event = self.clock.next_event()
+        if event is not None and (timeout is None or event < timeout):
+            timeout = event
+        if timeout is None:
+            return super().select(None)
+        if self.clock.speed:
+            # paced, so wait in real time for the sockets and only move the clock on by the time waited
+            start = _perf_counter()
+            events = super().select(timeout / self.clock.speed)
+            waited = timeout if not events else (_perf_counter() - start) * self.clock.speed
+            self.clock.advance_to(self.clock.now + min(waited, timeout), pace=False)
+            return events
+        self.clock.advance(timeout)
+        return []
+
+
+class ThreadSafeFlag(object):
+    # MicroPython's asyncio.ThreadSafeFlag, set() can be called from an interrupt handler
+    def __init__(self):
+        self.state = False
+        self.waiter = None
+
+    def set(self):
+        self.state = True
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        while not self.state:
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        self.state = False
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock):
+        super().__init__(VirtualSelector(clock))
+        self.sim_clock = clock
+
+    def time(self):
+        return self.sim_clock.now
+
+
+class VirtualEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def new_event_loop(self):
+        return VirtualEventLoop(self.clock)
@@ -0,0 +1,128 @@
+"""
+  stats.py  Copyright (c) 2024 Michael Margolis
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED
+"""
+
+"""
+Counters and histograms for the clock's hot paths, reported by the web server
+at /api/metrics.
+Everything is allocated at import and updating a counter or histogram does not
+allocate, so they can be used from the 1Hz interrupt handler. Each place that
+records something is guarded with
+    if stats.enabled:
+so while disabled (the default) the cost is one attribute lookup and branch.
+Counters are 32 bit and wrap, reset them through the API for long measurements.
+"""
+
+import gc
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    const = lambda x : x
+
+enabled = False
+
+# indexes into counters
+SPI_BYTES = const(0)      # bytes sent to the LCDs
+FLASH_BYTES = const(1)    # bytes read from digit image and static web files
+I2C_TRANSFERS = const(2)  # DS3231 register reads and writes
+MISSED_TICKS = const(3)   # seconds not shown because the main loop was late for their 1Hz interrupt
+GC_COLLECTIONS = const(4) # garbage collections seen between main loop passes
+SKIPPED_FRAMES = const(5) # LCD frames not sent because the LCD already showed them
+TRANSITION_FRAMES = const(6) # frames of digit transition effects sent
+DROPPED_FRAMES = const(7) # transition frames left out because the frames before took too long
+counter_names = ('spi_bytes', 'flash_bytes', 'i2c_transfers', 'missed_ticks', 'gc_collections', 'skipped_frames',
+                 'transition_frames', 'dropped_frames')
+counters = array('L', [0] * len(counter_names))
+
+heap_low = 0   # lowest gc.mem_free() seen
+last_alloc = 0 # gc.mem_alloc() at the previous sample_heap call
+
+
+class Histogram(object):
+    def __init__(self, name, bounds):
+        self.name = name
+        self.bounds = bounds # upper bound of each bucket, a last bucket counts larger values
+        self.counts = array('L', [0] * (len(bounds) + 1))
+        self.max = 0
+
+    def add(self, value):
+        i = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        if value > self.max:
+            self.max = value
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.max = 0
+
+
+# milliseconds from the 1Hz interrupt to the display showing the new second
+tick_latency = Histogram('tick_latency_ms', (5, 10, 20, 50, 100, 200, 500, 1000))
+# milliseconds taken by each pass of the main loop
+loop_time = Histogram('loop_ms', (1, 2, 5, 10, 20, 50, 100, 200, 500))
+# milliseconds to make and send a frame of a digit transition, for every LCD changing
+transition_frame = Histogram('transition_frame_ms', (10, 20, 40, 60, 100, 200, 500))
+# milliseconds to read and send a frame of an animation (see animation.py), for every LCD playing it
+animation_frame = Histogram('animation_frame_ms', (10, 20, 40, 60, 100, 200, 500))
+histograms = (tick_latency, loop_time, transition_frame, animation_frame)
+
+
+def sample_heap():
+    # call once per main loop pass, a drop in allocated memory means a collection has run
+    global heap_low, last_alloc
+    alloc = gc.mem_alloc()
+    free = gc.mem_free()
+    if alloc < last_alloc:
+        counters[GC_COLLECTIONS] += 1
+    last_alloc = alloc
+    if free < heap_low:
+        heap_low = free
+
+
+def reset():
+    global heap_low, last_alloc
+    for i in range(len(counters)):
+        counters[i] = 0
+    for h in histograms:
+        h.reset()
+    heap_low = gc.mem_free()
+    last_alloc = gc.mem_alloc()
+
+
+def enable(on=True):
+    # starts with everything cleared when turned on
+    global enabled
+    if on and not enabled:
+        reset()
+    enabled = bool(on)
+
+
+def snapshot():
+    # returns the current values as a dict for the web server, this allocates
+    return {
+        "enabled": enabled,
+        "counters": {counter_names[i]: counters[i] for i in range(len(counters))},
+        "heap_free_low": heap_low,
+        "histograms": {h.name: {"bounds": list(h.bounds), "counts": list(h.counts), "max": h.max}
+                       for h in histograms}
+    }
@@ -16,19 +16,43 @@
 """
 
 
-import socket
 import os
-import errno
 import sys
-import time
+import json
+import struct
+import stats
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 try:
     from micropython import const
     upython = True
 except ImportError:
     const = lambda x : x
-    
-SOCK_TIMEOUT = const(0)
+    upython = False
+
+try:
+    print_exception = sys.print_exception
+except AttributeError:
+    import traceback
+    print_exception = traceback.print_exception
+
+HTTP_PORT = 80
+MAX_CONNECTIONS = const(4)     # clients beyond this get 503 Service Unavailable
+MAX_KEEP_ALIVE = const(2)      # connections kept open for more requests, the others close after one
+REQUEST_TIMEOUT = const(5)     # seconds allowed to receive the request line, headers and body
+KEEP_ALIVE_TIMEOUT = const(5)  # seconds an open connection may wait for its next request
+MAX_HEADERS = const(32)        # a request with more header lines than this is rejected
+REQUEST_BUF_LEN = const(2048)  # largest request line and headers, and largest body, accepted
+MAX_BODY_LEN = const(2048)     # largest POST body accepted, no more than REQUEST_BUF_LEN
+STATIC_MAX_AGE = const(2592000) # seconds browsers may cache files from /images (30 days)
+SSE_HEARTBEAT = const(15)      # seconds between keep alive comments on an idle /events stream
+INDEX_FILE = 'www/index.html'  # the settings page served at /, the page is generated if the file is not there
+MIRROR_FILE = 'www/mirror.html' # served at /mirror, shows what each LCD shows
+BMP_HEADER_LEN = const(66)     # file and info headers and the RGB565 bit masks of a screenshot
 
 html_start = b"""
 <!DOCTYPE html>
@@ -74,291 +98,656 @@ content_types = dict(
     )
 
 READ_BUF_LEN = 1024
-PAGE_BUF_LEN = 5120 # max bytes for an html page
+JSON_BUF_LEN = 1024 # max bytes for an api response
+
+json_buf = bytearray(JSON_BUF_LEN)
+# one request buffer for each connection, taken while it is served.
+# Once the request has been read the settings page is sent through it
+request_bufs = [bytearray(REQUEST_BUF_LEN) for i in range(MAX_CONNECTIONS)]
+
+async def read_into(reader, mv):
+    # reads what has arrived into the memoryview, returns the byte count, 0 when the client has closed.
+    # MicroPython streams have readinto, CPython's do not
+    if hasattr(reader, 'readinto'):
+        return await reader.readinto(mv) or 0
+    data = await reader.read(len(mv))
+    mv[:len(data)] = data
+    return len(data)
+
+def header_end(buf, start, end):
+    # returns the index just past the blank line ending the headers in buf[start:end], -1 if not there yet
+    data = bytes(memoryview(buf)[start:end])
+    crlf = data.find(b'\n\r\n')
+    lf = data.find(b'\n\n')
+    if crlf < 0 and lf < 0:
+        return -1
+    if lf < 0 or 0 <= crlf < lf:
+        return start + crlf + 3
+    return start + lf + 2
+
+def url_decode(s):
+    # decodes '+' and %xx escapes in a url encoded form field
+    s = s.replace('+', ' ')
+    if '%' not in s:
+        return s
+    parts = s.split('%')
+    out = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        if len(part) >= 2 and all(c in '0123456789abcdefABCDEF' for c in part[:2]):
+            out.append(int(part[:2], 16))
+            out.extend(part[2:].encode())
+        else:
+            out.extend(b'%' + part.encode()) # not an escape, keep as is
+    return out.decode()
+
+class Request(object):
+    # the parts of an HTTP request used by my_HTTPserver, header names are lower case.
+    # buf holds the request, received bytes of it, and the body starts at body_start
+    def __init__(self, method, path, headers, buf=None, body_start=0, received=0, version='HTTP/1.1'):
+        self.method = method
+        self.path, _, self.query = path.partition('?')
+        self.headers = headers
+        length = headers.get('content-length', '0')
+        if not length.isdigit(): # no sign, so the body can not be read over the buffer before it
+            raise ValueError('bad Content-Length')
+        self.content_length = int(length)
+        self.buf = buf
+        self.body_start = body_start
+        self.received = received
+        self.body_read = False
+        self.kept = False # the connection is one of the MAX_KEEP_ALIVE kept open
+        # whether the client will send another request on this connection, the server
+        # can still close it after the response, see my_HTTPserver.start_response
+        connection = headers.get('connection', '').lower()
+        self.keep_alive = (connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive')
+        if received > body_start + self.content_length:
+            self.keep_alive = False # the next request has come with this one, not read ahead
+
+
+def bmp_header(width, height):
+    # a 16 bit BMP with RGB565 bit masks, the negative height puts the rows top down as the LCD has them
+    size = width * height * 2
+    return (struct.pack('<2sIHHIIiiHHIIiiII', b'BM', BMP_HEADER_LEN + size, 0, 0, BMP_HEADER_LEN,
+                        40, width, -height, 1, 16, 3, size, 2835, 2835, 0, 0) +
+            struct.pack('<III', 0xF800, 0x07E0, 0x001F))
 
-page_buf = bytearray(PAGE_BUF_LEN)
 
 class my_HTTPserver(object):
-    def __init__(self, settings, cfg_callback):
+    def __init__(self, settings, cfg_callback, status_callback=None, events=None, display=None):
+        self.settings = settings
         self.cfg = settings.settings
         self.cfg_tags = settings.tags
         self.dst_options = settings.dst_options
         self.update_func = cfg_callback
-        # Open socket
-        addr = socket.getaddrinfo('0.0.0.0', 80)[0][-1]
-        self.sock = socket.socket()
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        if SOCK_TIMEOUT == 0:
-            self.sock.setblocking(False)
-        else:    
-            self.sock.settimeout(SOCK_TIMEOUT) 
-        self.sock.bind(addr)
-        self.send_array = bytearray(READ_BUF_LEN)
-        self.sock.listen(1)
-        print('Ready to listen on', addr)
-
-    def listen(self):
-        client = None
+        self.status_func = status_callback # returns a dict of clock status values for /api/status
+        self.events = events # EventHub streamed to clients of /events
+        self.display = display # the display.Display whose LCDs /api/display reports
+        # the settings page is generated as it is sent, its length is found when settings.version changes
+        self.page_version = None
+        self.page_len = 0
+        self.etag = None
+        self.boot_id = '{:08x}'.format(int.from_bytes(os.urandom(4), 'big'))
+        self.tags_etag = '"{}-tags"'.format(self.boot_id).encode() # tags only change with the firmware
+        self.connections = 0
+        self.keep_alives = 0 # connections kept open for another request
+        self.server = None
+        self.file_buf = bytearray(READ_BUF_LEN) # reused for every static file sent
+
+    async def start(self, host='0.0.0.0', port=None):
+        # starts accepting connections, each client is served by its own task
+        if port is None:
+            port = HTTP_PORT
+        self.server = await asyncio.start_server(self.handle_client, host, port, backlog=MAX_CONNECTIONS)
+        print('Ready to listen on', (host, port))
+
+    async def handle_client(self, reader, writer):
+        if self.connections >= MAX_CONNECTIONS or not request_bufs:
+            await self.send_status(writer, None, b'503 Service Unavailable')
+            await self.close(writer)
+            return
+        self.connections += 1
+        buf = request_bufs.pop()
+        request = None
+        kept = False
         try:
-            client, addr = self.sock.accept()
-            client.setblocking(False)  # Set non-blocking mode
-            print(f"Connection from {addr}")
-
-            request = b""
-            start_time = time.ticks_ms()
-            timeout = 2000  # 2 seconds timeout 
-
-            while True:
+            request = await asyncio.wait_for(self.read_request(reader, buf), REQUEST_TIMEOUT)
+            while request:
+                if request.path == '/events' and self.events:
+                    await self.stream_events(writer) # long lived, ends when the client goes away
+                    break
+                request.kept = kept
+                await asyncio.wait_for(self.process_request(request, reader, writer), REQUEST_TIMEOUT)
+                kept = request.kept
+                if not request.keep_alive:
+                    break
                 try:
-                    part = client.recv(2048)
-                    if part:
-                        request += part
-                        start_time = time.ticks_ms()  # Reset timer on successful reception
-                    elif time.ticks_diff(time.ticks_ms(), start_time) > timeout:
-                        print("Receiving: Timeout waiting for data")
-                        break
-
-                except OSError as e:
-                    if e.args[0] == errno.EAGAIN:
-                        if time.ticks_diff(time.ticks_ms(), start_time) > timeout:
-                            print("Eagain: Timeout waiting for data")
-                            break
-                        time.sleep_ms(100)
-                    else:
-                        print('Error in listen recv:', e)
-                        break
-
+                    request = await asyncio.wait_for(self.read_request(reader, buf), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break # idle, closed without a message
+        except asyncio.TimeoutError:
+            print("Connection timed out")
+        except ValueError as e:
+            print('Bad request:', e)
+            await self.send_status(writer, None, b'400 Bad Request')
         except OSError as e:
-            if e.args[0] == errno.EAGAIN:
-                pass
-            else:
-                print('Error in listen:', e)
-
+            print('Error in handle_client:', e)
         finally:
-            if client:
-                if request:
-                    self.process_request(request.decode('utf-8'), client)
-                client.close()
-
+            if kept or (request and request.kept):
+                self.keep_alives -= 1
+            request_bufs.append(buf)
+            self.connections -= 1
+            await self.close(writer)
+
+    async def read_request(self, reader, buf):
+        # reads the request line and headers into buf and returns a Request as soon as the blank
+        # line ending them arrives, None if the client closed first. Body bytes that arrived
+        # with the headers are left in buf for read_body
+        mv = memoryview(buf)
+        received = 0
+        end = -1
+        while end < 0:
+            if received == len(buf):
+                raise ValueError('request headers too long')
+            n = await read_into(reader, mv[received:])
+            if not n:
+                return None
+            # the blank line can start in the bytes already searched
+            end = header_end(buf, max(0, received - 3), received + n)
+            received += n
+        lines = bytes(mv[:end]).decode().split('\n')
+        try:
+            method, path, version = lines[0].split(' ', 2)
+        except ValueError:
+            raise ValueError('malformed request line')
+        headers = {}
+        for line in lines[1:]:
+            if len(line) <= 1: # the blank line
+                continue
+            if len(headers) >= MAX_HEADERS:
+                raise ValueError('too many headers')
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return Request(method, path, headers, buf, end, received, version.strip())
+
+    async def read_body(self, reader, request):
+        # returns the body as a memoryview of the request buffer, read after the bytes that came with the headers
+        length = request.content_length
+        if length > MAX_BODY_LEN or length > len(request.buf):
+            raise ValueError('body too long')
+        buf = request.buf
+        mv = memoryview(buf)
+        n = min(length, request.received - request.body_start)
+        buf[:n] = bytes(mv[request.body_start:request.body_start + n]) # to the start, a copy as they can overlap
+        while n < length:
+            got = await read_into(reader, mv[n:length])
+            if not got:
+                raise ValueError('body incomplete')
+            n += got
+        request.body_read = True
+        return mv[:length]
+
+    async def read_form(self, reader, request):
+        # reads a url encoded form body, returns a dict of its fields
+        data = {}
+        for item in bytes(await self.read_body(reader, request)).split(b'&'):
+            self.add_form_field(data, item)
+        return data
+
+    def add_form_field(self, data, item):
+        if b'=' in item:
+            k, v = item.decode().split('=', 1)
+            data[url_decode(k)] = url_decode(v)
+
+    async def read_json(self, reader, request):
+        data = json.loads(bytes(await self.read_body(reader, request)))
+        if not isinstance(data, dict):
+            raise ValueError('expected a JSON object')
+        return data
+
+    def validate(self, data):
+        # returns a copy of data with each value as stored in settings, raises ValueError if any are invalid
+        valid = {}
+        for k, v in data.items():
+            valid[k] = self.settings.validate(k, v)
+        return valid
+
+    async def send(self, writer, data):
+        writer.write(data)
+        await writer.drain()
+
+    def start_response(self, writer, request, status, headers=b'', length=None, close=False):
+        # writes the status line and headers, headers being lines that each end in CRLF.
+        # Content-Length frames the body, so the connection is kept for the client's next request
+        # if it asked for that, its whole request has been read and it is one of the first
+        # MAX_KEEP_ALIVE connections to be kept. request is None for a response without one
+        keep = (request is not None and request.keep_alive and not close and
+                (request.body_read or not request.content_length) and
+                (request.kept or self.keep_alives < MAX_KEEP_ALIVE))
+        if request:
+            if keep and not request.kept:
+                self.keep_alives += 1
+                request.kept = True
+            request.keep_alive = keep
+        writer.write(b'HTTP/1.1 ' + status + b'\r\n' + headers +
+                     (b'' if length is None else b'Content-Length: ' + str(length).encode() + b'\r\n') +
+                     (b'\r\n' if keep else b'Connection: close\r\n\r\n'))
+
+    async def send_status(self, writer, request, status, headers=b'', close=False):
+        # a response without a body, such as 304 Not Modified or 404 Not Found
+        self.start_response(writer, request, status, headers, None if status[:3] == b'304' else 0, close)
+        await writer.drain()
+
+    async def close(self, writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except OSError:
+            pass
 
-    def process_request(self, request, client):
-        if request.startswith('GET'):
-            self.process_get(request, client)
-        elif request.startswith('POST'):
-            self.process_post(request, client)
+    async def process_request(self, request, reader, writer):
+        if request.path.startswith('/api/'):
+            await self.process_api(request, reader, writer)
+        elif request.method == 'GET':
+            await self.process_get(request, writer)
+        elif request.method == 'POST':
+            await self.process_post(request, reader, writer)
         else:
-            print("Unhandled request method:", request.split(' ', 1)[0])
+            print("Unhandled request method:", request.method)
+            await self.send_status(writer, request, b'405 Method Not Allowed')
 
-    def process_get(self, request, client):
+    async def process_get(self, request, writer):
         try:
-            request_line = request.split('\r\n', 1)[0]
-            _, path, _ = request_line.split(' ', 2)
-
+            path = request.path
             if path.startswith('/images/'): # todo add this if using favicon-> or path == '/favicon.ico':
                 filename = path[1:]   # Remove the leading slash
-                self.send_file(client, filename)
-            elif path == '/':
-                page = self.append_to_page_buf((html_start, self.get_input_tags(), html_end))
-                self.send_page(client, page)
+                await self.send_file(writer, request, filename)
+            elif path == '/' and self.file_info(INDEX_FILE):
+                # static page that gets the settings from the api, revalidated so a new version is seen
+                await self.send_file(writer, request, INDEX_FILE, b'no-cache')
+            elif path == '/mirror':
+                await self.send_file(writer, request, MIRROR_FILE, b'no-cache')
+            elif path in ('/', '/form'):
+                if request.headers.get('if-none-match', '').encode() == self.get_etag():
+                    await self.send_status(writer, request, b'304 Not Modified', b'ETag: ' + self.etag + b'\r\n')
+                else:
+                    await self.send_page(writer, request)
             else:
-                client.send(b'HTTP/1.1 404 Not Found\r\n\r\n')
+                await self.send_status(writer, request, b'404 Not Found')
                 print('Unhandled GET request:', path)
-        except ValueError:
-            client.send(b'HTTP/1.1 400 Bad Request\r\n\r\n')
+        except OSError:
+            raise
         except Exception as e:
             print('Error processing GET request:', str(e))
-            sys.print_exception(e) # traceback
-            client.send(b'HTTP/1.1 500 Internal Server Error\r\n\r\n')
-        finally:
-
-            client.close()
+            print_exception(e) # traceback
+            await self.send_status(writer, request, b'500 Internal Server Error', close=True)
 
-    def process_post(self, request, client):
+    async def process_post(self, request, reader, writer):
         try:
-            headers, body = request.split('\r\n\r\n', 1)
-            data = {k: v for k, v in (item.split('=') for item in body.split('&') if '=' in item)}
+            data = await self.read_form(reader, request)
             if 'asFont' in data:
                 if data['asFont'] == 'on':
                     data['led_color'] = data[data['active_font']]
                 del data['asFont']
 
-            self.update_func(data)
-            page = self.append_to_page_buf((html_start, self.get_input_tags(), html_end))
-            self.send_page(client, page)
+            self.update_func(self.validate(data))
+            await self.send_page(writer, request)
 
+        except OSError:
+            raise
+        except ValueError as e:
+            print('Invalid POST request:', str(e))
+            await self.send_status(writer, request, b'400 Bad Request')
         except Exception as e:
             print('Error processing POST request:', str(e))
-            client.send(b'HTTP/1.1 500 Internal Server Error\r\n\r\n')
-        finally:
-            client.close()
-
-    def append_to_page_buf(self, byte_arrays):
-        global page_buf
-        for i in range(len(page_buf)):
-            page_buf[i] = 0
-        # page_buf[:] = bytes(len(page_buf)) # clear the buffer    
-        current_size = 0 
-        for byte_array in byte_arrays:
-            # Calculate space left in the buffer
-            space_left = PAGE_BUF_LEN - current_size
-            if space_left <= 0:
-                raise("Web Page Buffer full")
-
-            # If the byte_array fits into the space left, append it entirely
-            if len(byte_array) <= space_left:
-                page_buf[current_size:current_size + len(byte_array)] = byte_array
-                current_size += len(byte_array)
-            # If the byte_array does not fit, append only the part that fits
+            await self.send_status(writer, request, b'500 Internal Server Error', close=True)
+
+    async def process_api(self, request, reader, writer):
+        # JSON interface: GET or PATCH /api/settings and /api/metrics, GET /api/tags, /api/status
+        # and /api/display, with a BMP of each LCD at /api/display/<digit>.bmp
+        path = request.path
+        method = request.method
+        try:
+            if path == '/api/settings' and method == 'GET':
+                if request.headers.get('if-none-match', '').encode() == self.get_etag():
+                    await self.send_status(writer, request, b'304 Not Modified', b'ETag: ' + self.etag + b'\r\n')
+                else:
+                    await self.send_json(writer, request, self.cfg, self.get_etag())
+            elif path == '/api/settings' and method == 'PATCH':
+                data = self.validate(await self.read_json(reader, request))
+                self.update_func(data)
+                self.cfg = self.settings.settings
+                await self.send_json(writer, request, self.cfg, self.get_etag())
+            elif path == '/api/tags' and method == 'GET':
+                # settings.tags, describing each setting for the static page
+                if request.headers.get('if-none-match', '').encode() == self.tags_etag:
+                    await self.send_status(writer, request, b'304 Not Modified', b'ETag: ' + self.tags_etag + b'\r\n')
+                else:
+                    await self.send_json(writer, request, self.cfg_tags, self.tags_etag)
+            elif path == '/api/status' and method == 'GET' and self.status_func:
+                await self.send_json(writer, request, self.status_func())
+            elif path == '/api/display' and method == 'GET' and self.display:
+                await self.send_json(writer, request, self.display.shadow_state())
+            elif path.startswith('/api/display/') and path.endswith('.bmp') and method == 'GET' and self.display:
+                await self.send_screenshot(writer, request, int(path[13:-4]))
+            elif path == '/api/metrics' and method in ('GET', 'PATCH'):
+                if method == 'PATCH':
+                    data = await self.read_json(reader, request)
+                    if 'enabled' in data:
+                        stats.enable(data['enabled'] is True)
+                    if data.get('reset') is True:
+                        stats.reset()
+                await self.send_json(writer, request, stats.snapshot())
             else:
-                page_buf[current_size:PAGE_BUF_LEN] = byte_array[:space_left]
-                current_size = PAGE_BUF_LEN
-                raise("Web page buffer full after partial append.")
-        return page_buf    
-    
-    def send_page(self, cl, page):
-        page = self.append_to_page_buf((html_start,self.get_input_tags(),html_end))
-        cl.send(b'HTTP/1.0 200 OK\r\nContent-type: text/html\r\n\r\n')
-        cl.send(page)
-
-    def get_content_length(self, headers):
-        for line in headers.split('\r\n'):
-            if line.lower().startswith('content-length'):
-                return int(line.split(":")[1].strip())
-        return 0
-    
-    def send_file(self, cl, filename, binary=True):
-        content_type = content_types.get(filename.split('.')[-1], content_types['default'])
+                await self.send_status(writer, request, b'404 Not Found')
+        except OSError:
+            raise
+        except ValueError as e:
+            print('Invalid API request:', str(e))
+            await self.send_json(writer, request, {'error': str(e)}, status=b'400 Bad Request')
+        except Exception as e:
+            print('Error processing API request:', str(e))
+            print_exception(e) # traceback
+            await self.send_status(writer, request, b'500 Internal Server Error', close=True)
+
+    async def stream_events(self, writer):
+        # Server-Sent Events: each event published to the hub is sent as it happens
+        sub = self.events.subscribe()
+        if sub is None:
+            await self.send_status(writer, None, b'503 Service Unavailable', b'Retry-After: 30\r\n')
+            return
         try:
-           file_size = os.stat(filename)[6]
-        except OSError as e:            
-            print(f"Error accessing file {filename}: {str(e)}")          
-        
-        # Prepare the HTTP response headers
-        headers = [
-            b"HTTP/1.1 200 OK\r\n",
-            "Content-Type: {}\r\n".format(content_type).encode(),
-            "Content-Length: {}\r\n\r\n".format(file_size).encode()
-        ]
-
-        # Send headers in one go
-        cl.send(b"".join(headers))
-
+            await self.send(writer, b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                                    b'Cache-Control: no-cache\r\nConnection: close\r\n\r\n')
+            while True:
+                try:
+                    await asyncio.wait_for(sub.ready.wait(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    writer.write(b':\n\n') # comment line, detects clients that have gone
+                event = sub.get()
+                while event:
+                    writer.write(b'event: ' + event[0] + b'\ndata: ' + event[1] + b'\n\n')
+                    event = sub.get()
+                # a client that cannot keep up is dropped rather than buffered for
+                await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+        finally:
+            self.events.unsubscribe(sub)
+
+    def json_put(self, pos, data):
+        end = pos + len(data)
+        if end > JSON_BUF_LEN:
+            raise ValueError("JSON buffer full")
+        json_buf[pos:end] = data
+        return end
+
+    def json_value(self, pos, v):
+        # serializes v into json_buf at pos without building the whole document as a string
+        if isinstance(v, dict):
+            sep = b'{'
+            for k in v:
+                pos = self.json_put(pos, sep)
+                pos = self.json_value(pos, k)
+                pos = self.json_put(pos, b':')
+                pos = self.json_value(pos, v[k])
+                sep = b','
+            return self.json_put(pos, b'}' if sep == b',' else b'{}')
+        if isinstance(v, (list, tuple)):
+            sep = b'['
+            for item in v:
+                pos = self.json_put(pos, sep)
+                pos = self.json_value(pos, item)
+                sep = b','
+            return self.json_put(pos, b']' if sep == b',' else b'[]')
+        if isinstance(v, str):
+            if '"' in v or '\\' in v or '\n' in v:
+                v = v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pos = self.json_put(pos, b'"')
+            pos = self.json_put(pos, v.encode())
+            return self.json_put(pos, b'"')
+        if v is True:
+            return self.json_put(pos, b'true')
+        if v is False:
+            return self.json_put(pos, b'false')
+        if v is None:
+            return self.json_put(pos, b'null')
+        return self.json_put(pos, str(v).encode())
+
+    async def send_json(self, writer, request, obj, etag=None, status=b'200 OK'):
+        length = self.json_value(0, obj)
+        self.start_response(writer, request, status, b'Content-Type: application/json\r\nCache-Control: no-cache\r\n' +
+                            (b'ETag: ' + etag + b'\r\n' if etag else b''), length)
+        await self.send(writer, memoryview(json_buf)[:length])
+
+    async def send_screenshot(self, writer, request, digit):
+        # what one LCD shows as a BMP, drawn again a band at a time into the request buffer
+        if not 0 <= digit < 6:
+            raise ValueError('digit must be 0 to 5')
+        lcd = self.display
+        self.start_response(writer, request, b'200 OK', b'Content-Type: image/bmp\r\nCache-Control: no-cache\r\n',
+                            BMP_HEADER_LEN + lcd.width * lcd.height * 2)
+        writer.write(bmp_header(lcd.width, lcd.height))
+        for rows in lcd.snapshot(digit, request.buf):
+            # drain yields to the clock between bands
+            await self.send(writer, rows)
+
+    def get_etag(self):
+        # ETag identifies the settings version, boot_id stops matches with a previous boot
+        version = self.settings.version
+        if self.etag is None or version != self.page_version:
+            self.etag = '"{}-{}"'.format(self.boot_id, version).encode()
+        return self.etag
+
+    def get_page_len(self):
+        # returns the length of the settings page, generating it to count its bytes only if settings changed
+        version = self.settings.version
+        if version != self.page_version:
+            self.cfg = self.settings.settings # load_settings replaces the dictionary
+            self.page_len = 0
+            for fragment in self.page_fragments():
+                self.page_len += len(fragment)
+            self.get_etag()
+            self.page_version = version
+        return self.page_len
+
+    def page_fragments(self):
+        # yields the settings page as byte strings, static html as it is and the values formatted one at a time
+        yield html_start
+        yield from self.get_input_tags()
+        yield html_end
+
+    async def send_page(self, writer, request):
+        # sends the settings page, copying its fragments into the request buffer and writing that each
+        # time it fills, so sending the page needs no more memory however many settings it has
+        length = self.get_page_len()
+        self.start_response(writer, request, b'200 OK', b'Content-Type: text/html\r\nCache-Control: no-cache\r\n'
+                            b'ETag: ' + self.etag + b'\r\n', length)
+        buf = request.buf
+        mv = memoryview(buf)
+        n = 0
+        for fragment in self.page_fragments():
+            size = len(fragment)
+            if n + size > len(buf):
+                await self.send(writer, mv[:n])
+                n = 0
+                if size > len(buf): # larger than the buffer, written as it is
+                    await self.send(writer, fragment)
+                    continue
+            buf[n:n + size] = fragment
+            n += size
+        await self.send(writer, mv[:n])
+
+    def file_info(self, filename):
+        # returns (size, etag) for the given file, None if it does not exist
         try:
-            with open(filename, 'rb' if binary else 'r') as f:
-                while True:
-                    data = f.read(READ_BUF_LEN)  
-                    if not data:
-                        break
-
-                    while True:
-                        try:
-                            cl.sendall(data)  # Use sendall to ensure all data is sent
-                            break
-                        except OSError as e:
-                            if e.args[0] == errno.EAGAIN:
-                                continue  # Retry sending when the socket is temporarily full
-                            elif e.args[0] == errno.ETIMEDOUT:
-                                print("Socket send operation timed out")
-                                return
-                            else:
-                                raise  # Raise other errors as appropriate
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return st[6], '"{:x}-{:x}"'.format(st[6], st[8]).encode()
+
+    async def send_file(self, writer, request, filename, cache_control=None):
+        # streams a static file with caching headers, preferring a pre-gzipped copy if the client accepts it.
+        # Browsers may cache it for STATIC_MAX_AGE unless another Cache-Control value is given
+        if '..' in filename:
+            await self.send_status(writer, request, b'400 Bad Request')
+            return
+        content_type = content_types.get(filename.split('.')[-1], content_types['default'])
+        encoding = b''
+        info = None
+        if 'gzip' in request.headers.get('accept-encoding', ''):
+            info = self.file_info(filename + '.gz')
+            if info:
+                filename += '.gz'
+                encoding = b'Content-Encoding: gzip\r\n'
+        if info is None:
+            info = self.file_info(filename)
+        if info is None:
+            print("File not found:", filename)
+            await self.send_status(writer, request, b'404 Not Found')
+            return
+        file_size, etag = info
+        if request.headers.get('if-none-match', '').encode() == etag:
+            await self.send_status(writer, request, b'304 Not Modified', b'ETag: ' + etag + b'\r\n')
+            return
+
+        self.start_response(writer, request, b'200 OK', b'Content-Type: ' + content_type.encode() +
+                            b'\r\nCache-Control: ' + (cache_control or b'max-age=' + str(STATIC_MAX_AGE).encode()) +
+                            b'\r\nETag: ' + etag + b'\r\nVary: Accept-Encoding\r\n' + encoding, file_size)
+        buf = self.file_buf
+        mv = memoryview(buf)
+        with open(filename, 'rb') as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                if stats.enabled:
+                    stats.counters[stats.FLASH_BYTES] += n
+                # drain yields to the other tasks until the socket can take more
+                await self.send(writer, mv[:n])
 
+    # The form_ methods yield the html for one setting, in fragments
 
-        except OSError as e:
-            if e.args[0] == errno.ETIMEDOUT:
-                pass
-            elif e.args[0] == errno.ENOENT:
-                raise HttpError(cl, 404, "File Not Found")
-            else:
-                raise
-            
     def form_text_input(self, id, text, min, max, value):
-        minmax = '<td>({} to {})</td>'.format(min, max)
-        line = '<tr><td><label for="{}">{}:</label></td><td><input type="text" id="{}" \
-                name="{}" min="{}" max="{}" value="{}" size="2"></td>{}</tr>'. \
-                format(id, text, id, id, min, max, value, minmax)
-        return line
-
-    def form_radio_input(self, id, text, selected, values):      
-        line = '<tr><td><label>{}:</label></td>'.format(text)        
-        for i in range(len(values)):
-            if values[i] == selected:
-                chked = 'checked="checked"'
-            else:
-                chked = ''
-            line += '<td><input type="radio" name="{}" value="{}" {} id={}>'.format(id, values[i], chked, id)
-            line += '<label for="{}">{}</label></td>'.format(values[i], values[i])    
-        line += '</tr>'
-        return line
+        yield b'<tr><td><label for="'
+        yield id.encode()
+        yield b'">'
+        yield text.encode()
+        yield b':</label></td><td><input type="text" id="'
+        yield id.encode()
+        yield b'"                 name="'
+        yield id.encode()
+        yield b'" min="'
+        yield str(min).encode()
+        yield b'" max="'
+        yield str(max).encode()
+        yield b'" value="'
+        yield str(value).encode()
+        yield b'" size="2"></td><td>('
+        yield str(min).encode()
+        yield b' to '
+        yield str(max).encode()
+        yield b')</td></tr>'
+
+    def form_radio_input(self, id, text, selected, values):
+        yield b'<tr><td><label>'
+        yield text.encode()
+        yield b':</label></td>'
+        for value in values:
+            checked = value == selected
+            value = value.encode()
+            yield b'<td><input type="radio" name="'
+            yield id.encode()
+            yield b'" value="'
+            yield value
+            yield b'" checked="checked" id=' if checked else b'"  id='
+            yield id.encode()
+            yield b'><label for="'
+            yield value
+            yield b'">'
+            yield value
+            yield b'</label></td>'
+        yield b'</tr>'
     
     def form_font_input(self, active_id, heading, font_info ):
         active = self.cfg[active_id]
-        line = '<tr><td><label>{}</label></td><td><label>Colour</label></td></tr>'.format(heading)
+        yield b'<tr><td><label>'
+        yield heading.encode()
+        yield b'</label></td><td><label>Colour</label></td></tr>'
         for f in font_info:
-            font = f.split(':') # format is id:display_name
-            id = font[0]
-            color = self.cfg[id]
-            text = font[1]
-            color_id = id
-            if id == self.cfg[active_id]:
-                checked = 'checked="checked"'
-            else:
-                checked = ''                
-            line+= '''<tr><td><input type="radio" name="active_font" value="{}" {} id={}>
-                    <label for="{}">{}</label></td>
-                    <td><input type="color" id="{}" name="{}" value="{}"/>
-                    <label for="color_id">{}</label></td></tr><tr>''' \
-                    .format(id, checked, id, id, text, color_id, color_id, color, color)
-                
-        return line    
+            id, text = f.split(':') # format is id:display_name
+            checked = id == active
+            color = self.cfg[id].encode()
+            id = id.encode()
+            yield b'<tr><td><input type="radio" name="active_font" value="'
+            yield id
+            yield b'" checked="checked" id=' if checked else b'"  id='
+            yield id
+            yield b'>\n                    <label for="'
+            yield id
+            yield b'">'
+            yield text.encode()
+            yield b'</label></td>\n                    <td><input type="color" id="'
+            yield id
+            yield b'" name="'
+            yield id
+            yield b'" value="'
+            yield color
+            yield b'"/>\n                    <label for="color_id">'
+            yield color
+            yield b'</label></td></tr><tr>'
             
     def form_led_color_select(self, id, heading):
-        # print(id, self.cfg[id])
-        color = self.cfg[id]
-        # print("led color in cfg is ", color)
-        line = '''<tr><td>{}</td><td><input type="color" name="{}" id="{}" value="{}"></td><td>
-                <input type="checkbox" name="asFont" id="asFontCb">As Font</td> </tr>''' \
-                .format(heading, id, id, color)
-        return line
+        yield b'<tr><td>'
+        yield heading.encode()
+        yield b'</td><td><input type="color" name="'
+        yield id.encode()
+        yield b'" id="'
+        yield id.encode()
+        yield b'" value="'
+        yield self.cfg[id].encode()
+        yield (b'"></td><td>\n                <input type="checkbox" name="asFont" id="asFontCb">'
+               b'As Font</td> </tr>')
     
     def form_dropdown(self, id, heading, options, selected):
-        line = '<tr><td><label>{}</label></td><td><select id="{}" name="{}">'.format(heading, id, id)
+        yield b'<tr><td><label>'
+        yield heading.encode()
+        yield b'</label></td><td><select id="'
+        yield id.encode()
+        yield b'" name="'
+        yield id.encode()
+        yield b'">'
         for key in options:
-            option_text = options[key]
-            if key == selected:
-                line += '<option value="{}" selected="selected">{}</option>'.format(key, option_text)
-            else:
-                line += '<option value="{}">{}</option>'.format(key, option_text )
-        line += '</select></td></tr>'
-        return line
+            yield b'<option value="'
+            yield key.encode()
+            yield b'" selected="selected">' if key == selected else b'">'
+            yield options[key].encode()
+            yield b'</option>'
+        yield b'</select></td></tr>'
     
     def get_input_tags(self):
-        fields = []
-        for idx, tag in enumerate(self.cfg_tags):
-            # print(tag)
+        # yields the rows of the settings table, one line for each tag
+        for tag in self.cfg_tags:
             if tag[1] == 'N': # numeric textbox
-               id, type, text, min, max = tag
-               fields.append(self.form_text_input(id, text, min, max, self.cfg[id]))
+                id, type, text, min, max = tag
+                yield from self.form_text_input(id, text, min, max, self.cfg[id])
             elif tag[1] == 'R': # radio buttons
                 id, type, text = tag[:3]
                 values = tag[3:]
-                fields.append(self.form_radio_input(id, text, self.cfg[id], values))
+                yield from self.form_radio_input(id, text, self.cfg[id], values)
             elif tag[1] == 'F': # font group
                 id, type, heading = tag[:3]
                 fonts = tag[3:]
-                fields.append(self.form_font_input(id, heading, fonts))
+                yield from self.form_font_input(id, heading, fonts)
             elif tag[1] == 'L': # led color
-                id, type, heading = tag  
-                fields.append(self.form_led_color_select(id, heading))
+                id, type, heading = tag
+                yield from self.form_led_color_select(id, heading)
             elif tag[1] == 'D': # selection dropdown
                 id, type, heading, options = tag # todo remove dst_mode from init ??
-                fields.append(self.form_dropdown(id, heading, options, self.cfg[id]))
+                yield from self.form_dropdown(id, heading, options, self.cfg[id])
             elif tag[1] == '-': # empty row with line
-                fields.append('<tr class="h-line"><td colspan="3">&zwnj;</td></tr><tr><td colspan="3">&zwnj;</td></tr>')
-                #     '<tr><td>&zwnj;<label> </label></td></tr>'
-        fields.append('<tr><td colspan="3">&zwnj;</td></tr>')        
-        fields.append('</table>')        
-        return '\n'.join(fields).encode('utf8')
+                yield b'<tr class="h-line"><td colspan="3">&zwnj;</td></tr><tr><td colspan="3">&zwnj;</td></tr>'
+            else:
+                continue
+            yield b'\n'
+        yield b'<tr><td colspan="3">&zwnj;</td></tr>\n</table>'
     
 """   
 if __name__ == "__main__":